@@ -0,0 +1,83 @@
+import logging
+import threading
+
+import database
+
+UMBRAL_POR_DEFECTO = 5  # unidades, si el par vendedor/producto no tiene umbral propio
+ESPERA_SEGUNDOS = 60  # las alertas se juntan durante este tiempo antes de enviarse
+
+class AlertasStock:
+    """
+    Alertas de stock bajo evaluadas solo sobre las filas que acaba de tocar una venta.
+
+    Cada par (vendedor, producto) alerta una vez al cruzar su umbral y vuelve a quedar
+    armado cuando el stock sube por encima (por ejemplo, tras un reabastecimiento). Las
+    alertas se acumulan durante `espera` segundos y se envían juntas en un solo mensaje.
+    """
+
+    def __init__(self, enviador, chat_id, espera=ESPERA_SEGUNDOS):
+        self.enviador = enviador
+        self.chat_id = chat_id
+        self.espera = espera
+        self._umbrales = None  # (vendedor_id, producto_id) -> mínimo
+        self._alertados = set()
+        self._pendientes = {}  # (vendedor_id, producto_id) -> (vendedor, producto, stock, minimo)
+        self._temporizador = None
+        self._lock = threading.Lock()
+
+    def cargar_umbrales(self):
+        filas = database.ejecutar_consulta("SELECT vendedor_id, producto_id, minimo FROM umbrales_reposicion")
+        with self._lock:
+            self._umbrales = {(v, p): minimo for v, p, minimo in filas or []}
+
+    def umbral(self, vendedor_id, producto_id):
+        if self._umbrales is None:
+            self.cargar_umbrales()
+        return self._umbrales.get((vendedor_id, producto_id), UMBRAL_POR_DEFECTO)
+
+    def fijar_umbral(self, vendedor_id, producto_id, minimo):
+        resultado = database.ejecutar_consulta("""
+            INSERT INTO umbrales_reposicion (vendedor_id, producto_id, minimo) VALUES (?, ?, ?)
+            ON CONFLICT (vendedor_id, producto_id) DO UPDATE SET minimo = excluded.minimo
+        """, (vendedor_id, producto_id, minimo))
+        if resultado is None:
+            return False
+        if self._umbrales is None:
+            self.cargar_umbrales()
+        with self._lock:
+            self._umbrales[(vendedor_id, producto_id)] = minimo
+            self._alertados.discard((vendedor_id, producto_id))
+        return True
+
+    def evaluar(self, vendedor_id, producto_id, stock, nombre_vendedor, nombre_producto):
+        """Comprueba una sola fila de inventario tras un cambio. Cuesta O(1)."""
+        clave = (vendedor_id, producto_id)
+        minimo = self.umbral(vendedor_id, producto_id)
+        with self._lock:
+            if stock > minimo:
+                self._alertados.discard(clave)
+                self._pendientes.pop(clave, None)
+                return
+            if clave in self._alertados and clave not in self._pendientes:
+                return
+            self._alertados.add(clave)
+            self._pendientes[clave] = (nombre_vendedor, nombre_producto, stock, minimo)
+            if self._temporizador is None:
+                self._temporizador = threading.Timer(self.espera, self.enviar_pendientes)
+                self._temporizador.daemon = True
+                self._temporizador.start()
+
+    def enviar_pendientes(self):
+        with self._lock:
+            pendientes = list(self._pendientes.values())
+            self._pendientes.clear()
+            self._temporizador = None
+        if not pendientes:
+            return
+        mensaje = "⚠️ Stock bajo:\n"
+        # Solo por nombres: un nombre NULL junto a uno con texto haría fallar la comparación de tuplas
+        for nombre_vendedor, nombre_producto, stock, minimo in sorted(pendientes, key=lambda p: (str(p[0]), str(p[1]))):
+            mensaje += f"- {nombre_vendedor} · {nombre_producto}: quedan {stock} (mínimo {minimo})\n"
+        logging.warning(mensaje.strip())
+        if self.chat_id:
+            self.enviador.encolar(self.chat_id, mensaje)
@@ -0,0 +1,706 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timezone
+
+import capturas
+import database
+import movimientos
+
+class Almacenamiento:
+    """
+    Interfaz de acceso a datos de los handlers del bot: vendedores, productos, inventario,
+    ventas, sesiones, reservas y tablero de sorteos.
+
+    Los handlers de main.py, aprobaciones.py, tablero.py y el login de credenciales.py hablan
+    solo con esta interfaz, así el motor se puede cambiar (SQLite en producción, memoria para
+    pruebas y benchmarks) sin tocar esa lógica. Los procesos por lotes y los informes
+    (sorteos, ranking, alertas, movimientos, comisiones, reportes, historial, cierre, archivo)
+    trabajan con SQL propio sobre la base SQLite y no pasan por aquí: con el motor en memoria
+    esos módulos no están disponibles. Las filas se devuelven como tuplas con el mismo orden
+    de columnas que usaban las consultas originales de main.py. tests/test_almacenamiento.py
+    corre el mismo contrato contra los dos motores.
+    """
+
+    # --- Vendedores ---
+    def agregar_vendedor(self, usuario, contrasena, nombre):
+        raise NotImplementedError
+
+    def obtener_vendedor(self, usuario):
+        """Devuelve (id, nombre, contrasena) o None. `contrasena` es lo guardado (ver credenciales.py)."""
+        raise NotImplementedError
+
+    def actualizar_contrasena(self, vendedor_id, contrasena):
+        """Reemplaza lo guardado como contraseña del vendedor. Devuelve False si no existe."""
+        raise NotImplementedError
+
+    def obtener_vendedor_por_id(self, vendedor_id):
+        """Devuelve (id, nombre) o None."""
+        raise NotImplementedError
+
+    def listar_vendedores(self):
+        """Devuelve [(id, nombre)] ordenado por id."""
+        raise NotImplementedError
+
+    # --- Productos ---
+    def agregar_producto(self, nombre, precio_compra, precio_venta):
+        raise NotImplementedError
+
+    def obtener_productos(self):
+        """Devuelve [(id, nombre)] ordenado por id."""
+        raise NotImplementedError
+
+    def obtener_producto(self, producto_id):
+        """Devuelve (precio_compra, precio_venta, nombre) o None."""
+        raise NotImplementedError
+
+    # --- Inventario ---
+    def fijar_inventario(self, vendedor_id, producto_id, cantidad):
+        raise NotImplementedError
+
+    def obtener_inventario(self, vendedor_id, producto_id):
+        """Devuelve la cantidad disponible, 0 si no hay fila."""
+        raise NotImplementedError
+
+    def obtener_movimientos(self, vendedor_id, producto_id):
+        """
+        Devuelve el libro de movimientos del par, [(tipo, cantidad)] del más viejo al más nuevo:
+        'entrega' al crear la fila, 'ajuste' al corregirla y 'venta' (negativa) por cada venta.
+        """
+        raise NotImplementedError
+
+    # --- Ventas ---
+    def registrar_venta(self, vendedor_id, producto_id, cantidad_vendida, comision):
+        """Guarda la venta y descuenta el inventario. Devuelve False si no hay stock suficiente."""
+        raise NotImplementedError
+
+    def registrar_ventas(self, ventas):
+        """
+        Registra [(vendedor_id, producto_id, cantidad_vendida, comision)] de una vez.
+
+        Devuelve [bool] en el mismo orden; una venta sin stock no impide las demás.
+        """
+        return [self.registrar_venta(*venta) for venta in ventas]
+
+    def obtener_ventas_diarias(self, vendedor_id):
+        """Devuelve [(nombre, cantidad, total, comision, producto_id)] de hoy (UTC), por producto."""
+        raise NotImplementedError
+
+    # --- Sesiones ---
+    def crear_sesion(self, chat_id, vendedor_id):
+        """Devuelve False si el chat ya tiene una sesión."""
+        raise NotImplementedError
+
+    def verificar_sesion(self, chat_id):
+        """Devuelve el vendedor_id de la sesión del chat o None."""
+        raise NotImplementedError
+
+    def cerrar_sesion(self, chat_id):
+        raise NotImplementedError
+
+    def listar_sesiones(self):
+        """Devuelve [(chat_id, vendedor_id, fecha_inicio 'YYYY-MM-DD')] de todas las sesiones abiertas."""
+        raise NotImplementedError
+
+    # --- Sorteos ---
+    def crear_sorteo(self, nombre, cantidad_numeros, premio=None, valor_numero=None):
+        """Crea el sorteo con sus números 1..cantidad_numeros disponibles y devuelve su id."""
+        raise NotImplementedError
+
+    def ultimo_sorteo(self):
+        """Devuelve el id del sorteo más reciente o None si no hay ninguno."""
+        raise NotImplementedError
+
+    def agregar_reserva(self, usuario_id, sorteo_id, numero, captura_url=None):
+        """
+        Reserva un número disponible. Devuelve el id de la reserva o None si no estaba libre.
+        Si la captura es un archivo local, queda hasheada y comparada con las anteriores (capturas.py).
+        """
+        raise NotImplementedError
+
+    def obtener_numeros(self, sorteo_id):
+        """Devuelve [(numero, disponible)] ordenado por número."""
+        raise NotImplementedError
+
+    def obtener_version_tablero(self, sorteo_id):
+        """Devuelve un entero que cambia con cada cambio de disponibilidad, o None si no existe."""
+        raise NotImplementedError
+
+    def obtener_reservas_pendientes(self, despues_de_id, tamano):
+        """Devuelve [(id, usuario_id, sorteo_id, numero, fecha_reserva, captura_url, duplicado_de, distancia_duplicado)]."""
+        raise NotImplementedError
+
+    def contar_reservas_pendientes(self):
+        raise NotImplementedError
+
+    def resolver_reservas(self, reserva_ids, estado):
+        """Cambia de estado las reservas pendientes; las rechazadas liberan su número.
+        Devuelve [(reserva_id, usuario_id, sorteo_id, numero)] o None si falla."""
+        raise NotImplementedError
+
+
+# --- SQLite ---
+class AlmacenamientoSQLite(Almacenamiento):
+    """Implementación sobre el archivo SQLite del bot, con una conexión reutilizada por hilo."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=10)
+            # WAL deja leer mientras otro hilo escribe; synchronous se queda en FULL (misma durabilidad)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA busy_timeout = 10000")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -8000")
+            self._local.conn = conn
+        return conn
+
+    def cerrar(self):
+        """Cierra la conexión del hilo actual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _uno(self, consulta, params=()):
+        return self._conexion().execute(consulta, params).fetchone()
+
+    def _todos(self, consulta, params=()):
+        return self._conexion().execute(consulta, params).fetchall()
+
+    def _escribir(self, consulta, params=()):
+        conn = self._conexion()
+        try:
+            cursor = conn.execute(consulta, params)
+            conn.commit()
+            return cursor
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    # --- Vendedores ---
+    def agregar_vendedor(self, usuario, contrasena, nombre):
+        return self._escribir("INSERT INTO vendedores (usuario, contrasena, nombre) VALUES (?, ?, ?)",
+                              (usuario, contrasena, nombre)).lastrowid
+
+    def obtener_vendedor(self, usuario):
+        try:
+            return self._uno("SELECT id, nombre, contrasena FROM vendedores WHERE usuario = ?", (usuario,))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener vendedor: {e}")
+            return None
+
+    def actualizar_contrasena(self, vendedor_id, contrasena):
+        return self._escribir("UPDATE vendedores SET contrasena = ? WHERE id = ?", (contrasena, vendedor_id)).rowcount > 0
+
+    def obtener_vendedor_por_id(self, vendedor_id):
+        try:
+            return self._uno("SELECT id, nombre FROM vendedores WHERE id = ?", (vendedor_id,))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener vendedor por ID: {e}")
+            return None
+
+    def listar_vendedores(self):
+        try:
+            return self._todos("SELECT id, nombre FROM vendedores ORDER BY id")
+        except sqlite3.Error as e:
+            logging.error(f"Error al listar vendedores: {e}")
+            return []
+
+    # --- Productos ---
+    def agregar_producto(self, nombre, precio_compra, precio_venta):
+        return self._escribir("INSERT INTO productos (nombre, precio_compra, precio_venta) VALUES (?, ?, ?)",
+                              (nombre, precio_compra, precio_venta)).lastrowid
+
+    def obtener_productos(self):
+        try:
+            return self._todos("SELECT id, nombre FROM productos ORDER BY id")
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener productos: {e}")
+            return []
+
+    def obtener_producto(self, producto_id):
+        try:
+            return self._uno("SELECT precio_compra, precio_venta, nombre FROM productos WHERE id = ?", (producto_id,))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener producto: {e}")
+            return None
+
+    # --- Inventario ---
+    def fijar_inventario(self, vendedor_id, producto_id, cantidad):
+        conn = self._conexion()
+        try:
+            fila = conn.execute("SELECT cantidad_entregada FROM inventario WHERE vendedor_id = ? AND producto_id = ?",
+                                (vendedor_id, producto_id)).fetchone()
+            if fila is None:
+                # El trigger de inventario lo anota como entrega
+                conn.execute("INSERT INTO inventario (vendedor_id, producto_id, cantidad_entregada) VALUES (?, ?, ?)",
+                             (vendedor_id, producto_id, cantidad))
+            elif fila[0] != cantidad:
+                conn.execute("UPDATE inventario SET cantidad_entregada = ? WHERE vendedor_id = ? AND producto_id = ?",
+                             (cantidad, vendedor_id, producto_id))
+                conn.execute("INSERT INTO movimientos_inventario (vendedor_id, producto_id, tipo, cantidad) VALUES (?, ?, 'ajuste', ?)",
+                             (vendedor_id, producto_id, cantidad - fila[0]))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def obtener_inventario(self, vendedor_id, producto_id):
+        # Se lee del libro (instantánea más lo posterior); la tabla inventario solo hace de cerrojo
+        # para las ventas y movimientos.conciliar la compara con el libro
+        try:
+            return movimientos.leer_stock(self._conexion().cursor(), vendedor_id, producto_id)
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener inventario: {e}")
+            return 0
+
+    def obtener_movimientos(self, vendedor_id, producto_id):
+        # Las entregas y las ventas las anotan los triggers de main.crear_tablas_movimientos
+        try:
+            return self._todos("""
+                SELECT tipo, cantidad FROM movimientos_inventario
+                WHERE vendedor_id = ? AND producto_id = ? ORDER BY id
+            """, (vendedor_id, producto_id))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener movimientos: {e}")
+            return []
+
+    # --- Ventas ---
+    def registrar_venta(self, vendedor_id, producto_id, cantidad_vendida, comision):
+        conn = self._conexion()
+        try:
+            # El descuento solo se aplica si alcanza el stock, en la misma transacción que la venta
+            cursor = conn.execute("""
+                UPDATE inventario SET cantidad_entregada = cantidad_entregada - ?
+                WHERE vendedor_id = ? AND producto_id = ? AND cantidad_entregada >= ?
+            """, (cantidad_vendida, vendedor_id, producto_id, cantidad_vendida))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+            conn.execute("INSERT INTO ventas (vendedor_id, producto_id, cantidad_vendida, comision) VALUES (?, ?, ?, ?)",
+                         (vendedor_id, producto_id, cantidad_vendida, comision))
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error al registrar venta: {e}")
+            conn.rollback()
+            return False
+
+    def registrar_ventas(self, ventas):
+        """Aplica todo el lote en una sola transacción: un único commit (y un único fsync)."""
+        conn = self._conexion()
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for vendedor_id, producto_id, cantidad_vendida, comision in ventas:
+                conn.execute("SAVEPOINT venta")
+                try:
+                    cursor = conn.execute("""
+                        UPDATE inventario SET cantidad_entregada = cantidad_entregada - ?
+                        WHERE vendedor_id = ? AND producto_id = ? AND cantidad_entregada >= ?
+                    """, (cantidad_vendida, vendedor_id, producto_id, cantidad_vendida))
+                    if cursor.rowcount == 0:
+                        resultados.append(False)
+                    else:
+                        conn.execute("INSERT INTO ventas (vendedor_id, producto_id, cantidad_vendida, comision) VALUES (?, ?, ?, ?)",
+                                     (vendedor_id, producto_id, cantidad_vendida, comision))
+                        resultados.append(True)
+                    conn.execute("RELEASE venta")
+                except sqlite3.Error as e:
+                    logging.error(f"Error al registrar venta del lote: {e}")
+                    conn.execute("ROLLBACK TO venta")
+                    conn.execute("RELEASE venta")
+                    resultados.append(False)
+            conn.commit()
+            return resultados
+        except sqlite3.Error as e:
+            logging.error(f"Error al registrar el lote de ventas: {e}")
+            conn.rollback()
+            return [False] * len(ventas)
+
+    def obtener_ventas_diarias(self, vendedor_id):
+        try:
+            return self._todos("""
+                SELECT p.nombre, SUM(v.cantidad_vendida), SUM(p.precio_venta * v.cantidad_vendida), SUM(v.comision), p.id
+                FROM ventas v
+                JOIN productos p ON v.producto_id = p.id
+                WHERE v.vendedor_id = ? AND v.fecha >= DATE('now') AND v.fecha < DATE('now', '+1 day')
+                GROUP BY p.nombre
+            """, (vendedor_id,))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener ventas diarias: {e}")
+            return []
+
+    # --- Sesiones ---
+    def crear_sesion(self, chat_id, vendedor_id):
+        try:
+            self._escribir("INSERT INTO sesiones (chat_id, vendedor_id, fecha_inicio) VALUES (?, ?, ?)",
+                           (chat_id, vendedor_id, date.today()))
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error al crear la sesión: {e}")
+            return False
+
+    def verificar_sesion(self, chat_id):
+        try:
+            fila = self._uno("SELECT vendedor_id FROM sesiones WHERE chat_id = ?", (chat_id,))
+            return fila[0] if fila else None
+        except sqlite3.Error as e:
+            logging.error(f"Error al verificar la sesión: {e}")
+            return None
+
+    def cerrar_sesion(self, chat_id):
+        try:
+            self._escribir("DELETE FROM sesiones WHERE chat_id = ?", (chat_id,))
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error al cerrar la sesión: {e}")
+            return False
+
+    def listar_sesiones(self):
+        try:
+            return [(chat_id, vendedor_id, str(fecha_inicio)) for chat_id, vendedor_id, fecha_inicio
+                    in self._todos("SELECT chat_id, vendedor_id, fecha_inicio FROM sesiones")]
+        except sqlite3.Error as e:
+            logging.error(f"Error al listar sesiones: {e}")
+            return []
+
+    # --- Sorteos ---
+    def crear_sorteo(self, nombre, cantidad_numeros, premio=None, valor_numero=None):
+        conn = self._conexion()
+        try:
+            sorteo_id = conn.execute(
+                "INSERT INTO sorteos (nombre, premio, valor_numero, cantidad_numeros) VALUES (?, ?, ?, ?)",
+                (nombre, premio, valor_numero, cantidad_numeros)).lastrowid
+            conn.executemany("INSERT INTO numeros (sorteo_id, numero) VALUES (?, ?)",
+                             ((sorteo_id, numero) for numero in range(1, cantidad_numeros + 1)))
+            conn.commit()
+            return sorteo_id
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    def ultimo_sorteo(self):
+        try:
+            return self._uno("SELECT MAX(id) FROM sorteos")[0]
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener el último sorteo: {e}")
+            return None
+
+    def agregar_reserva(self, usuario_id, sorteo_id, numero, captura_url=None):
+        conn = self._conexion()
+        try:
+            cursor = conn.execute("UPDATE numeros SET disponible = 0 WHERE sorteo_id = ? AND numero = ? AND disponible = 1",
+                                  (sorteo_id, numero))
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return None
+            reserva_id = conn.execute(
+                "INSERT INTO reservas (usuario_id, sorteo_id, numero, captura_url) VALUES (?, ?, ?, ?)",
+                (usuario_id, sorteo_id, numero, captura_url)).lastrowid
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error al reservar el número {numero} del sorteo {sorteo_id}: {e}")
+            conn.rollback()
+            return None
+        # Después del commit: leer y hashear la imagen no retiene el candado de escritura
+        if captura_url and os.path.exists(captura_url):
+            capturas.registrar_captura(reserva_id, captura_url, ruta=self.ruta)
+        return reserva_id
+
+    def obtener_numeros(self, sorteo_id):
+        try:
+            return self._todos("SELECT numero, disponible FROM numeros WHERE sorteo_id = ? ORDER BY numero", (sorteo_id,))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener los números del sorteo {sorteo_id}: {e}")
+            return None
+
+    def obtener_version_tablero(self, sorteo_id):
+        try:
+            fila = self._uno("SELECT version_tablero FROM sorteos WHERE id = ?", (sorteo_id,))
+            return fila[0] if fila else None
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener la versión del tablero: {e}")
+            return None
+
+    def obtener_reservas_pendientes(self, despues_de_id, tamano):
+        try:
+            return self._todos("""
+                SELECT id, usuario_id, sorteo_id, numero, fecha_reserva, captura_url, duplicado_de, distancia_duplicado
+                FROM reservas
+                WHERE estado = 'pendiente' AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (despues_de_id, tamano))
+        except sqlite3.Error as e:
+            logging.error(f"Error al obtener reservas pendientes: {e}")
+            return []
+
+    def contar_reservas_pendientes(self):
+        try:
+            return self._uno("SELECT COUNT(*) FROM reservas WHERE estado = 'pendiente'")[0]
+        except sqlite3.Error as e:
+            logging.error(f"Error al contar reservas pendientes: {e}")
+            return 0
+
+    def resolver_reservas(self, reserva_ids, estado):
+        reserva_ids = sorted(set(reserva_ids))
+        if not reserva_ids:
+            return []
+        marcadores = ", ".join("?" * len(reserva_ids))
+        conn = self._conexion()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            resueltas = conn.execute(f"""
+                SELECT id, usuario_id, sorteo_id, numero FROM reservas
+                WHERE id IN ({marcadores}) AND estado = 'pendiente'
+            """, reserva_ids).fetchall()
+            conn.execute(f"UPDATE reservas SET estado = ? WHERE id IN ({marcadores}) AND estado = 'pendiente'",
+                         [estado] + reserva_ids)
+            if estado == "rechazada" and resueltas:
+                # Solo las que estaban pendientes: una reserva ya confirmada conserva su número
+                conn.executemany("UPDATE numeros SET disponible = 1 WHERE sorteo_id = ? AND numero = ?",
+                                 [(sorteo_id, numero) for _, _, sorteo_id, numero in resueltas])
+            conn.commit()
+            return resueltas
+        except sqlite3.Error as e:
+            logging.error(f"Error al resolver reservas: {e}")
+            conn.rollback()
+            return None
+
+
+# --- Memoria ---
+class AlmacenamientoMemoria(Almacenamiento):
+    """Implementación en memoria, sin disco, para pruebas y benchmarks de los handlers."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.vendedores = {}  # id -> (usuario, contrasena, nombre)
+        self.vendedores_por_usuario = {}
+        self.productos = {}  # id -> (nombre, precio_compra, precio_venta)
+        self.inventario = {}  # (vendedor_id, producto_id) -> cantidad
+        self.movimientos = []  # (vendedor_id, producto_id, tipo, cantidad), como movimientos_inventario
+        self.ventas = []  # (id, vendedor_id, producto_id, cantidad_vendida, comision, fecha)
+        self.sesiones = {}  # chat_id -> (vendedor_id, fecha_inicio)
+        self.sorteos = {}  # id -> {"nombre", "premio", "valor_numero", "version"}
+        self.numeros = {}  # sorteo_id -> {numero: disponible}
+        self.reservas = {}  # id -> [usuario_id, sorteo_id, numero, fecha, estado, captura_url, duplicado_de, distancia]
+        self.capturas = capturas.IndiceCapturas()
+
+    @staticmethod
+    def _ahora():
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    # --- Vendedores ---
+    def agregar_vendedor(self, usuario, contrasena, nombre):
+        with self._lock:
+            if usuario in self.vendedores_por_usuario:
+                raise sqlite3.IntegrityError(f"UNIQUE constraint failed: vendedores.usuario ({usuario})")
+            vendedor_id = len(self.vendedores) + 1
+            self.vendedores[vendedor_id] = (usuario, contrasena, nombre)
+            self.vendedores_por_usuario[usuario] = vendedor_id
+            return vendedor_id
+
+    def obtener_vendedor(self, usuario):
+        with self._lock:
+            vendedor_id = self.vendedores_por_usuario.get(usuario)
+            if vendedor_id is None:
+                return None
+            _, contrasena, nombre = self.vendedores[vendedor_id]
+            return vendedor_id, nombre, contrasena
+
+    def actualizar_contrasena(self, vendedor_id, contrasena):
+        with self._lock:
+            vendedor = self.vendedores.get(vendedor_id)
+            if vendedor is None:
+                return False
+            self.vendedores[vendedor_id] = (vendedor[0], contrasena, vendedor[2])
+            return True
+
+    def obtener_vendedor_por_id(self, vendedor_id):
+        with self._lock:
+            vendedor = self.vendedores.get(vendedor_id)
+            return (vendedor_id, vendedor[2]) if vendedor else None
+
+    def listar_vendedores(self):
+        with self._lock:
+            return [(vendedor_id, v[2]) for vendedor_id, v in sorted(self.vendedores.items())]
+
+    # --- Productos ---
+    def agregar_producto(self, nombre, precio_compra, precio_venta):
+        with self._lock:
+            producto_id = len(self.productos) + 1
+            self.productos[producto_id] = (nombre, precio_compra, precio_venta)
+            return producto_id
+
+    def obtener_productos(self):
+        with self._lock:
+            return [(producto_id, p[0]) for producto_id, p in sorted(self.productos.items())]
+
+    def obtener_producto(self, producto_id):
+        with self._lock:
+            producto = self.productos.get(producto_id)
+            return (producto[1], producto[2], producto[0]) if producto else None
+
+    # --- Inventario ---
+    def fijar_inventario(self, vendedor_id, producto_id, cantidad):
+        with self._lock:
+            clave = (vendedor_id, producto_id)
+            anterior = self.inventario.get(clave)
+            if anterior is None and cantidad:
+                self.movimientos.append((vendedor_id, producto_id, "entrega", cantidad))
+            elif anterior is not None and anterior != cantidad:
+                self.movimientos.append((vendedor_id, producto_id, "ajuste", cantidad - anterior))
+            self.inventario[clave] = cantidad
+
+    def obtener_inventario(self, vendedor_id, producto_id):
+        with self._lock:
+            return self.inventario.get((vendedor_id, producto_id), 0)
+
+    def obtener_movimientos(self, vendedor_id, producto_id):
+        with self._lock:
+            return [(tipo, cantidad) for v_id, p_id, tipo, cantidad in self.movimientos
+                    if (v_id, p_id) == (vendedor_id, producto_id)]
+
+    # --- Ventas ---
+    def registrar_venta(self, vendedor_id, producto_id, cantidad_vendida, comision):
+        with self._lock:
+            clave = (vendedor_id, producto_id)
+            if self.inventario.get(clave, 0) < cantidad_vendida or clave not in self.inventario:
+                return False
+            self.inventario[clave] -= cantidad_vendida
+            self.movimientos.append((vendedor_id, producto_id, "venta", -cantidad_vendida))
+            self.ventas.append((len(self.ventas) + 1, vendedor_id, producto_id, cantidad_vendida, comision, self._ahora()))
+            return True
+
+    def obtener_ventas_diarias(self, vendedor_id):
+        hoy = self._ahora()[:10]
+        with self._lock:
+            por_nombre = {}
+            for _, v_id, producto_id, cantidad, comision, fecha in self.ventas:
+                if v_id != vendedor_id or fecha[:10] != hoy or producto_id not in self.productos:
+                    continue
+                nombre, _, precio_venta = self.productos[producto_id]
+                fila = por_nombre.setdefault(nombre, [nombre, 0, 0.0, 0.0, producto_id])
+                fila[1] += cantidad
+                fila[2] += precio_venta * cantidad
+                fila[3] += comision
+            return [tuple(fila) for _, fila in sorted(por_nombre.items())]
+
+    # --- Sesiones ---
+    def crear_sesion(self, chat_id, vendedor_id):
+        with self._lock:
+            if chat_id in self.sesiones:
+                return False
+            self.sesiones[chat_id] = (vendedor_id, date.today())
+            return True
+
+    def verificar_sesion(self, chat_id):
+        with self._lock:
+            sesion = self.sesiones.get(chat_id)
+            return sesion[0] if sesion else None
+
+    def cerrar_sesion(self, chat_id):
+        with self._lock:
+            self.sesiones.pop(chat_id, None)
+            return True
+
+    def listar_sesiones(self):
+        with self._lock:
+            return [(chat_id, vendedor_id, str(fecha_inicio)) for chat_id, (vendedor_id, fecha_inicio) in self.sesiones.items()]
+
+    # --- Sorteos ---
+    def crear_sorteo(self, nombre, cantidad_numeros, premio=None, valor_numero=None):
+        with self._lock:
+            sorteo_id = len(self.sorteos) + 1
+            self.sorteos[sorteo_id] = {"nombre": nombre, "premio": premio, "valor_numero": valor_numero,
+                                       "version": cantidad_numeros}
+            self.numeros[sorteo_id] = {numero: 1 for numero in range(1, cantidad_numeros + 1)}
+            return sorteo_id
+
+    def ultimo_sorteo(self):
+        with self._lock:
+            return max(self.sorteos, default=None)
+
+    def agregar_reserva(self, usuario_id, sorteo_id, numero, captura_url=None):
+        with self._lock:
+            numeros = self.numeros.get(sorteo_id, {})
+            if numeros.get(numero) != 1:
+                return None
+            numeros[numero] = 0
+            self.sorteos[sorteo_id]["version"] += 1
+            reserva_id = len(self.reservas) + 1
+            self.reservas[reserva_id] = [usuario_id, sorteo_id, numero, self._ahora(), "pendiente", captura_url, None, None]
+        # Igual que en SQLite: la imagen se lee fuera del candado
+        hashes = capturas.hashear_captura(captura_url) if captura_url and os.path.exists(captura_url) else None
+        if hashes:
+            coincidencias = self.capturas.similares(*hashes, excluir_reserva_id=reserva_id)
+            if coincidencias:
+                with self._lock:
+                    self.reservas[reserva_id][6:8] = [coincidencias[0][1], coincidencias[0][0]]
+            self.capturas.insertar(reserva_id, *hashes)
+            capturas.avisar_coincidencias(reserva_id, coincidencias)
+        return reserva_id
+
+    def obtener_numeros(self, sorteo_id):
+        with self._lock:
+            return sorted(self.numeros.get(sorteo_id, {}).items())
+
+    def obtener_version_tablero(self, sorteo_id):
+        with self._lock:
+            sorteo = self.sorteos.get(sorteo_id)
+            return sorteo["version"] if sorteo else None
+
+    def obtener_reservas_pendientes(self, despues_de_id, tamano):
+        with self._lock:
+            filas = []
+            for reserva_id in sorted(self.reservas):
+                r = self.reservas[reserva_id]
+                if reserva_id > despues_de_id and r[4] == "pendiente":
+                    filas.append((reserva_id, r[0], r[1], r[2], r[3], r[5], r[6], r[7]))
+                    if len(filas) == tamano:
+                        break
+            return filas
+
+    def contar_reservas_pendientes(self):
+        with self._lock:
+            return sum(1 for r in self.reservas.values() if r[4] == "pendiente")
+
+    def resolver_reservas(self, reserva_ids, estado):
+        with self._lock:
+            resueltas = []
+            for reserva_id in sorted(set(reserva_ids)):
+                r = self.reservas.get(reserva_id)
+                if r is None or r[4] != "pendiente":
+                    continue
+                r[4] = estado
+                if estado == "rechazada" and self.numeros.get(r[1], {}).get(r[2]) == 0:
+                    self.numeros[r[1]][r[2]] = 1
+                    self.sorteos[r[1]]["version"] += 1
+                resueltas.append((reserva_id, r[0], r[1], r[2]))
+            return resueltas
+
+
+# --- Almacenamiento por Defecto ---
+_ALMACEN = None
+_ALMACEN_LOCK = threading.Lock()
+
+def configurar(almacen):
+    """Fija el almacenamiento que usan el bot y los módulos de sorteo."""
+    global _ALMACEN
+    with _ALMACEN_LOCK:
+        _ALMACEN = almacen
+
+def obtener_almacen():
+    """Devuelve el almacenamiento configurado (por defecto, SQLite sobre database.DATABASE_NAME)."""
+    global _ALMACEN
+    with _ALMACEN_LOCK:
+        if _ALMACEN is None:
+            _ALMACEN = AlmacenamientoSQLite(database.DATABASE_NAME)
+        return _ALMACEN
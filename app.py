@@ -0,0 +1,130 @@
+import csv
+import io
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+import telebot
+from dotenv import load_dotenv
+from flask import Flask, Response, abort, jsonify, render_template, request
+
+import almacenamiento
+import movimientos
+import reportes
+
+# --- Configuración ---
+load_dotenv("config.env")
+TOKEN = os.environ.get("TELEGRAM_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
+ADMIN_CHAT_ID = os.environ.get("ADMIN_CHAT_ID", "YOUR_ADMIN_CHAT_ID")
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # Requerido en la cabecera X-Admin-Token de las rutas /admin
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+app = Flask(__name__)
+bot = telebot.TeleBot(TOKEN)
+
+def hoy():
+    return datetime.now(timezone.utc).date()
+
+def notificar_admin(mensaje):
+    try:
+        bot.send_message(ADMIN_CHAT_ID, mensaje)
+    except Exception as e:
+        logging.error(f"Error al notificar al administrador: {e}")
+
+def exigir_admin():
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        abort(403)
+
+def respuesta_csv(filas, encabezados, nombre_archivo):
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(encabezados)
+    escritor.writerows(filas)
+    return Response(salida.getvalue(), mimetype="text/csv",
+                    headers={"Content-Disposition": f"attachment; filename={nombre_archivo}"})
+
+
+# --- Panel ---
+@app.route("/")
+def index():
+    dia = hoy()
+    inicio_semana = dia - timedelta(days=6)
+    inicio_mes = dia.replace(day=1)
+
+    vendedores = []
+    total_ventas_diarias = 0
+    for vendedor_id, nombre in almacenamiento.obtener_almacen().listar_vendedores():
+        ganancias_diarias, comisiones_totales = reportes.totales_vendedor(vendedor_id, dia, dia)
+        ganancia_semanal, comision_semanal = reportes.totales_vendedor(vendedor_id, inicio_semana, dia)
+        ganancia_mensual, comision_mensual = reportes.totales_vendedor(vendedor_id, inicio_mes, dia)
+        total_ventas_diarias += ganancias_diarias
+        vendedores.append({
+            "id": vendedor_id,
+            "nombre": nombre,
+            "ventas_diarias": reportes.ventas_por_producto(vendedor_id, dia, dia),
+            "ganancias_diarias": ganancias_diarias,
+            "comisiones_totales": comisiones_totales,
+            "ganancia_semanal": ganancia_semanal,
+            "comision_semanal": comision_semanal,
+            "ganancia_mensual": ganancia_mensual,
+            "comision_mensual": comision_mensual,
+            "inventario": reportes.inventario_vendedor(vendedor_id),
+            "sugerencias": reportes.sugerencias_vendedor(vendedor_id),
+        })
+
+    return render_template("index.html", vendedores=vendedores, total_ventas_diarias=f"{total_ventas_diarias:.2f}",
+                           all_ventas=reportes.ventas_detalle(dia, dia), today=dia.isoformat())
+
+@app.route("/exportar_csv/<int:vendedor_id>")
+def exportar_csv(vendedor_id):
+    dia = hoy()
+    filas = reportes.ventas_detalle(dia, dia, vendedor_id)
+    return respuesta_csv(filas, ["Fecha", "Producto", "Cantidad", "Precio", "Total", "Comisión", "Vendedor"],
+                         f"ventas_{vendedor_id}_{dia.isoformat()}.csv")
+
+@app.route("/exportar_csv_all")
+def exportar_csv_all():
+    dia = hoy()
+    filas = reportes.ventas_detalle(dia, dia)
+    return respuesta_csv(filas, ["Fecha", "Producto", "Cantidad", "Precio", "Total", "Comisión", "Vendedor"],
+                         f"ventas_{dia.isoformat()}.csv")
+
+
+# --- Administración de Inventario ---
+def leer_lineas_json(campos):
+    datos = request.get_json(silent=True) or {}
+    try:
+        return [tuple(int(linea[campo]) for campo in campos) for linea in datos["lineas"]]
+    except (KeyError, TypeError, ValueError):
+        abort(400, description=f"Se espera {{\"lineas\": [{{{', '.join(campos)}}}]}} con enteros.")
+
+def aplicar_operacion(operacion, campos, titulo, signo=1):
+    exigir_admin()
+    lineas = leer_lineas_json(campos)
+    exito, motivo = operacion(lineas, nota="Panel web")
+    if not exito:
+        return jsonify({"ok": False, "error": motivo}), 409
+    almacen = almacenamiento.obtener_almacen()
+    notificar_admin(movimientos.resumen_movimientos(titulo, lineas, dict(almacen.listar_vendedores()),
+                                                    dict(almacen.obtener_productos()), signo))
+    return jsonify({"ok": True, "lineas": len(lineas)})
+
+@app.route("/admin/reabastecer", methods=["POST"])
+def admin_reabastecer():
+    return aplicar_operacion(movimientos.reabastecer, ("vendedor_id", "producto_id", "cantidad"),
+                             "📦 Reabastecimiento aplicado desde el panel:")
+
+@app.route("/admin/transferir", methods=["POST"])
+def admin_transferir():
+    return aplicar_operacion(movimientos.transferir_lote, ("origen_id", "destino_id", "producto_id", "cantidad"),
+                             "🔁 Transferencia aplicada desde el panel:")
+
+@app.route("/admin/devolucion", methods=["POST"])
+def admin_devolucion():
+    return aplicar_operacion(movimientos.devolver, ("vendedor_id", "producto_id", "cantidad"),
+                             "↩️ Devolución al depósito aplicada desde el panel:", signo=-1)
+
+
+if __name__ == '__main__':
+    app.run(host=os.environ.get("FLASK_HOST", "127.0.0.1"), port=int(os.environ.get("FLASK_PORT", "5000")))
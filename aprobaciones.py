@@ -0,0 +1,47 @@
+import logging
+
+import almacenamiento
+
+TAMANO_PAGINA = 10  # una página cabe en un solo álbum de Telegram
+
+def obtener_pendientes(despues_de_id=0, tamano=TAMANO_PAGINA):
+    """
+    Devuelve una página de reservas pendientes con id mayor que `despues_de_id`.
+
+    Cada fila es (id, usuario_id, sorteo_id, numero, fecha_reserva, captura_url,
+    duplicado_de, distancia_duplicado).
+    """
+    return almacenamiento.obtener_almacen().obtener_reservas_pendientes(despues_de_id, tamano)
+
+def contar_pendientes():
+    return almacenamiento.obtener_almacen().contar_reservas_pendientes()
+
+def resolver_reservas(reserva_ids, estado):
+    """
+    Confirma o rechaza varias reservas pendientes en una sola transacción.
+
+    Las reservas rechazadas liberan su número. Devuelve la lista de
+    (reserva_id, usuario_id, sorteo_id, numero) que cambiaron de estado, o None si falla.
+    """
+    if estado not in ("confirmada", "rechazada"):
+        raise ValueError(f"Estado inválido: {estado}")
+    resueltas = almacenamiento.obtener_almacen().resolver_reservas(reserva_ids, estado)
+    if resueltas is not None:
+        logging.info(f"{len(resueltas)} reservas marcadas como {estado}.")
+    return resueltas
+
+def mensajes_para_usuarios(resueltas, estado):
+    """Agrupa las reservas resueltas por usuario: un solo mensaje por persona. Devuelve [(usuario_id, texto)]."""
+    por_usuario = {}
+    for _, usuario_id, sorteo_id, numero in resueltas:
+        por_usuario.setdefault(usuario_id, []).append((sorteo_id, numero))
+
+    mensajes = []
+    for usuario_id, numeros in por_usuario.items():
+        lista = ", ".join(f"#{numero} (sorteo {sorteo_id})" for sorteo_id, numero in sorted(numeros))
+        if estado == "confirmada":
+            texto = f"✅ ¡Tu pago fue confirmado! Números: {lista}. ¡Mucha suerte! 🍀"
+        else:
+            texto = f"❌ Tu pago fue rechazado para los números: {lista}. Contacta al administrador si crees que es un error."
+        mensajes.append((usuario_id, texto))
+    return mensajes
@@ -0,0 +1,150 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import database
+
+# Ventas frías: una base aparte con la misma tabla `ventas`, adjuntada como `archivo` solo
+# cuando una consulta pide fechas anteriores al corte. La base principal guarda el corte
+# (metadatos 'ventas_archivadas_hasta', primer día que sigue en caliente) y los agregados
+# mensuales de lo archivado, con el total al precio vigente en el momento de archivar.
+ARCHIVO_DATABASE_NAME = os.getenv("ARCHIVO_DATABASE_NAME",
+                                  os.path.splitext(database.DATABASE_NAME)[0] + "_archivo.db")
+MESES_CALIENTES = 2  # el mes en curso y el anterior siempre quedan en la tabla caliente
+HORAS_ENTRE_ARCHIVADOS = 24
+
+_COLUMNAS = "id, vendedor_id, producto_id, cantidad_vendida, comision, fecha"
+
+def obtener_corte(conn):
+    """Primer día ('YYYY-MM-DD') que sigue en la tabla caliente, o None si nunca se archivó."""
+    try:
+        fila = conn.execute("SELECT valor FROM metadatos WHERE clave = 'ventas_archivadas_hasta'").fetchone()
+    except sqlite3.OperationalError:
+        return None  # la tabla metadatos todavía no existe
+    return fila[0] if fila else None
+
+def adjuntar_archivo(conn, ruta=None):
+    """Adjunta la base de archivo como `archivo` (creándola si hace falta). Es idempotente."""
+    if any(nombre == "archivo" for _, nombre, _ in conn.execute("PRAGMA database_list")):
+        return
+    conn.execute("ATTACH DATABASE ? AS archivo", (ruta or ARCHIVO_DATABASE_NAME,))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archivo.ventas (
+            id INTEGER PRIMARY KEY,
+            vendedor_id INTEGER NOT NULL,
+            producto_id INTEGER NOT NULL,
+            cantidad_vendida INTEGER NOT NULL,
+            comision REAL NOT NULL,
+            fecha TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS archivo.idx_ventas_fecha ON ventas (fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archivo.idx_ventas_vendedor_fecha ON ventas (vendedor_id, fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archivo.idx_ventas_vendedor_id ON ventas (vendedor_id, id)")
+
+def fuente_ventas(conn, desde=None):
+    """
+    Devuelve la expresión SQL a usar en lugar de `ventas` para leer desde `desde` (None = toda la historia).
+
+    Si el rango no llega a lo archivado es simplemente `ventas`; si lo alcanza, adjunta el
+    archivo y une ambas partes, cada una limitada a su lado del corte para no contar dos
+    veces las filas de un archivado interrumpido.
+    """
+    corte = obtener_corte(conn)
+    if corte is None or (desde is not None and str(desde) >= corte):
+        return "ventas"
+    adjuntar_archivo(conn)
+    corte = date.fromisoformat(corte).isoformat()  # solo se interpola una fecha válida
+    return f"""(SELECT {_COLUMNAS} FROM archivo.ventas WHERE fecha < '{corte}'
+                UNION ALL
+                SELECT {_COLUMNAS} FROM main.ventas WHERE fecha >= '{corte}')"""
+
+
+# --- Archivado ---
+def primer_dia_caliente(hoy=None, meses_calientes=MESES_CALIENTES):
+    hoy = hoy or datetime.now(timezone.utc).date()
+    indice = hoy.year * 12 + hoy.month - 1 - (meses_calientes - 1)
+    return date(indice // 12, indice % 12 + 1, 1)
+
+def _registrar_agregados(conn, desde, hasta, tabla):
+    """(Re)escribe ventas_mensuales para los meses de [desde, hasta) a partir de `tabla`."""
+    conn.execute("DELETE FROM ventas_mensuales WHERE mes >= substr(?, 1, 7) AND mes < substr(?, 1, 7)", (desde, hasta))
+    conn.execute(f"""
+        INSERT INTO ventas_mensuales (mes, vendedor_id, producto_id, cantidad, comision, total)
+        SELECT substr(v.fecha, 1, 7), v.vendedor_id, v.producto_id, SUM(v.cantidad_vendida), SUM(v.comision),
+               SUM(v.cantidad_vendida * COALESCE(p.precio_venta, 0))
+        FROM {tabla} v
+        LEFT JOIN productos p ON v.producto_id = p.id
+        WHERE v.fecha >= ? AND v.fecha < ?
+        GROUP BY 1, 2, 3
+    """, (desde, hasta))
+
+def archivar_meses_cerrados(hoy=None, meses_calientes=MESES_CALIENTES, ruta=None, ruta_archivo=None):
+    """
+    Mueve a la base de archivo las ventas anteriores a los `meses_calientes` más recientes.
+
+    Primero copia al archivo y confirma; después, en una sola transacción de la base
+    principal, guarda los agregados mensuales, borra las filas calientes y avanza el corte.
+    Si se interrumpe entre ambos pasos, volver a ejecutarlo termina el trabajo. Devuelve
+    cuántas ventas se movieron, o None si falló.
+    """
+    conn = database.crear_conexion(ruta)
+    if conn is None:
+        return None
+    inicio = time.perf_counter()
+    hasta = primer_dia_caliente(hoy, meses_calientes).isoformat()
+    try:
+        corte = obtener_corte(conn)
+        if corte is not None and corte >= hasta:
+            return 0
+        adjuntar_archivo(conn, ruta_archivo)
+
+        with conn:
+            conn.execute(f"INSERT OR IGNORE INTO archivo.ventas ({_COLUMNAS}) SELECT {_COLUMNAS} FROM main.ventas WHERE fecha < ?",
+                         (hasta,))
+        with conn:
+            desde = conn.execute("SELECT MIN(fecha) FROM main.ventas WHERE fecha < ?", (hasta,)).fetchone()[0]
+            if desde is not None:
+                _registrar_agregados(conn, desde[:7] + "-01", hasta, "main.ventas")
+            movidas = conn.execute("DELETE FROM main.ventas WHERE fecha < ?", (hasta,)).rowcount
+            conn.execute("""
+                INSERT INTO metadatos (clave, valor) VALUES ('ventas_archivadas_hasta', ?)
+                ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor
+            """, (hasta,))
+        logging.info(f"Archivado de ventas: {movidas} filas anteriores a {hasta} en {time.perf_counter() - inicio:.2f}s")
+        return movidas
+    except sqlite3.Error as e:
+        logging.error(f"Error al archivar ventas: {e}")
+        return None
+    finally:
+        conn.close()
+
+def iniciar_archivado_periodico(horas=HORAS_ENTRE_ARCHIVADOS):
+    """Archiva ahora y luego cada `horas` en un hilo en segundo plano; solo trabaja al cerrar un mes."""
+    parada = threading.Event()
+
+    def ciclo():
+        while not parada.is_set():
+            archivar_meses_cerrados()
+            parada.wait(horas * 3600)
+
+    threading.Thread(target=ciclo, name="archivado-ventas", daemon=True).start()
+    return parada
+
+def recalcular_agregados(conn, desde, hasta):
+    """Rehace los agregados de los meses archivados que tocan [desde, hasta] tras modificar ventas frías."""
+    corte = obtener_corte(conn)
+    if corte is None or str(desde) >= corte:
+        return
+    inicio = str(desde)[:7] + "-01"
+    fin = min(corte, primer_dia_caliente(date.fromisoformat(str(hasta)), 0).isoformat())
+    adjuntar_archivo(conn)
+    _registrar_agregados(conn, inicio, fin, "archivo.ventas")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    archivar_meses_cerrados()
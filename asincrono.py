@@ -0,0 +1,272 @@
+"""
+Entrada asyncio del bot: `python asincrono.py` en lugar de `python main.py`.
+
+Usa AsyncTeleBot (aiohttp) para el polling y las llamadas a Telegram, y corre el flujo de
+los vendedores (inicio de sesión, ventas, historial y sus páginas) con las vistas y
+transiciones de main, así que textos, teclados y estado (USUARIO, VENTA, MENSAJES) son los
+mismos. Todo lo que toca SQLite pasa por un pool chico y propio (en_db) para no frenar el
+event loop, y las llamadas salientes que no dependen una de otra se esperan juntas con
+asyncio.gather: por ejemplo, editar el menú y borrar el mensaje del vendedor salen en paralelo.
+
+Los comandos de administración y el resto de los handlers síncronos de main se ejecutan
+tal cual, en otro pool, con el bot síncrono.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import asyncio_helper, types, util
+from telebot.async_telebot import AsyncTeleBot
+
+import limites
+import main
+from main import MENSAJES, USUARIO, VENTA
+
+HILOS_DB = 4  # sqlite3 no libera el GIL en todo; más hilos solo pelean por el candado de escritura
+HILOS_HEREDADOS = 4
+
+_pool_db = ThreadPoolExecutor(max_workers=HILOS_DB, thread_name_prefix="db")
+_pool_heredados = ThreadPoolExecutor(max_workers=HILOS_HEREDADOS, thread_name_prefix="heredados")
+
+bot = AsyncTeleBot(main.TOKEN)
+bot.setup_middleware(limites.MiddlewareLimitesAsincrono(main.bot_limites))
+if main.grabador_updates:
+    main.grabador_updates.envolver_asincrono(bot)
+
+def usar_pools(pool_db, pool_heredados):
+    """Reemplaza los pools propios por otros compartidos (ver inquilinos.py)."""
+    global _pool_db, _pool_heredados
+    _pool_db, _pool_heredados = pool_db, pool_heredados
+
+async def en_db(funcion, *args):
+    """Corre `funcion(*args)` en el pool de base de datos y espera el resultado."""
+    return await asyncio.get_running_loop().run_in_executor(_pool_db, funcion, *args)
+
+async def borrar_mensaje(message):
+    try:
+        await bot.delete_message(message.chat.id, message.message_id)
+    except asyncio_helper.ApiTelegramException as e:
+        logging.error(f"Error al borrar mensaje: {e}")
+
+async def responder(chat_id, texto, markup=None):
+    """Manda `texto` y lo deja como el mensaje activo del chat."""
+    msg = await bot.send_message(chat_id, texto, reply_markup=markup)
+    MENSAJES[chat_id] = msg.message_id
+
+async def mostrar_menu_principal(message):
+    chat_id = message.chat.id
+    texto, markup = main.vista_menu_principal(chat_id)
+    try:
+        await bot.edit_message_text(texto, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
+    except asyncio_helper.ApiTelegramException as e:
+        logging.error(f"Error al editar mensaje: {e}")
+        await bot.send_message(chat_id, texto, reply_markup=markup)
+
+async def avisar_bloqueo(chat_id):
+    aviso = main.registrar_bloqueo(chat_id)
+    if aviso is None:
+        return False
+    await bot.send_message(chat_id, aviso)
+    return True
+
+def continuar_en(loop, corrutina):
+    """Agenda `corrutina` en `loop` desde otro hilo; sus errores quedan en el log."""
+    def revisar(futuro):
+        if futuro.exception() is not None:
+            logging.error(f"Error en una continuación asíncrona: {futuro.exception()}")
+    asyncio.run_coroutine_threadsafe(corrutina, loop).add_done_callback(revisar)
+
+# --- Handlers ---
+@bot.message_handler(commands=['start'])
+async def cmd_start(message):
+    chat_id = message.chat.id
+    if await en_db(main.restaurar_sesion, chat_id):
+        await mostrar_menu_principal(message)
+        return
+    await responder(chat_id, *main.vista_inicio())
+
+@bot.callback_query_handler(func=lambda call: call.data == 'inicio_sesion')
+async def inicio_sesion(call):
+    chat_id = call.message.chat.id
+    USUARIO[chat_id] = {"estado": "esperando_usuario", "vendedor_id": None, "nombre": None}
+    await bot.edit_message_text("Por favor, ingresa tu usuario 👤:", chat_id, MENSAJES.get(chat_id),
+                                reply_markup=types.InlineKeyboardMarkup())
+
+@bot.message_handler(func=lambda message: USUARIO.get(message.chat.id, {}).get("estado") == "esperando_usuario")
+async def recibir_usuario(message):
+    chat_id = message.chat.id
+    usuario = message.text
+    vendedor = await en_db(main.get_vendedor, usuario)
+
+    async def contestar():
+        if vendedor:
+            main.aceptar_usuario(chat_id, usuario, vendedor)
+            await responder(chat_id, "Usuario correcto ✅. ¡Ingresa tu contraseña para acceder! 🔒:",
+                            main.teclado_volver('volver_inicio'))
+            return
+        main.bus_eventos.emitir("usuario_desconocido", chat_id=chat_id)
+        if not await avisar_bloqueo(chat_id):
+            await responder(chat_id, "Usuario incorrecto ❌. Intenta de nuevo o contacta al administrador.",
+                            main.teclado_volver('volver_inicio'))
+
+    await asyncio.gather(contestar(), borrar_mensaje(message))
+
+@bot.message_handler(func=lambda message: USUARIO.get(message.chat.id, {}).get("estado") == "esperando_contrasena")
+async def recibir_contrasena(message):
+    chat_id = message.chat.id
+    loop = asyncio.get_running_loop()
+    USUARIO[chat_id]["estado"] = "verificando"
+    # El resultado llega desde el pool de credenciales y se continúa en el event loop
+    enviado = main.verificador_credenciales.enviar(
+        USUARIO[chat_id]["usuario"], message.text,
+        lambda correcta: continuar_en(loop, terminar_login(message, correcta)))
+    if enviado:
+        await borrar_mensaje(message)
+        return
+    USUARIO[chat_id]["estado"] = "esperando_contrasena"
+    await asyncio.gather(
+        bot.send_message(chat_id, "Hay muchos inicios de sesión en curso ⏳. Intenta de nuevo en unos segundos."),
+        borrar_mensaje(message))
+
+async def terminar_login(message, correcta):
+    chat_id = message.chat.id
+    resultado = await en_db(main.aplicar_login, chat_id, correcta)
+    if resultado:
+        await mostrar_menu_principal(message)
+    elif resultado is False and not await avisar_bloqueo(chat_id):
+        await responder(chat_id, "Contraseña incorrecta ❌. Intenta de nuevo.", main.teclado_volver('volver_inicio'))
+
+@bot.callback_query_handler(func=lambda call: call.data == 'volver_inicio')
+async def volver_inicio(call):
+    USUARIO[call.message.chat.id] = {}
+    await cmd_start(call.message)
+
+@bot.callback_query_handler(func=lambda call: call.data == 'cerrar_sesion')
+async def cerrar_sesion_handler(call):
+    chat_id = call.message.chat.id
+    await en_db(main.cerrar_sesion, chat_id)
+    USUARIO[chat_id] = {}
+    await cmd_start(call.message)
+
+@bot.callback_query_handler(func=lambda call: call.data == 'venta' and USUARIO.get(call.message.chat.id, {}).get("estado") == "logeado")
+async def iniciar_venta(call):
+    chat_id = call.message.chat.id
+    VENTA[chat_id] = {"estado": "esperando_producto"}
+    texto, markup = main.vista_productos(await en_db(main.get_productos))
+    await bot.edit_message_text(texto, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
+
+@bot.callback_query_handler(func=lambda call: call.data == 'volver_productos')
+async def volver_productos(call):
+    await iniciar_venta(call)
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('producto_') and VENTA.get(call.message.chat.id, {}).get("estado") == "esperando_producto")
+async def seleccionar_producto(call):
+    chat_id = call.message.chat.id
+    producto_id = int(call.data.split('_')[1])
+    VENTA[chat_id]["producto_id"] = producto_id
+    VENTA[chat_id]["estado"] = "esperando_cantidad"
+    nombre_producto = (await en_db(main.get_producto, producto_id))[2]
+    await responder(chat_id, f"¡Excelente! Has seleccionado {nombre_producto} ✅ ¿Cuántas unidades vendiste? 🔢\n"
+                             "¡Ingresa la cantidad para registrar tus ganancias! 💰", main.teclado_volver())
+
+@bot.callback_query_handler(func=lambda call: call.data == 'cancelar_venta' and VENTA.get(call.message.chat.id, {}).get("estado") == "esperando_producto")
+async def cancelar_venta(call):
+    del VENTA[call.message.chat.id]
+    await mostrar_menu_principal(call.message)
+
+@bot.callback_query_handler(func=lambda call: call.data == 'volver_menu')
+async def volver_menu(call):
+    await mostrar_menu_principal(call.message)
+
+@bot.message_handler(func=lambda message: VENTA.get(message.chat.id, {}).get("estado") == "esperando_cantidad")
+async def registrar_cantidad(message):
+    chat_id = message.chat.id
+    cantidad = main.leer_cantidad(message.text)
+    if cantidad is None:
+        await asyncio.gather(
+            responder(chat_id, "Cantidad inválida ❌. Debe ser un número entero positivo.", main.teclado_volver()),
+            borrar_mensaje(message))
+        return
+
+    vendedor_id = USUARIO[chat_id]["vendedor_id"]
+    producto_id = VENTA[chat_id]["producto_id"]
+    inventario_actual = await en_db(main.get_inventario, vendedor_id, producto_id)
+    if inventario_actual < cantidad:
+        await asyncio.gather(
+            responder(chat_id, f"No hay suficiente inventario 😞. Tienes {inventario_actual} unidades disponibles.",
+                      main.teclado_volver()),
+            borrar_mensaje(message))
+        return
+
+    if await en_db(main.registrar_venta, vendedor_id, producto_id, cantidad):
+        VENTA.pop(chat_id, None)
+        await asyncio.gather(mostrar_menu_principal(message), borrar_mensaje(message))
+    else:
+        await asyncio.gather(
+            responder(chat_id, "Error al registrar la venta ❌. Contacta al administrador.", main.teclado_volver()),
+            borrar_mensaje(message))
+
+@bot.callback_query_handler(func=lambda call: call.data == 'historial' and USUARIO.get(call.message.chat.id, {}).get("estado") == "logeado")
+async def mostrar_historial_diario(call):
+    chat_id = call.message.chat.id
+    mensaje, markup = await en_db(main.vista_historial, USUARIO[chat_id]["vendedor_id"])
+    await bot.edit_message_text(mensaje, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('hist_') and USUARIO.get(call.message.chat.id, {}).get("estado") == "logeado")
+async def navegar_historial(call):
+    chat_id = call.message.chat.id
+    pagina = main.historial.leer_callback(call.data)
+    if pagina is None:
+        return
+    mensaje, markup = await en_db(main.vista_historial, USUARIO[chat_id]["vendedor_id"], *pagina)
+    try:
+        await bot.edit_message_text(mensaje, chat_id, call.message.message_id, reply_markup=markup)
+    except asyncio_helper.ApiTelegramException as e:
+        logging.info(f"No se editó el historial: {e}")
+
+# --- Handlers Síncronos ---
+def _buscar_heredado(handlers, update):
+    for handler in handlers:
+        if main.bot._test_message_handler(handler, update):
+            return handler["function"]
+    return None
+
+async def _delegar(handlers, update):
+    # Los filtros de admin y de estado son baratos; el handler (con su E/S bloqueante) va al pool
+    funcion = _buscar_heredado(handlers, update)
+    if funcion is not None:
+        await asyncio.get_running_loop().run_in_executor(_pool_heredados, funcion, update)
+
+# Se registran al final: solo reciben lo que ningún handler de arriba atendió
+@bot.message_handler(func=lambda message: True, content_types=util.content_type_media)
+async def delegar_mensaje(message):
+    await _delegar(main.bot.message_handlers, message)
+
+@bot.callback_query_handler(func=lambda call: True)
+async def delegar_callback(call):
+    await _delegar(main.bot.callback_query_handlers, call)
+
+# --- Main ---
+async def cerrar_sesion_http():
+    # La sesión aiohttp es global en telebot: la comparten todos los AsyncTeleBot del proceso
+    if asyncio_helper.session_manager.session is not None:
+        await asyncio_helper.session_manager.session.close()
+
+async def ejecutar():
+    await en_db(main.iniciar_servicios)
+    try:
+        logging.info("Bot asíncrono en marcha...")
+        await bot.infinity_polling()
+    finally:
+        await cerrar_sesion_http()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(ejecutar())
+    except Exception as e:
+        logging.exception(f"Error inesperado: {e}")
+    finally:
+        main.detener_servicios()
+        _pool_db.shutdown()
+        _pool_heredados.shutdown(wait=False)
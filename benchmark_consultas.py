@@ -0,0 +1,218 @@
+"""
+Mide las consultas calientes del bot sobre una base grande (ver generar_datos.py) y revisa
+que cada una use el índice que le corresponde:
+
+    python generar_datos.py grande.db --ventas 2000000
+    python benchmark_consultas.py grande.db
+    python benchmark_consultas.py grande.db --repeticiones 50 --escrituras
+
+No se copian las consultas: cada caso llama a la función real (del almacén, de reportes, del
+cierre...) con el rastreo de SQLite activado, así que lo que se revisa es exactamente el SQL
+que corre en producción. Para cada sentencia rastreada se pide EXPLAIN QUERY PLAN y el caso
+falla si el plan no usa el índice esperado con las condiciones esperadas (un índice usado
+sin su rango de fechas también recorre toda la historia) o si aparece un SCAN (recorrido
+completo) de una tabla que no esté en sus recorridos permitidos. Sale con código 1 si falla
+alguno, así que sirve para correrlo antes de publicar un cambio de consultas o de índices.
+
+Los casos de escritura (--escrituras) modifican la base: usarlos solo con bases sintéticas.
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+# Sentencias cuyo plan interesa; los INSERT ... VALUES, BEGIN, COMMIT y PRAGMA no tienen plan útil
+_CON_PLAN = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE)\b", re.IGNORECASE)
+_ESCANEO = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)")
+# Índice y condiciones que deben aparecer en el plan: sin las de fecha el índice se usa pero se recorre entero
+_VENTAS_DEL_VENDEDOR = "INDEX idx_ventas_vendedor_fecha (vendedor_id=? AND fecha>? AND fecha<?)"
+_VENTAS_DEL_DIA = "INDEX idx_ventas_fecha (fecha>? AND fecha<?)"
+_USO_INDICE = re.compile(r"USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)")
+
+class Caso:
+    """
+    Una consulta caliente: cómo ejecutarla, qué debe aparecer en su plan (índice y condiciones,
+    tal como los escribe EXPLAIN QUERY PLAN) y qué tablas puede recorrer enteras.
+    """
+
+    def __init__(self, nombre, ejecutar, esperados, recorridos=(), escritura=False):
+        self.nombre = nombre
+        self.ejecutar = ejecutar
+        self.esperados = esperados
+        self.recorridos = set(recorridos)
+        self.escritura = escritura
+
+def casos(almacen, reportes, cierre, movimientos, historial, conn, muestra):
+    vendedor_id, producto_id, sorteo_id, numero, pendientes = muestra
+    hoy = date.today()
+    semana = hoy - timedelta(days=6)
+    mes = hoy - timedelta(days=29)
+    _, _, _, _, primer_id, ultimo_id = historial.calcular_resumen(conn, vendedor_id, mes, hoy)
+    medio = ((primer_id or 0) + (ultimo_id or 0)) // 2  # una página del medio del mes
+
+    def rechazar_una():
+        # Cada llamada rechaza una reserva distinta: una ya rechazada no vuelve a liberar su número
+        if pendientes:
+            almacen.resolver_reservas([pendientes.pop()], "rechazada")
+
+    return [
+        Caso("vendedor por usuario", lambda: almacen.obtener_vendedor(f"vendedor{vendedor_id}"),
+             ["INDEX sqlite_autoindex_vendedores_1 (usuario=?)"]),
+        Caso("sesión por chat", lambda: almacen.verificar_sesion(100_000 + vendedor_id),
+             ["INTEGER PRIMARY KEY (rowid=?)"]),
+        Caso("inventario del vendedor", lambda: almacen.obtener_inventario(vendedor_id, producto_id),
+             ["INDEX idx_movimientos_vendedor_producto (vendedor_id=? AND producto_id=? AND id>?)"]),
+        Caso("ventas de hoy", lambda: almacen.obtener_ventas_diarias(vendedor_id),
+             [_VENTAS_DEL_VENDEDOR]),
+        Caso("números del sorteo", lambda: almacen.obtener_numeros(sorteo_id),
+             ["INDEX idx_numeros_sorteo_numero (sorteo_id=?)"]),
+        Caso("reservas pendientes", lambda: almacen.obtener_reservas_pendientes(0, 20),
+             ["INDEX idx_reservas_estado (estado=? AND id>?)"]),
+        Caso("contar pendientes", lambda: almacen.contar_reservas_pendientes(),
+             ["INDEX idx_reservas_estado (estado=?)"]),
+        Caso("reporte por producto (semana)", lambda: reportes.ventas_por_producto(vendedor_id, semana, hoy),
+             [_VENTAS_DEL_VENDEDOR]),
+        Caso("totales del vendedor (semana)", lambda: reportes.totales_vendedor(vendedor_id, semana, hoy),
+             [_VENTAS_DEL_VENDEDOR]),
+        Caso("detalle de ventas (hoy)", lambda: reportes.ventas_detalle(hoy, hoy),
+             [_VENTAS_DEL_DIA]),
+        Caso("ventas mensuales", lambda: reportes.ventas_mensuales(vendedor_id),
+             [("INDEX idx_ventas_vendedor_fecha (vendedor_id=?)", "INDEX idx_ventas_vendedor_id (vendedor_id=?)")]),
+        Caso("cierre del día", lambda: cierre.calcular_resumenes(conn, hoy),
+             [(_VENTAS_DEL_DIA, "INDEX idx_ventas_vendedor_fecha (ANY(vendedor_id) AND fecha>? AND fecha<?)")], recorridos=["vendedores"]),
+        Caso("historial: resumen (30 días)", lambda: historial.calcular_resumen(conn, vendedor_id, mes, hoy),
+             [_VENTAS_DEL_VENDEDOR]),
+        Caso("historial: página del medio", lambda: historial.leer_pagina(conn, vendedor_id, mes, hoy, "a", medio,
+                                                                          primer_id or 0, ultimo_id or 0),
+             ["INDEX idx_ventas_vendedor_id (vendedor_id=? AND id>? AND id<?)"]),
+        Caso("historial: numerar página", lambda: historial.contar_posteriores(conn, vendedor_id, mes, hoy, medio, ultimo_id or 0),
+             ["INDEX idx_ventas_vendedor_id (vendedor_id=? AND id>? AND id<?)"]),
+        Caso("stock histórico", lambda: movimientos.stock_en_fecha(vendedor_id, producto_id, semana.isoformat()),
+             ["INDEX idx_movimientos_vendedor_producto (vendedor_id=? AND producto_id=? AND id>?)"]),
+        Caso("registrar venta", lambda: almacen.registrar_venta(vendedor_id, producto_id, 1, 0.1),
+             ["INDEX idx_inventario_vendedor_producto (vendedor_id=? AND producto_id=?)"], escritura=True),
+        Caso("reservar número", lambda: almacen.agregar_reserva(1, sorteo_id, numero),
+             ["INDEX idx_numeros_sorteo_numero (sorteo_id=? AND numero=?)"], escritura=True),
+        Caso("rechazar reserva", rechazar_una,
+             ["INDEX idx_numeros_sorteo_numero (sorteo_id=? AND numero=?)"], escritura=True),
+    ]
+
+def revisar_plan(conn, sentencias, caso):
+    """Devuelve (problemas, índices usados) según EXPLAIN QUERY PLAN de las sentencias rastreadas."""
+    problemas, usados, detalles = [], set(), []
+    for sentencia in sentencias:
+        if not _CON_PLAN.match(sentencia):
+            continue
+        for _, _, _, detalle in conn.execute("EXPLAIN QUERY PLAN " + sentencia):
+            detalles.append(detalle)
+            usados.update(indice for par in _USO_INDICE.findall(detalle) for indice in par if indice)
+            escaneo = _ESCANEO.match(detalle)
+            if escaneo and escaneo.group(1) not in caso.recorridos:
+                problemas.append(f"{detalle}  <-  {' '.join(sentencia.split())[:100]}")
+    for esperado in caso.esperados:
+        # Una tupla acepta cualquiera de sus alternativas (el planificador elige según las estadísticas)
+        alternativas = (esperado,) if isinstance(esperado, str) else esperado
+        if not any(alternativa in detalle for alternativa in alternativas for detalle in detalles):
+            problemas.append("el plan no usa " + " ni ".join(alternativas))
+    return problemas, usados
+
+def _muestra(conn):
+    """El vendedor y el producto de la última venta, un sorteo, un número libre y reservas pendientes."""
+    vendedor_id, producto_id = conn.execute("""
+        SELECT vendedor_id, producto_id FROM ventas ORDER BY id DESC LIMIT 1
+    """).fetchone() or (1, 1)
+    sorteo_id, numero = conn.execute("SELECT sorteo_id, numero FROM numeros WHERE disponible = 1 LIMIT 1").fetchone() or (1, 1)
+    pendientes = [fila[0] for fila in conn.execute("SELECT id FROM reservas WHERE estado = 'pendiente' LIMIT 1000")]
+    return vendedor_id, producto_id, sorteo_id, numero, pendientes
+
+def medir(ruta, repeticiones=20, escrituras=False):
+    """Corre los casos y devuelve [(nombre, [ms], problemas, índices usados)]."""
+    # Los módulos leen DATABASE_NAME al importarse
+    os.environ["DATABASE_NAME"] = ruta
+    import almacenamiento
+    import cierre
+    import database
+    import historial
+    import movimientos
+    import reportes
+
+    rastreadas = []
+    rastreando = True
+
+    def anotar(sentencia):
+        if rastreando:
+            rastreadas.append(sentencia)
+
+    # reportes, cierre y movimientos abren una conexión por llamada: todas quedan rastreadas
+    crear_conexion = database.crear_conexion
+
+    def crear_conexion_rastreada(ruta=None):
+        conn = crear_conexion(ruta)
+        if conn is not None:
+            conn.set_trace_callback(anotar)
+        return conn
+
+    database.crear_conexion = crear_conexion_rastreada
+    almacen = almacenamiento.AlmacenamientoSQLite(ruta)
+    almacen._conexion().set_trace_callback(anotar)
+    conn = sqlite3.connect(ruta)
+    conn.set_trace_callback(anotar)
+    planes = sqlite3.connect(ruta)
+
+    resultados = []
+    try:
+        # crear_conexion anuncia cada conexión por stdout; en una medición solo ensucia
+        with contextlib.redirect_stdout(io.StringIO()):
+            for caso in casos(almacen, reportes, cierre, movimientos, historial, conn, _muestra(planes)):
+                if caso.escritura and not escrituras:
+                    continue
+                rastreadas.clear()
+                rastreando = True
+                caso.ejecutar()
+                rastreando = False
+                problemas, usados = revisar_plan(planes, rastreadas, caso)
+                tiempos = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    caso.ejecutar()
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                resultados.append((caso.nombre, tiempos, problemas, usados))
+    finally:
+        database.crear_conexion = crear_conexion
+        almacen.cerrar()
+        conn.close()
+        planes.close()
+    return resultados
+
+def informe(resultados):
+    lineas = [f"{'consulta':<32}{'media ms':>10}{'p50':>9}{'p95':>9}{'máx':>9}  índices"]
+    for nombre, tiempos, problemas, usados in resultados:
+        ordenados = sorted(tiempos) or [0.0]
+        p95 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))]
+        lineas.append(f"{nombre:<32}{sum(ordenados) / len(ordenados):>10.2f}{ordenados[len(ordenados) // 2]:>9.2f}"
+                      f"{p95:>9.2f}{ordenados[-1]:>9.2f}  {', '.join(sorted(usados)) or '-'}")
+        lineas += [f"    FALLA: {problema}" for problema in problemas]
+    fallidos = sum(1 for _, _, problemas, _ in resultados if problemas)
+    lineas.append(f"\n{len(resultados)} consultas, {fallidos} con problemas de plan")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide las consultas calientes y revisa sus planes de ejecución.")
+    parser.add_argument("ruta", help="base a medir (idealmente generada con generar_datos.py)")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--escrituras", action="store_true", help="incluir casos que modifican la base")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.ruta):
+        sys.exit(f"{args.ruta} no existe")
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    resultados = medir(args.ruta, args.repeticiones, args.escrituras)
+    print(informe(resultados))
+    sys.exit(1 if any(problemas for _, _, problemas, _ in resultados) else 0)
@@ -6,6 +6,8 @@ import logging
 from dotenv import load_dotenv
 from datetime import datetime, date
 
+import credenciales
+
 # --- Configuración ---
 load_dotenv("config.env")
 TOKEN = os.environ.get("TELEGRAM_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
@@ -129,7 +131,8 @@ def insertar_datos_iniciales():
 
         for usuario, contrasena, nombre in USUARIOS_INICIALES:
             try:
-                cursor.execute("INSERT INTO vendedores (usuario, contrasena, nombre) VALUES (?, ?, ?)", (usuario, contrasena, nombre))
+                cursor.execute("INSERT INTO vendedores (usuario, contrasena, nombre) VALUES (?, ?, ?)",
+                               (usuario, credenciales.hashear(contrasena), nombre))
             except sqlite3.IntegrityError:
                 logging.warning(f"El vendedor {usuario} ya existe.")
 
@@ -167,6 +170,16 @@ def get_vendedor(usuario):
         logging.error(f"Error al obtener vendedor: {e}")
         return None
 
+def actualizar_contrasena(vendedor_id, contrasena):
+    """Guarda el hash nuevo que devuelve credenciales.verificar (texto plano viejo o parámetros desactualizados)."""
+    try:
+        conn = sqlite3.connect(DATABASE_NAME)
+        conn.execute("UPDATE vendedores SET contrasena = ? WHERE id = ?", (contrasena, vendedor_id))
+        conn.commit()
+        conn.close()
+    except sqlite3.Error as e:
+        logging.error(f"Error al actualizar la contraseña: {e}")
+
 def get_productos():
     try:
         conn = sqlite3.connect(DATABASE_NAME)
@@ -356,9 +369,9 @@ def cmd_start(message):
     vendedor_id_sesion = verificar_sesion_activa(chat_id)
 
     if vendedor_id_sesion:
-        vendedor = next((v for v in USUARIOS_INICIALES if v[0] == f"vendedor{vendedor_id_sesion}"), None)
+        vendedor = get_vendedor_by_id(vendedor_id_sesion)
         if vendedor:
-            nombre_vendedor = vendedor[2]
+            nombre_vendedor = vendedor[1]
             USUARIO[chat_id] = {"estado": "logeado", "vendedor_id": vendedor_id_sesion, "nombre": nombre_vendedor}
             mostrar_menu_principal(message)
             return
@@ -387,7 +400,7 @@ def recibir_usuario(message):
     if vendedor:
         USUARIO[chat_id]["vendedor_id"] = vendedor[0]
         USUARIO[chat_id]["nombre"] = vendedor[1]
-        USUARIO[chat_id]["contrasena"] = vendedor[2]
+        USUARIO[chat_id]["usuario"] = usuario
         USUARIO[chat_id]["estado"] = "esperando_contrasena"
         markup = types.InlineKeyboardMarkup()
         markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_inicio'))
@@ -404,10 +417,14 @@ def recibir_usuario(message):
 def recibir_contrasena(message):
     chat_id = message.chat.id
     contrasena = message.text
-    if USUARIO[chat_id]["contrasena"] == contrasena:
+    # Lo guardado es un hash de credenciales.py (main.py migra y rehashea los textos planos viejos)
+    vendedor = get_vendedor(USUARIO[chat_id]["usuario"])
+    correcta, nuevo_hash = credenciales.verificar(contrasena, vendedor[2]) if vendedor else (False, None)
+    if nuevo_hash:
+        actualizar_contrasena(vendedor[0], nuevo_hash)
+    if correcta:
         vendedor_id = USUARIO[chat_id]["vendedor_id"]
         crear_sesion(chat_id, vendedor_id)
-        del USUARIO[chat_id]["contrasena"]
         USUARIO[chat_id]["estado"] = "logeado"
         mostrar_menu_principal(message)
     else:
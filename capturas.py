@@ -0,0 +1,223 @@
+import logging
+import math
+import os
+import threading
+
+from PIL import Image
+
+import database
+
+# --- Configuración ---
+# Bits de diferencia (sobre 64) a partir de los cuales dos capturas se consideran distintas
+DISTANCIA_MAX_PHASH = 10
+DISTANCIA_MAX_DHASH = 12
+
+TAMANO_HASH = 8
+TAMANO_DCT = 32
+
+# Tabla de cosenos de la DCT: solo hacen falta las 8 frecuencias más bajas
+_COSENOS = [
+    [math.cos((2 * x + 1) * u * math.pi / (2 * TAMANO_DCT)) for x in range(TAMANO_DCT)]
+    for u in range(TAMANO_HASH)
+]
+
+
+# --- Hashes Perceptuales ---
+def calcular_dhash(imagen):
+    """Calcula el hash de diferencia (dHash) de 64 bits de una imagen de Pillow."""
+    imagen = imagen.convert("L").resize((TAMANO_HASH + 1, TAMANO_HASH), Image.LANCZOS)
+    pixeles = list(imagen.getdata())
+    valor = 0
+    for fila in range(TAMANO_HASH):
+        inicio = fila * (TAMANO_HASH + 1)
+        for columna in range(TAMANO_HASH):
+            izquierda = pixeles[inicio + columna]
+            derecha = pixeles[inicio + columna + 1]
+            valor = (valor << 1) | (izquierda > derecha)
+    return valor
+
+def calcular_phash(imagen):
+    """Calcula el hash perceptual (pHash) de 64 bits de una imagen de Pillow usando la DCT."""
+    imagen = imagen.convert("L").resize((TAMANO_DCT, TAMANO_DCT), Image.LANCZOS)
+    pixeles = list(imagen.getdata())
+    filas = [pixeles[i * TAMANO_DCT:(i + 1) * TAMANO_DCT] for i in range(TAMANO_DCT)]
+
+    # DCT separable: primero por filas, luego por columnas, solo las frecuencias bajas
+    por_filas = [[sum(c * p for c, p in zip(_COSENOS[u], fila)) for u in range(TAMANO_HASH)] for fila in filas]
+    coeficientes = []
+    for v in range(TAMANO_HASH):
+        for u in range(TAMANO_HASH):
+            coeficientes.append(sum(_COSENOS[v][y] * por_filas[y][u] for y in range(TAMANO_DCT)))
+
+    # El coeficiente DC (brillo medio) no entra en la mediana
+    ordenados = sorted(coeficientes[1:])
+    mediana = (ordenados[len(ordenados) // 2 - 1] + ordenados[len(ordenados) // 2]) / 2
+    valor = 0
+    for coeficiente in coeficientes:
+        valor = (valor << 1) | (coeficiente > mediana)
+    return valor
+
+def distancia_hamming(a, b):
+    """Devuelve el número de bits distintos entre dos hashes."""
+    return bin(a ^ b).count("1")
+
+def hash_a_texto(valor):
+    return f"{valor:016x}"
+
+def texto_a_hash(texto):
+    return int(texto, 16)
+
+
+# --- Índice de Capturas ---
+class ArbolBK:
+    """Árbol BK sobre la distancia de Hamming para buscar hashes cercanos sin recorrerlos todos."""
+
+    def __init__(self):
+        self.raiz = None  # [hash, [reserva_id, ...], {distancia: nodo}]
+        self.total = 0
+
+    def insertar(self, valor, reserva_id):
+        self.total += 1
+        if self.raiz is None:
+            self.raiz = [valor, [reserva_id], {}]
+            return
+        nodo = self.raiz
+        while True:
+            distancia = distancia_hamming(valor, nodo[0])
+            if distancia == 0:
+                nodo[1].append(reserva_id)
+                return
+            hijo = nodo[2].get(distancia)
+            if hijo is None:
+                nodo[2][distancia] = [valor, [reserva_id], {}]
+                return
+            nodo = hijo
+
+    def buscar(self, valor, distancia_max):
+        """Devuelve [(distancia, hash, reserva_id)] de los hashes a distancia <= distancia_max."""
+        resultados = []
+        pendientes = [self.raiz] if self.raiz is not None else []
+        while pendientes:
+            nodo = pendientes.pop()
+            distancia = distancia_hamming(valor, nodo[0])
+            if distancia <= distancia_max:
+                resultados.extend((distancia, nodo[0], reserva_id) for reserva_id in nodo[1])
+            # Desigualdad triangular: solo pueden coincidir los hijos en este rango
+            for distancia_hijo, hijo in nodo[2].items():
+                if distancia - distancia_max <= distancia_hijo <= distancia + distancia_max:
+                    pendientes.append(hijo)
+        resultados.sort()
+        return resultados
+
+
+class IndiceCapturas:
+    """Hashes de las capturas ya registradas de una base, para buscar las casi idénticas."""
+
+    def __init__(self):
+        self._arbol = ArbolBK()
+        self._dhashes = {}  # reserva_id -> dHash, para confirmar las coincidencias del árbol
+        self._lock = threading.Lock()
+
+    def insertar(self, reserva_id, phash, dhash):
+        with self._lock:
+            self._arbol.insertar(phash, reserva_id)
+            self._dhashes[reserva_id] = dhash
+
+    def similares(self, phash, dhash, excluir_reserva_id=None):
+        """Devuelve [(distancia, reserva_id)] de las reservas con una captura casi idéntica."""
+        with self._lock:
+            coincidencias = []
+            for distancia, _, reserva_id in self._arbol.buscar(phash, DISTANCIA_MAX_PHASH):
+                if reserva_id == excluir_reserva_id:
+                    continue
+                if distancia_hamming(dhash, self._dhashes.get(reserva_id, dhash)) <= DISTANCIA_MAX_DHASH:
+                    coincidencias.append((distancia, reserva_id))
+        return coincidencias
+
+    def __len__(self):
+        return self._arbol.total
+
+
+# Un índice por base: dos almacenes sobre archivos distintos no comparten capturas
+_INDICES = {}
+_INDICES_LOCK = threading.Lock()
+
+def _ruta(ruta):
+    return os.path.abspath(ruta or database.DATABASE_NAME)
+
+def cargar_indice(ruta=None):
+    """Construye el índice en memoria de la base `ruta` con los hashes ya guardados en reservas."""
+    filas = database.ejecutar_consulta(
+        "SELECT id, captura_phash, captura_dhash FROM reservas WHERE captura_phash IS NOT NULL", ruta=ruta)
+    if filas is None:
+        return None
+    indice = IndiceCapturas()
+    for reserva_id, phash, dhash in filas:
+        indice.insertar(reserva_id, texto_a_hash(phash), texto_a_hash(dhash))
+    with _INDICES_LOCK:
+        _INDICES[_ruta(ruta)] = indice
+    logging.info(f"Índice de capturas cargado con {len(filas)} hashes.")
+    return indice
+
+def _indice_de(ruta):
+    with _INDICES_LOCK:
+        indice = _INDICES.get(_ruta(ruta))
+    return indice or cargar_indice(ruta)
+
+def buscar_capturas_similares(phash, dhash, excluir_reserva_id=None, ruta=None):
+    """Devuelve [(distancia, reserva_id)] de las reservas de `ruta` con una captura casi idéntica."""
+    indice = _indice_de(ruta)
+    return indice.similares(phash, dhash, excluir_reserva_id) if indice is not None else []
+
+def hashear_captura(archivo):
+    """
+    Devuelve (pHash, dHash) de la captura, o None si no se puede leer como imagen.
+    `archivo` puede ser una ruta o un objeto tipo archivo (por ejemplo io.BytesIO con la
+    foto descargada de Telegram).
+    """
+    try:
+        with Image.open(archivo) as imagen:
+            return calcular_phash(imagen), calcular_dhash(imagen)
+    except (OSError, ValueError) as e:
+        logging.error(f"Error al leer la captura {archivo}: {e}")
+        return None
+
+def avisar_coincidencias(reserva_id, coincidencias):
+    if coincidencias:
+        logging.warning(f"Captura de la reserva {reserva_id} posiblemente reutilizada: "
+                        f"coincide con las reservas {[r for _, r in coincidencias]}")
+
+def registrar_captura(reserva_id, archivo, captura_url=None, ruta=None):
+    """
+    Calcula los hashes de la captura de una reserva de la base `ruta` (por defecto la del bot),
+    la compara con las anteriores de esa base y la guarda. Devuelve la lista de coincidencias
+    [(distancia, reserva_id)], vacía si la captura no se parece a ninguna otra.
+    """
+    hashes = hashear_captura(archivo)
+    indice = _indice_de(ruta)
+    if hashes is None or indice is None:
+        return []
+    phash, dhash = hashes
+
+    coincidencias = indice.similares(phash, dhash, excluir_reserva_id=reserva_id)
+    duplicado_de, distancia = (coincidencias[0][1], coincidencias[0][0]) if coincidencias else (None, None)
+
+    resultado = database.ejecutar_consulta("""
+        UPDATE reservas
+        SET captura_url = COALESCE(?, captura_url), captura_phash = ?, captura_dhash = ?,
+            duplicado_de = ?, distancia_duplicado = ?
+        WHERE id = ?
+    """, (captura_url, hash_a_texto(phash), hash_a_texto(dhash), duplicado_de, distancia, reserva_id), ruta=ruta)
+    if resultado is None:
+        return coincidencias
+
+    indice.insertar(reserva_id, phash, dhash)
+    avisar_coincidencias(reserva_id, coincidencias)
+    return coincidencias
+
+def obtener_sospecha(reserva_id, ruta=None):
+    """Devuelve (duplicado_de, distancia) si la captura de la reserva fue marcada como reutilizada."""
+    filas = database.ejecutar_consulta(
+        "SELECT duplicado_de, distancia_duplicado FROM reservas WHERE id = ? AND duplicado_de IS NOT NULL",
+        (reserva_id,), ruta=ruta)
+    return filas[0] if filas else None
@@ -0,0 +1,216 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, time as hora_del_dia, timedelta, timezone
+
+import archivo
+import database
+
+# Las fechas de ventas se guardan en UTC, así que el cierre también se programa en UTC.
+# Se cierra el día que acaba de terminar: a las 23:55 todavía faltarían las ventas de los últimos minutos.
+HORA_CIERRE = os.getenv("HORA_CIERRE_UTC", "00:05")
+# Tras una caída larga no se reenvían cierres viejos: más allá de esto ya no le sirven a nadie
+DIAS_A_REANUDAR = 7
+
+_lock = threading.Lock()
+_encolados = set()  # (fecha, chat_id) ya entregados al enviador en este proceso
+
+def calcular_resumenes(conn, fecha):
+    """
+    Devuelve {vendedor_id: {"nombre", "productos": [(nombre, cantidad, total, comision)], "cantidad",
+    "total", "comision"}} de todos los vendedores para `fecha`, con una sola consulta agregada.
+    Los vendedores sin ventas aparecen con listas vacías y totales en cero.
+    """
+    desde = fecha.isoformat()
+    hasta = (fecha + timedelta(days=1)).isoformat()
+    resumenes = {vendedor_id: {"nombre": nombre, "productos": [], "cantidad": 0, "total": 0.0, "comision": 0.0}
+                 for vendedor_id, nombre in conn.execute("SELECT id, nombre FROM vendedores")}
+    filas = conn.execute(f"""
+        SELECT v.vendedor_id, p.nombre, SUM(v.cantidad_vendida), SUM(p.precio_venta * v.cantidad_vendida), SUM(v.comision)
+        FROM {archivo.fuente_ventas(conn, desde)} v
+        JOIN productos p ON p.id = v.producto_id
+        WHERE v.fecha >= ? AND v.fecha < ?
+        GROUP BY v.vendedor_id, v.producto_id
+        ORDER BY v.vendedor_id, 4 DESC
+    """, (desde, hasta))
+    for vendedor_id, producto, cantidad, total, comision in filas:
+        resumen = resumenes.get(vendedor_id)
+        if resumen is None:
+            continue  # venta de un vendedor borrado
+        resumen["productos"].append((producto, cantidad, total, comision))
+        resumen["cantidad"] += cantidad
+        resumen["total"] += total
+        resumen["comision"] += comision
+    return resumenes
+
+def texto_vendedor(fecha, resumen):
+    mensaje = f"🌙 Cierre del {fecha:%d/%m/%Y}, {resumen['nombre']}:\n"
+    if not resumen["productos"]:
+        return mensaje + "Ese día no registraste ventas. ¡Hoy es otra oportunidad! 💪"
+    for producto, cantidad, total, comision in resumen["productos"]:
+        mensaje += f"- {producto}: {cantidad} u. - ${total:.2f} - Comisión ${comision:.2f}\n"
+    mensaje += f"\nTotal vendido: ${resumen['total']:.2f} 🎉\nTu comisión: ${resumen['comision']:.2f} 💰"
+    return mensaje
+
+def texto_administrador(fecha, resumenes):
+    con_ventas = sorted((r for r in resumenes.values() if r["productos"]), key=lambda r: -r["total"])
+    mensaje = f"🏁 Cierre del {fecha:%d/%m/%Y}:\n"
+    for posicion, resumen in enumerate(con_ventas, start=1):
+        mensaje += (f"{posicion}. {resumen['nombre']} - ${resumen['total']:.2f} ({resumen['cantidad']} u.) "
+                    f"· comisión ${resumen['comision']:.2f}\n")
+    if not con_ventas:
+        mensaje += "Nadie registró ventas ese día.\n"
+    mensaje += (f"\nTotal: ${sum(r['total'] for r in con_ventas):.2f} · comisiones "
+                f"${sum(r['comision'] for r in con_ventas):.2f} · sin ventas: {len(resumenes) - len(con_ventas)}")
+    return mensaje
+
+def preparar_cierre(conn, fecha, admin_chat_id):
+    """
+    Genera y guarda como 'pendiente' los resúmenes de `fecha` (uno por chat con sesión abierta
+    y el del administrador). Si ya se generaron no hace nada: el cierre se arma una sola vez y
+    los reintentos solo reenvían lo que falte. Por eso `fecha` tiene que ser un día terminado
+    (ver cerrar_dia). Devuelve cuántos se generaron.
+    """
+    with conn:
+        if conn.execute("SELECT 1 FROM resumenes_diarios WHERE fecha = ? LIMIT 1", (fecha.isoformat(),)).fetchone():
+            return 0
+        resumenes = calcular_resumenes(conn, fecha)
+        filas = [(fecha.isoformat(), chat_id, vendedor_id, texto_vendedor(fecha, resumenes[vendedor_id]))
+                 for chat_id, vendedor_id in conn.execute("SELECT chat_id, vendedor_id FROM sesiones")
+                 if vendedor_id in resumenes]
+        if admin_chat_id:
+            filas.append((fecha.isoformat(), admin_chat_id, None, texto_administrador(fecha, resumenes)))
+        conn.executemany("""
+            INSERT OR IGNORE INTO resumenes_diarios (fecha, chat_id, vendedor_id, texto, estado)
+            VALUES (?, ?, ?, ?, 'pendiente')
+        """, filas)
+    return len(filas)
+
+def _marcar(fecha, chat_id, estado, ruta=None):
+    conn = database.crear_conexion(ruta)
+    if conn is None:
+        return
+    try:
+        with conn:
+            conn.execute("UPDATE resumenes_diarios SET estado = ? WHERE fecha = ? AND chat_id = ?", (estado, fecha, chat_id))
+    except sqlite3.Error as e:
+        logging.error(f"Error al marcar el resumen de {chat_id} del {fecha}: {e}")
+    finally:
+        conn.close()
+    if estado == "fallido":
+        with _lock:
+            _encolados.discard((fecha, chat_id))  # la próxima reanudación lo vuelve a intentar
+
+def enviar_pendientes(conn, enviador, fecha, ruta=None):
+    """
+    Encola los resúmenes 'pendiente' o 'fallido' de `fecha`. Cada uno pasa a 'enviado' apenas
+    Telegram lo acepta, así que tras un corte solo se reenvían los que no llegaron a salir.
+    """
+    fecha = fecha.isoformat()
+    pendientes = conn.execute("""
+        SELECT chat_id, texto FROM resumenes_diarios WHERE fecha = ? AND estado IN ('pendiente', 'fallido')
+    """, (fecha,)).fetchall()
+    encolados = 0
+    for chat_id, texto in pendientes:
+        with _lock:
+            if (fecha, chat_id) in _encolados:
+                continue
+            _encolados.add((fecha, chat_id))
+        enviador.encolar(chat_id, texto,
+                         al_enviar=lambda chat_id, _: _marcar(fecha, chat_id, "enviado", ruta),
+                         al_fallar=lambda chat_id, _: _marcar(fecha, chat_id, "fallido", ruta))
+        encolados += 1
+    return encolados
+
+def ultimo_dia_terminado():
+    """Ayer en UTC: el día más reciente que ya no puede sumar ventas."""
+    return datetime.now(timezone.utc).date() - timedelta(days=1)
+
+def cerrar_dia(enviador, admin_chat_id, fecha=None, ruta=None):
+    """
+    Arma (si hace falta) y envía el cierre de `fecha` (ayer en UTC por defecto). Devuelve cuántos
+    mensajes encoló, o None si falló o si `fecha` todavía no terminó.
+    """
+    fecha = fecha or ultimo_dia_terminado()
+    if fecha > ultimo_dia_terminado():
+        # Un cierre armado antes de tiempo quedaría congelado sin las ventas que faltan
+        logging.error(f"El cierre del {fecha} se arma cuando termina el día.")
+        return None
+    conn = database.crear_conexion(ruta)
+    if conn is None:
+        return None
+    try:
+        with _lock:
+            generados = preparar_cierre(conn, fecha, admin_chat_id)
+        encolados = enviar_pendientes(conn, enviador, fecha, ruta)
+        logging.info(f"Cierre del {fecha}: {generados} resúmenes generados, {encolados} encolados")
+        return encolados
+    except sqlite3.Error as e:
+        logging.error(f"Error al armar el cierre del {fecha}: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _proximo_cierre(ahora, hora=HORA_CIERRE):
+    horas, minutos = (int(parte) for parte in hora.split(":"))
+    cierre = datetime.combine(ahora.date(), hora_del_dia(horas, minutos), tzinfo=timezone.utc)
+    return cierre if cierre > ahora else cierre + timedelta(days=1)
+
+def _ultimo_cierre_vencido(ahora, hora=HORA_CIERRE):
+    """Día cuyo cierre programado ya pasó: ayer si ya son las `hora`, si no anteayer."""
+    return (_proximo_cierre(ahora, hora) - timedelta(days=2)).date()
+
+def cierres_a_reanudar(hasta, ruta=None):
+    """
+    Fechas a cerrar o reenviar, en orden: las que tienen resúmenes 'pendiente' o 'fallido' y
+    las que no se llegaron a armar entre el último cierre y `hasta`, todas dentro de los
+    últimos DIAS_A_REANUDAR días. Sin ningún cierre previo solo cuenta `hasta`.
+    """
+    desde = hasta - timedelta(days=DIAS_A_REANUDAR - 1)
+    conn = database.crear_conexion(ruta)
+    if conn is None:
+        return []
+    try:
+        fechas = {date.fromisoformat(fila[0]) for fila in conn.execute("""
+            SELECT DISTINCT fecha FROM resumenes_diarios
+            WHERE estado IN ('pendiente', 'fallido') AND fecha >= ? AND fecha <= ?
+        """, (desde.isoformat(), hasta.isoformat()))}
+        ultimo = conn.execute("SELECT MAX(fecha) FROM resumenes_diarios").fetchone()[0]
+    except sqlite3.Error as e:
+        logging.error(f"Error al buscar cierres pendientes: {e}")
+        return []
+    finally:
+        conn.close()
+    faltante = max(date.fromisoformat(ultimo) + timedelta(days=1), desde) if ultimo else hasta
+    while faltante <= hasta:
+        fechas.add(faltante)
+        faltante += timedelta(days=1)
+    return sorted(fechas)
+
+def reanudar_cierres(enviador, admin_chat_id, hasta, ruta=None):
+    """Cierra o reenvía cada fecha de cierres_a_reanudar. Devuelve cuántos mensajes encoló."""
+    encolados = 0
+    for fecha in cierres_a_reanudar(hasta, ruta):
+        encolados += cerrar_dia(enviador, admin_chat_id, fecha, ruta) or 0
+    return encolados
+
+def iniciar_cierre_diario(enviador, admin_chat_id, hora=HORA_CIERRE):
+    """
+    Reanuda los cierres interrumpidos, fallidos o que no llegaron a correr y luego, cada día a
+    `hora` (UTC), cierra el día anterior (y reintenta lo que siga sin salir) en un hilo en
+    segundo plano.
+    """
+    parada = threading.Event()
+
+    def ciclo():
+        reanudar_cierres(enviador, admin_chat_id, _ultimo_cierre_vencido(datetime.now(timezone.utc), hora))
+        while True:
+            ahora = datetime.now(timezone.utc)
+            proximo = _proximo_cierre(ahora, hora)
+            if parada.wait((proximo - ahora).total_seconds()):
+                return
+            reanudar_cierres(enviador, admin_chat_id, proximo.date() - timedelta(days=1))
+
+    threading.Thread(target=ciclo, name="cierre-diario", daemon=True).start()
+    return parada
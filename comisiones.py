@@ -0,0 +1,145 @@
+import bisect
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import archivo
+import database
+
+PORCENTAJE_POR_DEFECTO = 0.20  # sobre la ganancia, si ninguna regla aplica
+
+# Una regla aplica a una venta si coincide vendedor y producto (NULL = cualquiera), la cantidad
+# alcanza su tramo y la fecha cae en [desde, hasta]. Entre las que aplican gana la más específica
+# (vendedor > producto), luego el tramo más alto, luego la de `desde` más reciente y por último la
+# más nueva. El mismo orden está escrito en Python (MotorComisiones) y en SQL (recalcular_comisiones).
+_REGLA_SQL = """
+    SELECT r.porcentaje FROM reglas_comision r
+    WHERE (r.vendedor_id IS NULL OR r.vendedor_id = ventas.vendedor_id)
+      AND (r.producto_id IS NULL OR r.producto_id = ventas.producto_id)
+      AND r.cantidad_minima <= ventas.cantidad_vendida
+      AND (r.desde IS NULL OR r.desde <= date(ventas.fecha))
+      AND (r.hasta IS NULL OR r.hasta >= date(ventas.fecha))
+    ORDER BY (r.vendedor_id IS NOT NULL) * 2 + (r.producto_id IS NOT NULL) DESC,
+             r.cantidad_minima DESC, r.desde DESC, r.id DESC
+    LIMIT 1
+"""
+
+class MotorComisiones:
+    """
+    Compila las reglas vigentes en un día en un dict (vendedor_id | None, producto_id | None) ->
+    tramos ordenados. Resolver una venta son como mucho cuatro búsquedas en el dict y una
+    bisección sobre los pocos tramos de esa clave. La compilación se repite al cambiar el día o
+    al invalidar tras modificar las reglas.
+    """
+
+    def __init__(self):
+        self._dia = None
+        self._tabla = {}
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        with self._lock:
+            self._dia = None
+
+    def _compilar(self, dia):
+        filas = database.ejecutar_consulta("""
+            SELECT vendedor_id, producto_id, cantidad_minima, porcentaje FROM reglas_comision
+            WHERE (desde IS NULL OR desde <= ?) AND (hasta IS NULL OR hasta >= ?)
+            ORDER BY cantidad_minima, desde IS NOT NULL, desde, id
+        """, (dia, dia)) or []
+        tabla = {}
+        for vendedor_id, producto_id, cantidad_minima, porcentaje in filas:
+            minimos, porcentajes = tabla.setdefault((vendedor_id, producto_id), ([], []))
+            if minimos and minimos[-1] == cantidad_minima:
+                porcentajes[-1] = porcentaje  # mismo tramo: gana la regla más reciente (viene después)
+            else:
+                minimos.append(cantidad_minima)
+                porcentajes.append(porcentaje)
+        return tabla
+
+    def porcentaje(self, vendedor_id, producto_id, cantidad, dia=None):
+        dia = dia or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with self._lock:
+            if self._dia != dia:
+                self._tabla = self._compilar(dia)
+                self._dia = dia
+            tabla = self._tabla
+        for clave in ((vendedor_id, producto_id), (vendedor_id, None), (None, producto_id), (None, None)):
+            tramos = tabla.get(clave)
+            if tramos:
+                i = bisect.bisect_right(tramos[0], cantidad) - 1
+                if i >= 0:
+                    return tramos[1][i]
+        return PORCENTAJE_POR_DEFECTO
+
+motor = MotorComisiones()
+
+
+# --- Administración de reglas ---
+def agregar_regla(porcentaje, vendedor_id=None, producto_id=None, cantidad_minima=1, desde=None, hasta=None):
+    """Guarda una regla nueva (`porcentaje` entre 0 y 1). Devuelve su id o None si no se pudo guardar."""
+    if not 0 <= porcentaje <= 1:
+        logging.error(f"Porcentaje de comisión inválido: {porcentaje}")
+        return None
+    conn = database.crear_conexion()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.execute("""
+            INSERT INTO reglas_comision (vendedor_id, producto_id, cantidad_minima, porcentaje, desde, hasta)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (vendedor_id, producto_id, cantidad_minima, porcentaje, desde, hasta))
+        conn.commit()
+        motor.invalidar()
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        logging.error(f"Error al guardar la regla de comisión: {e}")
+        return None
+    finally:
+        conn.close()
+
+def eliminar_regla(regla_id):
+    resultado = database.ejecutar_consulta("DELETE FROM reglas_comision WHERE id = ?", (regla_id,))
+    motor.invalidar()
+    return resultado is not None
+
+def listar_reglas():
+    return database.ejecutar_consulta("""
+        SELECT id, vendedor_id, producto_id, cantidad_minima, porcentaje, desde, hasta
+        FROM reglas_comision ORDER BY id
+    """) or []
+
+def recalcular_comisiones(desde, hasta):
+    """
+    Vuelve a calcular la comisión de todas las ventas de [desde, hasta] con las reglas actuales.
+
+    Es un UPDATE por tabla: SQLite elige la regla de cada venta con la misma prioridad que el
+    motor, sin pasar fila por fila por Python. Si el rango llega a meses archivados también
+    actualiza el archivo y sus agregados. Usa los precios actuales de los productos.
+    Devuelve cuántas ventas se actualizaron, o None si falló.
+    """
+    conn = database.crear_conexion()
+    if conn is None:
+        return None
+    try:
+        tablas = ["main.ventas"]
+        if archivo.fuente_ventas(conn, desde) != "ventas":
+            tablas.append("archivo.ventas")
+        actualizadas = 0
+        with conn:
+            for tabla in tablas:
+                actualizadas += conn.execute(f"""
+                    UPDATE {tabla} SET comision = COALESCE(({_REGLA_SQL}), ?)
+                        * (SELECT p.precio_venta - p.precio_compra FROM productos p WHERE p.id = ventas.producto_id)
+                        * cantidad_vendida
+                    WHERE fecha >= ? AND fecha < date(?, '+1 day')
+                """, (PORCENTAJE_POR_DEFECTO, str(desde), str(hasta))).rowcount
+            archivo.recalcular_agregados(conn, desde, hasta)
+        logging.info(f"Comisiones recalculadas del {desde} al {hasta}: {actualizadas} ventas")
+        return actualizadas
+    except sqlite3.Error as e:
+        logging.error(f"Error al recalcular comisiones: {e}")
+        return None
+    finally:
+        conn.close()
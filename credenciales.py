@@ -0,0 +1,115 @@
+import base64
+import collections
+import hashlib
+import hmac
+import logging
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import almacenamiento
+
+# scrypt: N=2^15, r=8 usa 32 MB y unos 100 ms por verificación en un núcleo
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+LARGO_SAL = 16
+PREFIJO = "scrypt"
+
+HILOS_VERIFICACION = 2  # como mucho dos núcleos ocupados por logins a la vez
+MAXIMO_PENDIENTES = 16  # más allá de esto, el login se rechaza en vez de encolarse
+
+def _b64(datos):
+    return base64.b64encode(datos).decode("ascii")
+
+def _derivar(contrasena, sal, n, r, p):
+    return hashlib.scrypt(contrasena.encode("utf-8"), salt=sal, n=n, r=r, p=p, maxmem=SCRYPT_MAXMEM)
+
+def hashear(contrasena):
+    """Devuelve 'scrypt$n$r$p$sal$hash' (sal y hash en base64) para guardar en vendedores.contrasena."""
+    sal = os.urandom(LARGO_SAL)
+    return f"{PREFIJO}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(sal)}${_b64(_derivar(contrasena, sal, SCRYPT_N, SCRYPT_R, SCRYPT_P))}"
+
+def verificar(contrasena, almacenada):
+    """
+    Compara `contrasena` con lo guardado. Devuelve (correcta, nuevo_hash).
+
+    `nuevo_hash` no es None cuando la contraseña es correcta pero lo guardado es texto plano
+    (filas anteriores a la migración) o usa parámetros viejos: el llamador debe guardarlo.
+    """
+    partes = almacenada.split("$")
+    if len(partes) != 6 or partes[0] != PREFIJO:
+        correcta = hmac.compare_digest(contrasena.encode("utf-8"), almacenada.encode("utf-8"))
+        return correcta, hashear(contrasena) if correcta else None
+    _, n, r, p, sal, esperado = partes
+    n, r, p = int(n), int(r), int(p)
+    correcta = hmac.compare_digest(_derivar(contrasena, base64.b64decode(sal), n, r, p), base64.b64decode(esperado))
+    desactualizado = (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return correcta, hashear(contrasena) if correcta and desactualizado else None
+
+class VerificadorCredenciales:
+    """
+    Verifica contraseñas en un pool acotado para que una ráfaga de logins no bloquee a los
+    handlers de ventas. enviar() vuelve enseguida; el resultado llega a `al_terminar(correcta)`
+    desde el hilo del pool. Si ya hay MAXIMO_PENDIENTES en espera, enviar() devuelve False.
+    """
+
+    def __init__(self, hilos=HILOS_VERIFICACION, maximo_pendientes=MAXIMO_PENDIENTES):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="credenciales")
+        self._cupos = threading.BoundedSemaphore(maximo_pendientes)
+        self._tiempos = collections.deque(maxlen=500)  # ms de cada derivación
+        self.metricas = collections.Counter()
+        self._lock = threading.Lock()
+
+    def _contar(self, clave, delta=1):
+        with self._lock:
+            self.metricas[clave] += delta
+
+    def enviar(self, usuario, contrasena, al_terminar):
+        if not self._cupos.acquire(blocking=False):
+            self._contar("rechazadas")
+            return False
+        self._contar("pendientes")
+        self._pool.submit(self._verificar, usuario, contrasena, al_terminar)
+        return True
+
+    def _verificar(self, usuario, contrasena, al_terminar):
+        correcta = False
+        try:
+            almacen = almacenamiento.obtener_almacen()
+            vendedor = almacen.obtener_vendedor(usuario)
+            if vendedor:
+                inicio = time.perf_counter()
+                correcta, nuevo_hash = verificar(contrasena, vendedor[2])
+                self._tiempos.append((time.perf_counter() - inicio) * 1000)
+                if nuevo_hash:
+                    almacen.actualizar_contrasena(vendedor[0], nuevo_hash)
+                    self._contar("rehash")
+            self._contar("correctas" if correcta else "incorrectas")
+        except Exception as e:
+            self._contar("errores")
+            logging.exception(f"Error al verificar credenciales de {usuario}: {e}")
+        finally:
+            self._cupos.release()
+        # Sigue pendiente hasta que el login termina de aplicarse: quien espera a que no haya
+        # pendientes (reproducir.py) tiene que ver el estado final del chat, no "verificando"
+        try:
+            al_terminar(correcta)
+        except Exception as e:
+            logging.exception(f"Error al continuar el login de {usuario}: {e}")
+        finally:
+            self._contar("pendientes", -1)
+
+    def resumen(self):
+        """Dict con los contadores y la latencia (mediana, p95, máxima en ms) de las últimas derivaciones."""
+        tiempos = sorted(self._tiempos)
+        with self._lock:
+            resumen = dict(self.metricas)
+        if tiempos:
+            resumen["ms_mediana"] = statistics.median(tiempos)
+            resumen["ms_p95"] = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+            resumen["ms_maximo"] = tiempos[-1]
+        return resumen
@@ -5,21 +5,22 @@ from dotenv import load_dotenv
 
 load_dotenv("config.env")
 
-DATABASE_NAME = os.getenv("DATABASE_NAME")
+DATABASE_NAME = os.getenv("DATABASE_NAME", "servicej.db")
 
-def crear_conexion():
-    """Crea una conexión a la base de datos SQLite."""
+def crear_conexion(ruta=None):
+    """Crea una conexión a la base de datos SQLite (por defecto, DATABASE_NAME)."""
     conn = None
+    ruta = ruta or DATABASE_NAME
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        print(f"Conexión a la base de datos {DATABASE_NAME} establecida.")
+        conn = sqlite3.connect(ruta)
+        print(f"Conexión a la base de datos {ruta} establecida.")
     except sqlite3.Error as e:
         logging.error(f"Error al conectar a la base de datos: {e}")
     return conn
 
-def crear_tablas():
-    """Crea las tablas necesarias en la base de datos."""
-    conn = crear_conexion()
+def crear_tablas(ruta=None):
+    """Crea las tablas necesarias en la base de datos. Devuelve True si todo salió bien."""
+    conn = crear_conexion(ruta)
     if conn is not None:
         try:
             cursor = conn.cursor()
@@ -70,23 +71,89 @@ def crear_tablas():
                     fecha_reserva DATETIME DEFAULT CURRENT_TIMESTAMP,
                     estado TEXT DEFAULT 'pendiente',  -- 'pendiente', 'confirmada', 'rechazada'
                     captura_url TEXT,  -- URL o path de la captura de pantalla
+                    captura_dhash TEXT,  -- hash perceptual (dHash) de la captura, en hexadecimal
+                    captura_phash TEXT,  -- hash perceptual (pHash) de la captura, en hexadecimal
+                    duplicado_de INTEGER,  -- reserva cuya captura es casi idéntica a esta
+                    distancia_duplicado INTEGER,  -- bits de diferencia con esa captura
                     FOREIGN KEY (usuario_id) REFERENCES usuarios(id),
                     FOREIGN KEY (sorteo_id) REFERENCES sorteos(id)
                 )
             """)
 
+            # Tabla de ganadores (una fila por premio entregado en cada sorteo)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ganadores (
+                    sorteo_id INTEGER NOT NULL,
+                    posicion INTEGER NOT NULL,  -- 1 = primer premio, 2 = segundo, ...
+                    reserva_id INTEGER NOT NULL,
+                    usuario_id INTEGER NOT NULL,
+                    numero INTEGER NOT NULL,
+                    premio REAL NOT NULL,
+                    PRIMARY KEY (sorteo_id, posicion),
+                    FOREIGN KEY (sorteo_id) REFERENCES sorteos(id),
+                    FOREIGN KEY (reserva_id) REFERENCES reservas(id),
+                    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+                )
+            """)
+
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservas_sorteo_estado ON reservas (sorteo_id, estado)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservas_estado ON reservas (estado, id)")  # cola de pendientes
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ganadores_usuario ON ganadores (usuario_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_numeros_sorteo_numero ON numeros (sorteo_id, numero)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_dinero_ganado ON usuarios (dinero_ganado DESC)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_usuarios_mayor_ganancia ON usuarios (mayor_ganancia DESC)")
+
+            # Columnas añadidas después de la primera versión de la tabla
+            agregar_columna_si_falta(cursor, "reservas", "captura_dhash", "TEXT")
+            agregar_columna_si_falta(cursor, "reservas", "captura_phash", "TEXT")
+            agregar_columna_si_falta(cursor, "reservas", "duplicado_de", "INTEGER")
+            agregar_columna_si_falta(cursor, "reservas", "distancia_duplicado", "INTEGER")
+            agregar_columna_si_falta(cursor, "sorteos", "semilla", "TEXT")  # semilla del sorteo, para auditoría
+            agregar_columna_si_falta(cursor, "sorteos", "participantes", "TEXT")  # ids de reservas sorteadas, en orden y separados por comas
+            agregar_columna_si_falta(cursor, "sorteos", "fecha_sorteo", "DATETIME")
+            agregar_columna_si_falta(cursor, "sorteos", "version_tablero", "INTEGER DEFAULT 0")
+
+            # Cada cambio de disponibilidad sube la versión del tablero de su sorteo
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS numeros_version_update AFTER UPDATE OF disponible ON numeros
+                WHEN OLD.disponible IS NOT NEW.disponible
+                BEGIN
+                    UPDATE sorteos SET version_tablero = version_tablero + 1 WHERE id = NEW.sorteo_id;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS numeros_version_insert AFTER INSERT ON numeros
+                BEGIN
+                    UPDATE sorteos SET version_tablero = version_tablero + 1 WHERE id = NEW.sorteo_id;
+                END
+            """)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS numeros_version_delete AFTER DELETE ON numeros
+                BEGIN
+                    UPDATE sorteos SET version_tablero = version_tablero + 1 WHERE id = OLD.sorteo_id;
+                END
+            """)
+
             conn.commit()
             print("Tablas creadas exitosamente.")
+            return True
         except sqlite3.Error as e:
             logging.error(f"Error al crear tablas: {e}")
         finally:
             conn.close()
     else:
         logging.error("No se pudo crear la conexión para crear tablas.")
+    return False
+
+def agregar_columna_si_falta(cursor, tabla, columna, definicion):
+    """Añade una columna a una tabla existente si todavía no la tiene."""
+    cursor.execute(f"PRAGMA table_info({tabla})")
+    if columna not in [fila[1] for fila in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
 
-def ejecutar_consulta(query, params=()):
-    """Ejecuta una consulta SQL y devuelve los resultados."""
-    conn = crear_conexion()
+def ejecutar_consulta(query, params=(), ruta=None):
+    """Ejecuta una consulta SQL y devuelve los resultados (sobre `ruta`, por defecto DATABASE_NAME)."""
+    conn = crear_conexion(ruta)
     if conn is not None:
         try:
             cursor = conn.cursor()
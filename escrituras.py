@@ -0,0 +1,71 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+# Cuánto espera el coordinador a que lleguen más ventas antes de confirmar el lote
+VENTANA_SEGUNDOS = 0.005
+MAXIMO_POR_LOTE = 64
+
+class CoordinadorEscrituras:
+    """
+    Agrupa las ventas que llegan casi a la vez y las confirma en una sola transacción.
+
+    Cada handler llama a registrar_venta() y espera su propio resultado, pero el disco solo
+    hace un commit por lote. Nadie recibe True antes de que su venta esté confirmada, así
+    que la durabilidad es la misma que con un commit por venta.
+    """
+
+    def __init__(self, almacen, ventana=VENTANA_SEGUNDOS, maximo=MAXIMO_POR_LOTE):
+        self.almacen = almacen
+        self.ventana = ventana
+        self.maximo = maximo
+        self._pendientes = []  # [(venta, Future)]
+        self._condicion = threading.Condition()
+        self._hilo = None
+        self.lotes = 0
+        self.ventas = 0
+
+    def _iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._trabajar, name="coordinador-ventas", daemon=True)
+            self._hilo.start()
+
+    def enviar(self, vendedor_id, producto_id, cantidad_vendida, comision):
+        """Encola la venta y devuelve un Future que se resuelve con True/False tras el commit."""
+        futuro = Future()
+        with self._condicion:
+            self._iniciar()
+            self._pendientes.append(((vendedor_id, producto_id, cantidad_vendida, comision), futuro))
+            self._condicion.notify_all()
+        return futuro
+
+    def registrar_venta(self, vendedor_id, producto_id, cantidad_vendida, comision):
+        """Igual que Almacenamiento.registrar_venta, pero compartiendo el commit con las ventas concurrentes."""
+        return self.enviar(vendedor_id, producto_id, cantidad_vendida, comision).result()
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                while not self._pendientes:
+                    self._condicion.wait()
+                # Abre la ventana desde la primera venta del lote
+                limite = time.monotonic() + self.ventana
+                while len(self._pendientes) < self.maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+                lote = self._pendientes[:self.maximo]
+                del self._pendientes[:self.maximo]
+
+            try:
+                resultados = self.almacen.registrar_ventas([venta for venta, _ in lote])
+            except Exception as e:
+                logging.exception(f"Error inesperado al confirmar un lote de ventas: {e}")
+                resultados = [False] * len(lote)
+
+            self.lotes += 1
+            self.ventas += len(lote)
+            for (_, futuro), resultado in zip(lote, resultados):
+                futuro.set_result(resultado)
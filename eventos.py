@@ -0,0 +1,126 @@
+import collections
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+INTERVALO_RESUMEN = 60  # segundos entre resúmenes al grupo de registro
+MAXIMO_EN_MEMORIA = 50000  # si el hilo se atrasa, se descartan los eventos más viejos
+EVENTOS_JSONL = os.getenv("EVENTOS_JSONL", "eventos.jsonl")
+JSONL_MAX_BYTES = 5 * 1024 * 1024
+JSONL_COPIAS = 5
+ERRORES_EN_RESUMEN = 5
+
+class BusEventos:
+    """
+    Eventos operativos estructurados (ventas, sesiones, errores de stock y de API).
+
+    emitir() solo agrega un dict a un deque, así que ningún handler espera por E/S. Un hilo
+    junta lo acumulado cada `intervalo` segundos y manda un único resumen compacto al chat
+    por el EnviadorLimitado. Si no hay chat configurado o Telegram rechaza el resumen, los
+    eventos de ese período se vuelcan a un JSONL local con rotación.
+    """
+
+    def __init__(self, enviador, chat_id, intervalo=INTERVALO_RESUMEN, ruta_jsonl=EVENTOS_JSONL,
+                 max_bytes=JSONL_MAX_BYTES, copias=JSONL_COPIAS):
+        self.enviador = enviador
+        self.chat_id = chat_id
+        self.intervalo = intervalo
+        self._eventos = collections.deque(maxlen=MAXIMO_EN_MEMORIA)
+        self._hilo = None
+        self._lock = threading.Lock()
+        self._jsonl = logging.getLogger(f"eventos.jsonl.{id(self)}")
+        self._jsonl.propagate = False
+        self._jsonl.setLevel(logging.INFO)
+        self._ruta_jsonl = ruta_jsonl
+        self._max_bytes = max_bytes
+        self._copias = copias
+        self.volcados = 0
+
+    def emitir(self, tipo, **datos):
+        self._eventos.append({"ts": datetime.now(timezone.utc).isoformat(timespec="seconds"), "tipo": tipo, **datos})
+        if self._hilo is None:
+            self._iniciar()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, name="eventos", daemon=True)
+                self._hilo.start()
+
+    def vaciar(self):
+        """Encola ya el resumen de lo acumulado (por ejemplo, al apagar el bot)."""
+        self._enviar_resumen()
+
+    def _trabajar(self):
+        while True:
+            time.sleep(self.intervalo)
+            self._enviar_resumen()
+
+    def _tomar(self):
+        eventos = []
+        while self._eventos:
+            try:
+                eventos.append(self._eventos.popleft())
+            except IndexError:
+                break
+        return eventos
+
+    def _enviar_resumen(self):
+        eventos = self._tomar()
+        if not eventos:
+            return
+        if not self.chat_id:
+            self._volcar(eventos)
+            return
+        self.enviador.encolar(self.chat_id, resumir(eventos), al_fallar=lambda *_: self._volcar(eventos))
+
+    def _volcar(self, eventos):
+        if not self._jsonl.handlers:
+            manejador = logging.handlers.RotatingFileHandler(self._ruta_jsonl, maxBytes=self._max_bytes,
+                                                             backupCount=self._copias, encoding="utf-8")
+            manejador.setFormatter(logging.Formatter("%(message)s"))
+            self._jsonl.addHandler(manejador)
+        for evento in eventos:
+            self._jsonl.info(json.dumps(evento, ensure_ascii=False, default=str))
+        self.volcados += len(eventos)
+
+def resumir(eventos):
+    """Arma el texto del resumen: conteos por tipo, totales de ventas y los errores más repetidos."""
+    por_tipo = collections.Counter(evento["tipo"] for evento in eventos)
+    desde, hasta = eventos[0]["ts"][11:19], eventos[-1]["ts"][11:19]
+    mensaje = f"🧾 Eventos {desde}–{hasta} UTC ({len(eventos)}):\n"
+
+    ventas = [evento for evento in eventos if evento["tipo"] == "venta"]
+    if ventas:
+        unidades = sum(evento.get("cantidad", 0) for evento in ventas)
+        comision = sum(evento.get("comision", 0) for evento in ventas)
+        por_vendedor = collections.Counter(evento.get("vendedor") for evento in ventas)
+        detalle = ", ".join(f"{vendedor} {cantidad}" for vendedor, cantidad in por_vendedor.most_common(5))
+        mensaje += f"- 💰 {len(ventas)} ventas, {unidades} unidades, comisión ${comision:.2f} ({detalle})\n"
+
+    for tipo, cantidad in sorted(por_tipo.items()):
+        if tipo == "venta":
+            continue
+        mensaje += f"- {tipo}: {cantidad}\n"
+        if tipo == "error":
+            errores = collections.Counter(evento.get("mensaje", "") for evento in eventos if evento["tipo"] == "error")
+            for texto, repeticiones in errores.most_common(ERRORES_EN_RESUMEN):
+                mensaje += f"  · {repeticiones}× {texto[:200]}\n"
+    return mensaje
+
+class ManejadorEventos(logging.Handler):
+    """Reenvía al bus los registros de logging de nivel ERROR o superior como eventos 'error'."""
+
+    def __init__(self, bus, nivel=logging.ERROR):
+        super().__init__(nivel)
+        self.bus = bus
+
+    def emit(self, registro):
+        try:
+            self.bus.emitir("error", origen=registro.name, mensaje=registro.getMessage())
+        except Exception:
+            self.handleError(registro)
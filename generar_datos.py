@@ -0,0 +1,193 @@
+"""
+Genera una base sintética del tamaño que se pida, con el esquema actual del bot, para medir
+consultas con volúmenes de verdad (ver benchmark_consultas.py):
+
+    python generar_datos.py grande.db --ventas 2000000 --productos 3000 --numeros 100000
+    python generar_datos.py chica.db --ventas 10000 --vendedores 5 --semilla 7
+
+Los datos imitan a los reales: pocos productos concentran la mayoría de las ventas, hay
+vendedores más activos que otros, los sábados se vende más que los lunes y casi nada de
+madrugada, y los ids de ventas crecen con la fecha (como cuando se registran en vivo).
+La historia termina hoy (sin pasar de la hora actual), así que las consultas de "hoy"
+también encuentran filas.
+
+Para ir rápido se carga todo con executemany, sin diario ni fsync (journal_mode = OFF,
+synchronous = OFF) y sin los índices de ventas y movimientos, que se vuelven a crear al
+final de una sola vez. Si el proceso se corta la base queda inservible: se genera de nuevo.
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+# Peso de cada día de la semana (lunes = 0) y de cada hora UTC
+PESO_DIA_SEMANA = (0.8, 0.85, 0.9, 1.0, 1.2, 1.5, 1.1)
+PESO_HORA = (0.1, 0.05, 0.02, 0.02, 0.02, 0.05, 0.2, 0.5, 0.8, 1.0, 1.1, 1.2,
+             1.4, 1.3, 1.1, 1.0, 1.0, 1.1, 1.3, 1.4, 1.2, 0.9, 0.5, 0.2)
+CONTRASENA = "clave"  # la misma para todos los vendedores sintéticos
+ESTADOS_RESERVA = (("confirmada", 0.85), ("pendiente", 0.05), ("rechazada", 0.10))
+
+def _indices_de(conn, tablas):
+    marcadores = ", ".join("?" * len(tablas))
+    return conn.execute(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({marcadores})
+    """, tablas).fetchall()
+
+def _pesos_zipf(cantidad, exponente=1.1):
+    return [1 / (rango ** exponente) for rango in range(1, cantidad + 1)]
+
+def generar_ventas(rng, total, dias, vendedores, surtidos, precios, porcentaje, hasta):
+    """Genera filas (vendedor_id, producto_id, cantidad, comision, fecha) en orden de fecha."""
+    desde = (hasta - timedelta(days=dias - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    fechas = [desde + timedelta(days=d) for d in range(dias)]
+    pesos_dia = [PESO_DIA_SEMANA[fecha.weekday()] for fecha in fechas]
+    por_dia = [0] * dias
+    for dia in rng.choices(range(dias), weights=pesos_dia, k=total):
+        por_dia[dia] += 1
+    pesos_vendedor = _pesos_zipf(len(vendedores), 0.6)
+    segundos_hoy = int((hasta - fechas[-1]).total_seconds())
+
+    for dia, (fecha, cantidad_dia) in enumerate(zip(fechas, por_dia)):
+        if not cantidad_dia:
+            continue
+        ultimo_dia = dia == dias - 1
+        segundos = []
+        for hora in rng.choices(range(24), weights=PESO_HORA, k=cantidad_dia):
+            segundo = hora * 3600 + rng.randrange(3600)
+            segundos.append(segundo % (segundos_hoy + 1) if ultimo_dia else segundo)  # hoy, sin pasar de ahora
+        segundos.sort()
+        for vendedor_id, segundo in zip(rng.choices(vendedores, weights=pesos_vendedor, k=cantidad_dia), segundos):
+            productos, acumulados = surtidos[vendedor_id]
+            producto_id = rng.choices(productos, cum_weights=acumulados)[0]
+            cantidad = 1 if rng.random() < 0.7 else rng.randint(2, 6)
+            precio_compra, precio_venta = precios[producto_id]
+            comision = round((precio_venta - precio_compra) * cantidad * porcentaje, 2)
+            yield (vendedor_id, producto_id, cantidad, comision,
+                   (fecha + timedelta(seconds=segundo)).strftime("%Y-%m-%d %H:%M:%S"))
+
+def generar(ruta, ventas=1_000_000, vendedores=50, productos=2_000, surtido=200, dias=365,
+            sorteos=3, numeros=100_000, usuarios=20_000, semilla=1):
+    """Crea `ruta` desde cero con el esquema de main.py y database.py y la llena. Devuelve los conteos."""
+    if os.path.exists(ruta):
+        raise FileExistsError(f"{ruta} ya existe; la base sintética se genera siempre desde cero")
+    # main lee DATABASE_NAME al importarse: así cualquier efecto del import cae en la base nueva
+    os.environ["DATABASE_NAME"] = ruta
+    import comisiones
+    import credenciales
+    import database
+    import main
+
+    rng = random.Random(semilla)
+    main.create_database(ruta)
+    if not database.crear_tablas(ruta):
+        raise RuntimeError("No se pudieron crear las tablas de sorteos.")
+
+    conn = sqlite3.connect(ruta, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+    indices = _indices_de(conn, ("ventas", "movimientos_inventario"))
+    for nombre, _ in indices:
+        conn.execute(f"DROP INDEX {nombre}")
+
+    conn.execute("BEGIN")
+    # scrypt cuesta lo suyo a propósito: un solo hash para todos
+    contrasena = credenciales.hashear(CONTRASENA)
+    conn.executemany("INSERT INTO vendedores (id, usuario, contrasena, nombre) VALUES (?, ?, ?, ?)",
+                     ((v, f"vendedor{v}", contrasena, f"Vendedor {v}") for v in range(1, vendedores + 1)))
+
+    precios = {}
+    for producto_id in range(1, productos + 1):
+        precio_compra = round(rng.uniform(0.5, 40), 2)
+        precios[producto_id] = (precio_compra, round(precio_compra * rng.uniform(1.2, 2.0), 2))
+    conn.executemany("INSERT INTO productos (id, nombre, precio_compra, precio_venta) VALUES (?, ?, ?, ?)",
+                     ((p, f"Producto {p:05d}", *precios[p]) for p in precios))
+
+    # Cada vendedor lleva un surtido propio; dentro de él pocos productos se llevan casi todo
+    surtidos = {}
+    popularidad = _pesos_zipf(productos)
+    for vendedor_id in range(1, vendedores + 1):
+        # Muestra ponderada sin reposición: los productos populares están en casi todos los surtidos
+        claves = sorted(range(1, productos + 1), key=lambda p: rng.random() ** (1 / popularidad[p - 1]), reverse=True)
+        elegidos = sorted(claves[:surtido])
+        surtidos[vendedor_id] = (elegidos, list(itertools.accumulate(popularidad[p - 1] for p in elegidos)))
+    conn.executemany("INSERT INTO inventario (vendedor_id, producto_id, cantidad_entregada) VALUES (?, ?, ?)",
+                     ((v, p, rng.randint(50, 500)) for v, (elegidos, _) in surtidos.items() for p in elegidos))
+
+    hasta = datetime.now(timezone.utc).replace(tzinfo=None)
+    filas = generar_ventas(rng, ventas, dias, list(range(1, vendedores + 1)), surtidos, precios,
+                           comisiones.PORCENTAJE_POR_DEFECTO, hasta)
+    conn.executemany("INSERT INTO ventas (vendedor_id, producto_id, cantidad_vendida, comision, fecha) VALUES (?, ?, ?, ?, ?)",
+                     filas)
+
+    conn.executemany("INSERT INTO sesiones (chat_id, vendedor_id, fecha_inicio) VALUES (?, ?, ?)",
+                     ((100_000 + v, v, hasta.date().isoformat()) for v in range(1, vendedores + 1)))
+
+    def usuario(u):
+        # Uno de cada veinte ganó algo alguna vez
+        premios = [round(rng.paretovariate(1.5) * 10, 2) for _ in range(rng.randint(1, 3))] if rng.random() < 0.05 else []
+        return (u, f"usuario{u}", f"Usuario {u}", len(premios), sum(premios), rng.randint(len(premios), 30), max(premios, default=0.0))
+    conn.executemany("""
+        INSERT INTO usuarios (id, username, first_name, sorteos_ganados, dinero_ganado, sorteos_participados, mayor_ganancia)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (usuario(u) for u in range(1, usuarios + 1)))
+
+    reservas = 0
+    for sorteo_id in range(1, sorteos + 1):
+        conn.execute("INSERT INTO sorteos (id, nombre, premio, valor_numero, cantidad_numeros) VALUES (?, ?, ?, ?, ?)",
+                     (sorteo_id, f"Sorteo {sorteo_id}", "Premio", 1.0, numeros))
+        vendidos = set(rng.sample(range(1, numeros + 1), int(numeros * rng.uniform(0.3, 0.7))))
+        conn.executemany("INSERT INTO numeros (sorteo_id, numero, disponible) VALUES (?, ?, ?)",
+                         ((sorteo_id, n, 0 if n in vendidos else 1) for n in range(1, numeros + 1)))
+        estados, pesos = zip(*ESTADOS_RESERVA)
+        conn.executemany("INSERT INTO reservas (usuario_id, sorteo_id, numero, estado) VALUES (?, ?, ?, ?)",
+                         ((rng.randint(1, usuarios), sorteo_id, n, rng.choices(estados, weights=pesos)[0])
+                          for n in sorted(vendidos)))
+        reservas += len(vendidos)
+
+    conn.execute("INSERT INTO metadatos (clave, valor) VALUES ('version_datos', ?) ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor",
+                 (str(main.DATOS_VERSION),))
+    conn.execute("COMMIT")
+
+    for _, sql in indices:
+        conn.execute(sql)
+    conn.execute(f"PRAGMA user_version = {main.ESQUEMA_VERSION}")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA locking_mode = NORMAL")
+    conn.execute("PRAGMA journal_mode = WAL")  # el modo con el que la abre el bot
+    conn.close()
+    return {"vendedores": vendedores, "productos": productos, "ventas": ventas,
+            "sorteos": sorteos, "numeros": sorteos * numeros, "reservas": reservas, "usuarios": usuarios}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera una base sintética con el esquema del bot.")
+    parser.add_argument("ruta", help="archivo a crear (no debe existir)")
+    parser.add_argument("--ventas", type=int, default=1_000_000)
+    parser.add_argument("--vendedores", type=int, default=50)
+    parser.add_argument("--productos", type=int, default=2_000)
+    parser.add_argument("--surtido", type=int, default=200, help="productos distintos por vendedor")
+    parser.add_argument("--dias", type=int, default=365, help="días de historia, terminando hoy")
+    parser.add_argument("--sorteos", type=int, default=3)
+    parser.add_argument("--numeros", type=int, default=100_000, help="números por sorteo")
+    parser.add_argument("--usuarios", type=int, default=20_000)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    inicio = time.perf_counter()
+    try:
+        conteos = generar(args.ruta, args.ventas, args.vendedores, args.productos, args.surtido, args.dias,
+                          args.sorteos, args.numeros, args.usuarios, args.semilla)
+    except FileExistsError as e:
+        sys.exit(str(e))
+    print(f"{args.ruta} generada en {time.perf_counter() - inicio:.1f}s: "
+          + ", ".join(f"{tabla} {cantidad:,}" for tabla, cantidad in conteos.items()))
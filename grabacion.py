@@ -0,0 +1,79 @@
+import copy
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from telebot import apihelper, asyncio_helper, types
+
+GRABAR_UPDATES_DIR = os.getenv("GRABAR_UPDATES_DIR")  # vacío = no se graba nada
+CONTRASENA_CENSURADA = "<contraseña>"
+
+class GrabadorUpdates:
+    """
+    Agrega cada update crudo que llega por getUpdates a un JSONL comprimido, uno por día
+    (updates-AAAAMMDD.jsonl.gz), como {"t": epoch de llegada, "update": {...}}.
+
+    Cada lote de getUpdates se escribe como un miembro gzip propio y se cierra enseguida:
+    si el proceso muere, como mucho se pierde el lote en curso y lo anterior sigue legible.
+    `censurar(updates)` recibe una copia del lote y puede modificarla antes de guardarla
+    (main.py la usa para no grabar contraseñas).
+    """
+
+    def __init__(self, directorio, censurar=None):
+        self.directorio = directorio
+        self.censurar = censurar
+        self.grabados = 0
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def ruta_del_dia(self):
+        return os.path.join(self.directorio, f"updates-{datetime.now(timezone.utc):%Y%m%d}.jsonl.gz")
+
+    def grabar(self, crudos):
+        if not crudos:
+            return
+        llegada = time.time()
+        try:
+            copias = copy.deepcopy(crudos)
+            if self.censurar:
+                self.censurar(copias)
+            lineas = "".join(json.dumps({"t": llegada, "update": update}, ensure_ascii=False) + "\n" for update in copias)
+            with self._lock, gzip.open(self.ruta_del_dia(), "at", encoding="utf-8") as salida:
+                salida.write(lineas)
+            self.grabados += len(copias)
+        except Exception as e:
+            # Grabar es opcional: un disco lleno no debe frenar al bot
+            logging.error(f"Error al grabar updates: {e}")
+
+    def envolver(self, bot):
+        """Hace que `bot` (TeleBot) grabe lo que recibe por polling."""
+        def get_updates(offset=None, limit=None, timeout=20, allowed_updates=None, long_polling_timeout=20):
+            crudos = apihelper.get_updates(bot.token, offset, limit, timeout, allowed_updates, long_polling_timeout)
+            self.grabar(crudos)
+            return [types.Update.de_json(crudo) for crudo in crudos]
+        bot.get_updates = get_updates
+
+    def envolver_asincrono(self, bot):
+        """Lo mismo para un AsyncTeleBot."""
+        async def get_updates(offset=None, limit=None, timeout=20, allowed_updates=None, request_timeout=None):
+            crudos = await asyncio_helper.get_updates(bot.token, offset, limit, timeout, allowed_updates, request_timeout)
+            self.grabar(crudos)
+            return [types.Update.de_json(crudo) for crudo in crudos]
+        bot.get_updates = get_updates
+
+def leer_grabacion(rutas):
+    """Genera (t, update) de los archivos en orden. Un final truncado (el proceso murió escribiendo) se ignora."""
+    for ruta in rutas:
+        try:
+            with gzip.open(ruta, "rt", encoding="utf-8") as entrada:
+                for linea in entrada:
+                    if not linea.endswith("\n"):
+                        break
+                    registro = json.loads(linea)
+                    yield registro["t"], registro["update"]
+        except (EOFError, gzip.BadGzipFile) as e:
+            logging.warning(f"{ruta}: grabación truncada ({e}); se usa lo leído hasta ahí.")
@@ -0,0 +1,205 @@
+import collections
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+from telebot import types
+
+import archivo
+import database
+
+# Historial de ventas de un vendedor por día o rango, en páginas de TAMANO_PAGINA ventas.
+# Las páginas se recorren por id (keyset): cada botón lleva el id de la última venta mostrada
+# y la consulta sigue desde ahí por el índice (vendedor_id, id), sin OFFSET, así que la
+# página 40 de un año cuesta lo mismo que la primera. Los textos ya armados se guardan por
+# (vendedor, rango, versión de sus ventas); la versión la suben los triggers de ventas.
+TAMANO_PAGINA = 20
+LARGO_NOMBRE = 32  # con nombres recortados una línea no pasa de ~90 caracteres
+LIMITE_MENSAJE = 4096  # límite de Telegram para el texto de un mensaje
+PAGINAS_EN_CACHE = 512
+FECHA_MINIMA = date(2000, 1, 1)  # ningún rango empieza antes; las fechas extremas desbordan al mover el período
+RANGOS = (("Hoy", 0), ("7 días", 6), ("30 días", 29))  # (etiqueta, días antes de hoy)
+
+_cache = collections.OrderedDict()  # clave -> resumen del rango o (texto, markup) de una página
+_lock = threading.Lock()
+
+def hoy():
+    # Las fechas de ventas se guardan en UTC
+    return datetime.now(timezone.utc).date()
+
+def datos_callback(desde, hasta, direccion="a", cursor=0):
+    """callback_data de una página: 'a' = ventas anteriores al id `cursor`, 'd' = posteriores; 0 = desde el principio."""
+    return f"hist_{desde:%Y%m%d}_{hasta:%Y%m%d}_{direccion}_{cursor}"
+
+def leer_callback(datos):
+    """Devuelve (desde, hasta, direccion, cursor) de un callback_data de datos_callback, o None si no es válido."""
+    try:
+        _, desde, hasta, direccion, cursor = datos.split("_")
+        desde = datetime.strptime(desde, "%Y%m%d").date()
+        hasta = datetime.strptime(hasta, "%Y%m%d").date()
+        cursor = int(cursor)
+    except ValueError:
+        return None
+    rango = _acotar(desde, hasta)
+    if rango is None or direccion not in ("a", "d") or cursor < 0:
+        return None
+    return (*rango, direccion, cursor)
+
+def _acotar(desde, hasta):
+    """Limita el rango a [FECHA_MINIMA, hoy]; None si está al revés o queda vacío."""
+    desde, hasta = max(desde, FECHA_MINIMA), min(hasta, hoy())
+    return (desde, hasta) if desde <= hasta else None
+
+def version_ventas(conn, vendedor_id):
+    fila = conn.execute("SELECT version FROM versiones_ventas WHERE vendedor_id = ?", (vendedor_id,)).fetchone()
+    return fila[0] if fila else 0
+
+def calcular_resumen(conn, vendedor_id, desde, hasta):
+    """Devuelve (ventas, unidades, total, comision, primer id, último id) del vendedor en el rango."""
+    return conn.execute(f"""
+        SELECT COUNT(*), COALESCE(SUM(v.cantidad_vendida), 0), COALESCE(SUM(p.precio_venta * v.cantidad_vendida), 0),
+               COALESCE(SUM(v.comision), 0), MIN(v.id), MAX(v.id)
+        FROM {archivo.fuente_ventas(conn, desde)} v
+        JOIN productos p ON p.id = v.producto_id
+        WHERE v.vendedor_id = ? AND v.fecha >= ? AND v.fecha < date(?, '+1 day')
+    """, (vendedor_id, str(desde), str(hasta))).fetchone()
+
+def leer_pagina(conn, vendedor_id, desde, hasta, direccion, cursor, primer_id, ultimo_id, tamano=TAMANO_PAGINA):
+    """
+    Devuelve [(id, fecha, producto, cantidad, total, comision)], de la más reciente a la más vieja:
+    las `tamano` ventas del rango anteriores (direccion 'a') o posteriores ('d') al id `cursor`.
+    Los ids extremos del rango acotan la búsqueda para que la última página no siga de largo.
+    """
+    if direccion == "a":
+        despues_de, antes_de, orden = primer_id - 1, cursor, "DESC"
+    else:
+        despues_de, antes_de, orden = cursor, ultimo_id + 1, "ASC"
+    filas = conn.execute(f"""
+        SELECT v.id, v.fecha, p.nombre, v.cantidad_vendida, p.precio_venta * v.cantidad_vendida, v.comision
+        FROM {archivo.fuente_ventas(conn, desde)} v
+        JOIN productos p ON p.id = v.producto_id
+        WHERE v.vendedor_id = ? AND v.id > ? AND v.id < ? AND v.fecha >= ? AND v.fecha < date(?, '+1 day')
+        ORDER BY v.id {orden}
+        LIMIT ?
+    """, (vendedor_id, despues_de, antes_de, str(desde), str(hasta), tamano)).fetchall()
+    return filas if direccion == "a" else filas[::-1]
+
+def contar_posteriores(conn, vendedor_id, desde, hasta, venta_id, ultimo_id):
+    """Cuántas ventas del rango son posteriores a `venta_id` (para numerar la página)."""
+    return conn.execute(f"""
+        SELECT COUNT(*)
+        FROM {archivo.fuente_ventas(conn, desde)} v
+        JOIN productos p ON p.id = v.producto_id
+        WHERE v.vendedor_id = ? AND v.id > ? AND v.id <= ? AND v.fecha >= ? AND v.fecha < date(?, '+1 day')
+    """, (vendedor_id, venta_id, ultimo_id, str(desde), str(hasta))).fetchone()[0]
+
+def _guardar(clave, valor):
+    with _lock:
+        _cache[clave] = valor
+        _cache.move_to_end(clave)
+        while len(_cache) > PAGINAS_EN_CACHE:
+            _cache.popitem(last=False)
+    return valor
+
+def _buscar(clave):
+    with _lock:
+        valor = _cache.get(clave)
+        if valor is not None:
+            _cache.move_to_end(clave)
+        return valor
+
+def _titulo(desde, hasta):
+    if desde == hasta:
+        return f"📊 Historial del {desde:%d/%m/%Y}"
+    return f"📊 Historial del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}"
+
+def _linea(fecha, producto, cantidad, total, comision):
+    if len(producto) > LARGO_NOMBRE:
+        producto = producto[:LARGO_NOMBRE - 1] + "…"
+    return f"{fecha[8:10]}/{fecha[5:7]} {fecha[11:16]} · {producto} x{cantidad} · ${total:.2f} · com. ${comision:.2f}"
+
+def _teclado(desde, hasta, pagina, primer_id, ultimo_id):
+    markup = types.InlineKeyboardMarkup()
+    paginas = []
+    if pagina and pagina[0][0] < ultimo_id:
+        paginas.append(types.InlineKeyboardButton("⬅️ Más recientes", callback_data=datos_callback(desde, hasta, "d", pagina[0][0])))
+    if pagina and pagina[-1][0] > primer_id:
+        paginas.append(types.InlineKeyboardButton("Más antiguas ➡️", callback_data=datos_callback(desde, hasta, "a", pagina[-1][0])))
+    if paginas:
+        markup.row(*paginas)
+
+    largo = hasta - desde + timedelta(days=1)
+    un_dia = desde == hasta
+    periodos = []
+    if desde - FECHA_MINIMA >= largo:
+        periodos.append(types.InlineKeyboardButton("◀️ Día anterior" if un_dia else "◀️ Anterior",
+                                                   callback_data=datos_callback(desde - largo, hasta - largo)))
+    if hasta < hoy():
+        siguiente_hasta = min(hasta + largo, hoy())
+        periodos.append(types.InlineKeyboardButton("Día siguiente ▶️" if un_dia else "Siguiente ▶️",
+                                                   callback_data=datos_callback(siguiente_hasta - largo + timedelta(days=1), siguiente_hasta)))
+    if periodos:
+        markup.row(*periodos)
+    markup.row(*(types.InlineKeyboardButton(etiqueta, callback_data=datos_callback(hoy() - timedelta(days=dias), hoy()))
+                 for etiqueta, dias in RANGOS))
+    markup.add(types.InlineKeyboardButton("Volver al menú principal", callback_data='volver_menu'))
+    return markup
+
+def _armar_pagina(conn, vendedor_id, desde, hasta, direccion, cursor, resumen):
+    cantidad_ventas, unidades, total, comision, primer_id, ultimo_id = resumen
+    mensaje = _titulo(desde, hasta) + "\n"
+    if not cantidad_ventas:
+        mensaje += "\nNo registraste ventas en este período."
+        return mensaje, _teclado(desde, hasta, [], 0, 0)
+
+    if cursor == 0:
+        direccion, cursor = "a", ultimo_id + 1
+    pagina = leer_pagina(conn, vendedor_id, desde, hasta, direccion, cursor, primer_id, ultimo_id)
+    mensaje += (f"Ventas: {cantidad_ventas} · Unidades: {unidades}\n"
+                f"Total: ${total:.2f} 🎉 · Comisión: ${comision:.2f} 💰\n")
+    if pagina:
+        inicio = contar_posteriores(conn, vendedor_id, desde, hasta, pagina[0][0], ultimo_id) + 1
+        mensaje += f"\nVentas {inicio}–{inicio + len(pagina) - 1} de {cantidad_ventas}:\n"
+        mensaje += "\n".join(_linea(*fila[1:]) for fila in pagina)
+    # Con TAMANO_PAGINA líneas acotadas no debería pasar nunca; si cambian los textos, que se note en el log
+    if len(mensaje) > LIMITE_MENSAJE:
+        logging.warning(f"Página de historial de {len(mensaje)} caracteres; se recorta.")
+        mensaje = mensaje[:LIMITE_MENSAJE - 1] + "…"
+    return mensaje, _teclado(desde, hasta, pagina, primer_id, ultimo_id)
+
+def vista_historial(vendedor_id, desde=None, hasta=None, direccion="a", cursor=0):
+    """Texto y teclado de una página del historial (por defecto, la primera de hoy)."""
+    desde = desde or hoy()
+    hasta = hasta or desde
+    conn = database.crear_conexion()
+    if conn is None:
+        return "No se pudo cargar el historial ❌. Intenta de nuevo más tarde.", _teclado(desde, hasta, [], 0, 0)
+    try:
+        version = version_ventas(conn, vendedor_id)
+        clave_rango = (vendedor_id, desde, hasta, version)
+        clave_pagina = clave_rango + (direccion, cursor, hoy())  # los botones de período dependen de hoy
+        vista = _buscar(clave_pagina)
+        if vista is None:
+            resumen = _buscar(clave_rango) or _guardar(clave_rango, calcular_resumen(conn, vendedor_id, desde, hasta))
+            vista = _guardar(clave_pagina, _armar_pagina(conn, vendedor_id, desde, hasta, direccion, cursor, resumen))
+        return vista
+    except sqlite3.Error as e:
+        logging.error(f"Error al armar el historial de {vendedor_id}: {e}")
+        return "No se pudo cargar el historial ❌. Intenta de nuevo más tarde.", _teclado(desde, hasta, [], 0, 0)
+    finally:
+        conn.close()
+
+def leer_rango(argumentos):
+    """
+    Convierte los argumentos de /historial en (desde, hasta): nada = hoy, una fecha = ese día,
+    dos fechas = el rango, acotado a [FECHA_MINIMA, hoy]. Devuelve None si alguna fecha no es
+    AAAA-MM-DD o el rango está al revés o es todo futuro.
+    """
+    try:
+        fechas = [date.fromisoformat(argumento) for argumento in argumentos[:2]]
+    except ValueError:
+        return None
+    if not fechas:
+        return hoy(), hoy()
+    return _acotar(fechas[0], fechas[-1])
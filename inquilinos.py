@@ -0,0 +1,182 @@
+"""
+Varios negocios en un solo proceso: `python inquilinos.py negocios/*.env`.
+
+Cada archivo .env describe un negocio (TELEGRAM_TOKEN obligatorio; ADMIN_CHAT_ID, LOG_GROUP_ID,
+DATABASE_NAME y el resto de las variables de siempre, opcionales). El nombre del archivo es el
+nombre del negocio y de él salen los valores por defecto de sus rutas (<nombre>.db, etc.).
+
+Los módulos del bot guardan su estado a nivel de módulo (la base, el almacén, las sesiones,
+los estados de cada chat), así que cada negocio recibe su propia copia de esos módulos: se
+importan de nuevo con su entorno y se quitan de sys.modules antes de cargar el siguiente.
+Lo pesado (Python, telebot, aiohttp, requests, numpy) se carga una sola vez. Se comparten:
+
+- el event loop y los dos pools de hilos de asincrono.py (base de datos y handlers síncronos);
+- la sesión aiohttp de telebot y una única requests.Session para los envíos en segundo plano;
+- las métricas: un resumen de todos los negocios en el log cada INTERVALO_METRICAS segundos.
+
+Cada negocio conserva sus conexiones SQLite (por hilo), cachés, límites y estados.
+"""
+import asyncio
+import contextvars
+import importlib
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import dotenv_values
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+HILOS_DB = 8
+HILOS_HEREDADOS = 8
+CONEXIONES_HTTP = 32
+INTERVALO_METRICAS = 300
+
+# Negocio de la tarea asyncio en curso, para los errores que salen de código compartido
+NEGOCIO = contextvars.ContextVar("negocio", default=None)
+# id(globales de cada módulo cargado) -> negocio dueño de esa copia
+_DUENOS = {}
+
+class Inquilino:
+    """Un negocio cargado: su nombre y sus copias de `main` y `asincrono`."""
+
+    def __init__(self, nombre, modulos):
+        self.nombre = nombre
+        self.modulos = modulos
+        self.main = modulos["main"]
+        self.asincrono = modulos["asincrono"]
+
+class FiltroNegocio(logging.Filter):
+    """
+    Deja pasar al manejador de un negocio solo los registros que le pertenecen.
+
+    Cada negocio tiene sus propias copias de los módulos, así que el primer marco de la pila
+    que sea código del bot dice de quién es el registro, en cualquier hilo (pools compartidos,
+    enviadores, cierre diario). Si el error sale de código compartido (telebot, aiohttp), vale
+    el negocio de la tarea asyncio que lo produjo.
+    """
+
+    def __init__(self, nombre):
+        super().__init__()
+        self.nombre = nombre
+
+    def filter(self, registro):
+        marco = sys._getframe(1)
+        while marco is not None:
+            dueno = _DUENOS.get(id(marco.f_globals))
+            if dueno is not None:
+                return dueno == self.nombre
+            marco = marco.f_back
+        return NEGOCIO.get() == self.nombre
+
+def _es_del_bot(modulo):
+    ruta = getattr(modulo, "__file__", None)
+    return bool(ruta) and os.path.dirname(os.path.abspath(ruta)) == DIRECTORIO and modulo.__name__ not in (__name__, "__main__")
+
+def entorno_inquilino(ruta):
+    """Lee el .env de un negocio y completa las rutas propias que falten."""
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    valores = {clave: valor for clave, valor in dotenv_values(ruta).items() if valor is not None}
+    if not valores.get("TELEGRAM_TOKEN"):
+        raise ValueError(f"{ruta}: falta TELEGRAM_TOKEN")
+    # Vacíos en lugar de ausentes: si no, load_dotenv("config.env") los tomaría del negocio de siempre
+    valores.setdefault("ADMIN_CHAT_ID", "")
+    valores.setdefault("LOG_GROUP_ID", "")
+    valores.setdefault("DATABASE_NAME", f"{nombre}.db")
+    valores.setdefault("EVENTOS_JSONL", f"{nombre}_eventos.jsonl")
+    valores.setdefault("RESPALDOS_DIR", os.path.join(os.getenv("RESPALDOS_DIR", "respaldos"), nombre))
+    if os.getenv("GRABAR_UPDATES_DIR"):
+        valores.setdefault("GRABAR_UPDATES_DIR", os.path.join(os.getenv("GRABAR_UPDATES_DIR"), nombre))
+    return nombre, valores
+
+def cargar_inquilino(ruta):
+    """Importa una copia aislada de los módulos del bot con el entorno del negocio."""
+    nombre, valores = entorno_inquilino(ruta)
+    guardados = {clave: modulo for clave, modulo in list(sys.modules.items()) if _es_del_bot(modulo)}
+    for clave in guardados:
+        del sys.modules[clave]
+    entorno = os.environ.copy()
+    modulos = {}
+    try:
+        os.environ.update(valores)
+        importlib.import_module("asincrono")
+        modulos = {clave: modulo for clave, modulo in sys.modules.items() if _es_del_bot(modulo)}
+    finally:
+        for clave in modulos:
+            del sys.modules[clave]
+        sys.modules.update(guardados)
+        os.environ.clear()
+        os.environ.update(entorno)
+    inquilino = Inquilino(nombre, modulos)
+
+    # El manejador de errores de cada negocio cuelga del logger raíz, que es uno solo: sin el
+    # filtro, cada grupo de registro recibiría los errores de todos los negocios
+    for modulo in modulos.values():
+        _DUENOS[id(vars(modulo))] = nombre
+    for manejador in logging.getLogger().handlers:
+        if isinstance(manejador, modulos["eventos"].ManejadorEventos) and not manejador.filters:
+            manejador.addFilter(FiltroNegocio(nombre))
+    logging.info(f"Negocio {nombre} cargado ({valores['DATABASE_NAME']})")
+    return inquilino
+
+def compartir_http(conexiones=CONEXIONES_HTTP):
+    """Hace que los envíos síncronos de todos los negocios usen una sola requests.Session."""
+    sesion = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+    sesion.mount("https://", adaptador)
+    apihelper.CUSTOM_REQUEST_SENDER = sesion.request
+    return sesion
+
+def metricas(inquilinos):
+    return {inquilino.nombre: inquilino.main.metricas() for inquilino in inquilinos}
+
+async def informar_metricas(inquilinos, intervalo=INTERVALO_METRICAS):
+    while True:
+        await asyncio.sleep(intervalo)
+        logging.info("Métricas: " + json.dumps(metricas(inquilinos), ensure_ascii=False, default=str))
+
+async def ejecutar(inquilinos):
+    pool_db = ThreadPoolExecutor(max_workers=HILOS_DB, thread_name_prefix="db")
+    pool_heredados = ThreadPoolExecutor(max_workers=HILOS_HEREDADOS, thread_name_prefix="heredados")
+    for inquilino in inquilinos:
+        inquilino.asincrono.usar_pools(pool_db, pool_heredados)
+    loop = asyncio.get_running_loop()
+    for inquilino in inquilinos:
+        await loop.run_in_executor(pool_db, inquilino.main.iniciar_servicios)
+
+    tareas = []
+    for inquilino in inquilinos:
+        # Las tareas que crea el polling heredan este contexto y, con él, el negocio
+        contexto = contextvars.copy_context()
+        contexto.run(NEGOCIO.set, inquilino.nombre)
+        tareas.append(asyncio.create_task(inquilino.asincrono.bot.infinity_polling(), name=inquilino.nombre,
+                                          context=contexto))
+    tareas.append(asyncio.create_task(informar_metricas(inquilinos)))
+    try:
+        logging.info(f"{len(inquilinos)} negocios en marcha...")
+        await asyncio.gather(*tareas)
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+        await inquilinos[0].asincrono.cerrar_sesion_http()
+        pool_db.shutdown()
+        pool_heredados.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python inquilinos.py negocio1.env [negocio2.env ...]")
+    compartir_http()
+    inquilinos = [cargar_inquilino(ruta) for ruta in sys.argv[1:]]
+    try:
+        asyncio.run(ejecutar(inquilinos))
+    except Exception as e:
+        logging.exception(f"Error inesperado: {e}")
+    finally:
+        for inquilino in inquilinos:
+            inquilino.main.detener_servicios()
@@ -0,0 +1,160 @@
+import collections
+import logging
+import threading
+import time
+
+from telebot import asyncio_handler_backends
+from telebot.handler_backends import BaseMiddleware, CancelUpdate
+
+# Cubetas por (chat, tipo de update): capacidad de ráfaga y tokens que se recuperan por segundo
+CUBETAS = {
+    "message": (8, 1.0),
+    "callback_query": (15, 2.0),
+}
+INTENTOS_LOGIN = (5, 0.2)  # usuario/contraseña: ráfaga de 5 y luego uno cada 5 s
+MAXIMO_CLAVES = 10000
+
+FALLOS_ANTES_DE_BLOQUEAR = 3
+BLOQUEO_INICIAL = 30  # segundos; se duplica con cada bloqueo seguido
+BLOQUEO_MAXIMO = 3600
+OLVIDAR_FALLOS_TRAS = 24 * 3600
+
+class LimitadorTokens:
+    """
+    Cubeta de tokens por clave. Las claves viven en un OrderedDict acotado: la menos usada
+    se descarta al pasar de `maximo_claves`, y descartarla equivale a una cubeta llena.
+    """
+
+    def __init__(self, capacidad, recarga, maximo_claves=MAXIMO_CLAVES):
+        self.capacidad = capacidad
+        self.recarga = recarga
+        self.maximo_claves = maximo_claves
+        self._cubetas = collections.OrderedDict()  # clave -> (tokens, instante)
+        self._lock = threading.Lock()
+
+    def permitir(self, clave, costo=1):
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, instante = self._cubetas.pop(clave, (self.capacidad, ahora))
+            tokens = min(self.capacidad, tokens + (ahora - instante) * self.recarga)
+            permitido = tokens >= costo
+            if permitido:
+                tokens -= costo
+            self._cubetas[clave] = (tokens, ahora)
+            if len(self._cubetas) > self.maximo_claves:
+                self._cubetas.popitem(last=False)
+            return permitido
+
+    def __len__(self):
+        return len(self._cubetas)
+
+class BloqueosLogin:
+    """
+    Bloqueos crecientes por contraseña fallida. Cada FALLOS_ANTES_DE_BLOQUEAR fallos la clave
+    queda bloqueada BLOQUEO_INICIAL segundos, el doble la vez siguiente, hasta BLOQUEO_MAXIMO.
+    Un login correcto o un día sin fallos la dejan limpia.
+    """
+
+    def __init__(self, maximo_claves=MAXIMO_CLAVES):
+        self.maximo_claves = maximo_claves
+        self._estado = collections.OrderedDict()  # clave -> [fallos, bloqueos, bloqueado_hasta, ultimo_fallo]
+        self._lock = threading.Lock()
+
+    def segundos_restantes(self, clave):
+        with self._lock:
+            estado = self._estado.get(clave)
+            return max(0, int(estado[2] - time.monotonic()) + 1) if estado and estado[2] > time.monotonic() else 0
+
+    def registrar_fallo(self, clave):
+        """Anota un fallo y devuelve los segundos de bloqueo que empiezan ahora (0 si todavía no)."""
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._estado.pop(clave, None)
+            if estado is None or ahora - estado[3] > OLVIDAR_FALLOS_TRAS:
+                estado = [0, 0, 0.0, ahora]
+            estado[0] += 1
+            estado[3] = ahora
+            bloqueo = 0
+            if estado[0] % FALLOS_ANTES_DE_BLOQUEAR == 0:
+                bloqueo = min(BLOQUEO_INICIAL * 2 ** estado[1], BLOQUEO_MAXIMO)
+                estado[1] += 1
+                estado[2] = ahora + bloqueo
+            self._estado[clave] = estado
+            if len(self._estado) > self.maximo_claves:
+                self._estado.popitem(last=False)
+        if bloqueo:
+            logging.warning(f"Login bloqueado {bloqueo}s para {clave} tras {estado[0]} fallos.")
+        return bloqueo
+
+    def registrar_exito(self, clave):
+        with self._lock:
+            self._estado.pop(clave, None)
+
+class MiddlewareLimites(BaseMiddleware):
+    """
+    Se ejecuta antes que cualquier handler y descarta (CancelUpdate) lo que excede el límite,
+    así que un update descartado no toca la base ni la API de Telegram.
+
+    `es_login(message)` indica si un mensaje es un intento de usuario/contraseña: esos pasan
+    además por una cubeta más estricta y se descartan mientras el chat esté bloqueado.
+    """
+
+    update_sensitive = True
+
+    def __init__(self, bloqueos, es_login=None):
+        super().__init__()
+        self.update_types = list(CUBETAS)
+        self.cubetas = {tipo: LimitadorTokens(*parametros) for tipo, parametros in CUBETAS.items()}
+        self.login = LimitadorTokens(*INTENTOS_LOGIN)
+        self.bloqueos = bloqueos
+        self.es_login = es_login
+        self.descartados = collections.Counter()
+
+    def _descartar(self, motivo):
+        self.descartados[motivo] += 1
+        return CancelUpdate()
+
+    def pre_process_message(self, message, data):
+        chat_id = message.chat.id
+        if not self.cubetas["message"].permitir(chat_id):
+            return self._descartar("message")
+        if self.es_login and self.es_login(message):
+            if self.bloqueos.segundos_restantes(("chat", chat_id)) or not self.login.permitir(chat_id):
+                return self._descartar("login")
+
+    def pre_process_callback_query(self, call, data):
+        if not self.cubetas["callback_query"].permitir(call.message.chat.id):
+            return self._descartar("callback_query")
+
+    def post_process_message(self, message, data, exception):
+        pass
+
+    def post_process_callback_query(self, call, data, exception):
+        pass
+
+class MiddlewareLimitesAsincrono(asyncio_handler_backends.BaseMiddleware):
+    """
+    El mismo MiddlewareLimites para AsyncTeleBot: comparte cubetas, bloqueos y contadores
+    con el bot síncrono y solo traduce su CancelUpdate al de asyncio. No hace E/S.
+    """
+
+    update_sensitive = True
+
+    def __init__(self, limites):
+        super().__init__()
+        self.limites = limites
+        self.update_types = limites.update_types
+
+    async def pre_process_message(self, message, data):
+        if self.limites.pre_process_message(message, data) is not None:
+            return asyncio_handler_backends.CancelUpdate()
+
+    async def pre_process_callback_query(self, call, data):
+        if self.limites.pre_process_callback_query(call, data) is not None:
+            return asyncio_handler_backends.CancelUpdate()
+
+    async def post_process_message(self, message, data, exception):
+        pass
+
+    async def post_process_callback_query(self, call, data, exception):
+        pass
@@ -3,15 +3,44 @@ from telebot import types
 import os
 import sqlite3
 import logging
+import time
 from dotenv import load_dotenv
 from datetime import datetime, date
 
+import almacenamiento
+import alertas
+import archivo
+import aprobaciones
+import cierre
+import comisiones
+import credenciales
+import database
+import escrituras
+import eventos
+import grabacion
+import historial
+import limites
+import movimientos
+import notificaciones
+import ranking
+import respaldos
+import sesiones
+import sorteos
+import tablero
+
 # --- Configuración ---
 load_dotenv("config.env")
 TOKEN = os.environ.get("TELEGRAM_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN")
-DATABASE_NAME = "servicej.db"
+DATABASE_NAME = database.DATABASE_NAME  # DATABASE_NAME en el entorno; por defecto servicej.db
 ADMIN_CHAT_ID = os.environ.get("ADMIN_CHAT_ID", "YOUR_ADMIN_CHAT_ID")  # Add admin chat ID to .env
+LOG_GROUP_ID = os.environ.get("LOG_GROUP_ID")
+# 0 = el administrador recibe solo el cierre diario (cierre.py), no un mensaje por venta
+AVISAR_CADA_VENTA = os.environ.get("AVISAR_CADA_VENTA", "1") != "0"
+
 
+# Súbelas al cambiar las tablas o los datos iniciales para que el próximo arranque las aplique
+ESQUEMA_VERSION = 9
+DATOS_VERSION = 1
 
 # --- Datos Iniciales ---
 USUARIOS_INICIALES = [
@@ -55,13 +84,19 @@ INVENTARIO_INICIAL = [
     (3, 7, 5),
 ]
 
+# --- Almacenamiento ---
+almacen = almacenamiento.AlmacenamientoSQLite(DATABASE_NAME)
+almacenamiento.configurar(almacen)
+coordinador_ventas = escrituras.CoordinadorEscrituras(almacen)
+cache_sesiones = sesiones.CacheSesiones(almacen)
+
 # --- Configuración del Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # --- Funciones de la Base de Datos ---
-def create_database():
+def create_database(ruta=DATABASE_NAME):
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
+        conn = sqlite3.connect(ruta)
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -114,6 +149,122 @@ def create_database():
             )
         """)
 
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metadatos (
+                clave TEXT PRIMARY KEY,
+                valor TEXT NOT NULL
+            )
+        """)
+
+        # Las versiones anteriores duplicaban productos e inventario en cada reinicio
+        eliminar_duplicados(cursor)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_productos_nombre ON productos (nombre)")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_inventario_vendedor_producto ON inventario (vendedor_id, producto_id)")
+
+        crear_tablas_movimientos(cursor)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS umbrales_reposicion (
+                vendedor_id INTEGER NOT NULL,
+                producto_id INTEGER NOT NULL,
+                minimo INTEGER NOT NULL,
+                PRIMARY KEY (vendedor_id, producto_id),
+                FOREIGN KEY (vendedor_id) REFERENCES vendedores (id),
+                FOREIGN KEY (producto_id) REFERENCES productos (id)
+            )
+        """)
+
+        # Agregados de los meses que archivo.py movió a la base fría
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ventas_mensuales (
+                mes TEXT NOT NULL,  -- 'YYYY-MM'
+                vendedor_id INTEGER NOT NULL,
+                producto_id INTEGER NOT NULL,
+                cantidad INTEGER NOT NULL,
+                comision REAL NOT NULL,
+                total REAL NOT NULL,
+                PRIMARY KEY (vendedor_id, mes, producto_id)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_vendedor_fecha ON ventas (vendedor_id, fecha)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ventas_vendedor_id ON ventas (vendedor_id, id)")  # páginas del historial
+
+        # Cualquier cambio en las ventas de un vendedor (o en los productos) deja viejas las páginas
+        # de historial.py guardadas con la versión anterior
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS versiones_ventas (
+                vendedor_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS ventas_version_insert AFTER INSERT ON ventas
+            BEGIN
+                INSERT INTO versiones_ventas (vendedor_id, version) VALUES (NEW.vendedor_id, 1)
+                ON CONFLICT (vendedor_id) DO UPDATE SET version = version + 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS ventas_version_update AFTER UPDATE ON ventas
+            BEGIN
+                UPDATE versiones_ventas SET version = version + 1 WHERE vendedor_id IN (OLD.vendedor_id, NEW.vendedor_id);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS ventas_version_delete AFTER DELETE ON ventas
+            BEGIN
+                UPDATE versiones_ventas SET version = version + 1 WHERE vendedor_id = OLD.vendedor_id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS productos_version_update AFTER UPDATE ON productos
+            BEGIN
+                UPDATE versiones_ventas SET version = version + 1;
+            END
+        """)
+
+        # NULL en vendedor_id/producto_id/desde/hasta significa "cualquiera"; ver comisiones.py
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reglas_comision (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                vendedor_id INTEGER,
+                producto_id INTEGER,
+                cantidad_minima INTEGER NOT NULL DEFAULT 1,
+                porcentaje REAL NOT NULL,
+                desde TEXT,
+                hasta TEXT,
+                FOREIGN KEY (vendedor_id) REFERENCES vendedores (id),
+                FOREIGN KEY (producto_id) REFERENCES productos (id)
+            )
+        """)
+
+        # La escribe pronostico.py en cada corrida; el panel solo la lee
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sugerencias_reposicion (
+                vendedor_id INTEGER NOT NULL,
+                producto_id INTEGER NOT NULL,
+                promedio_diario REAL NOT NULL,
+                demanda_prevista REAL NOT NULL,
+                dias_cobertura REAL,  -- NULL si el par no tiene ventas recientes
+                sugerido INTEGER NOT NULL,
+                calculado TEXT NOT NULL,
+                PRIMARY KEY (vendedor_id, producto_id)
+            )
+        """)
+
+        # Un resumen por chat y día; estado 'pendiente' hasta que Telegram lo acepta (ver cierre.py)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS resumenes_diarios (
+                fecha TEXT NOT NULL,
+                chat_id INTEGER NOT NULL,
+                vendedor_id INTEGER,  -- NULL en el del administrador
+                texto TEXT NOT NULL,
+                estado TEXT NOT NULL CHECK (estado IN ('pendiente', 'enviado', 'fallido')),
+                PRIMARY KEY (fecha, chat_id)
+            )
+        """)
+
         conn.commit()
         logging.info("Base de datos y tablas creadas o ya existentes.")
         conn.close()
@@ -122,225 +273,280 @@ def create_database():
         logging.error(f"Error al crear la base de datos: {e}")
         raise
 
+def crear_tablas_movimientos(cursor):
+    """Libro de movimientos de inventario (solo se añade) y sus instantáneas periódicas."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS movimientos_inventario (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vendedor_id INTEGER NOT NULL,
+            producto_id INTEGER NOT NULL,
+            tipo TEXT NOT NULL CHECK (tipo IN ('entrega', 'venta', 'devolucion', 'transferencia', 'ajuste')),
+            cantidad INTEGER NOT NULL,  -- positiva si entra stock al vendedor, negativa si sale
+            venta_id INTEGER,
+            nota TEXT,
+            fecha TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now')),
+            FOREIGN KEY (vendedor_id) REFERENCES vendedores (id),
+            FOREIGN KEY (producto_id) REFERENCES productos (id),
+            FOREIGN KEY (venta_id) REFERENCES ventas (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_vendedor_producto ON movimientos_inventario (vendedor_id, producto_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos_inventario (fecha)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS instantaneas_inventario (
+            movimiento_id INTEGER PRIMARY KEY,  -- último movimiento incluido
+            fecha TEXT NOT NULL  -- fecha de ese movimiento
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS instantaneas_inventario_detalle (
+            movimiento_id INTEGER NOT NULL,
+            vendedor_id INTEGER NOT NULL,
+            producto_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (movimiento_id, vendedor_id, producto_id),
+            FOREIGN KEY (movimiento_id) REFERENCES instantaneas_inventario (movimiento_id)
+        )
+    """)
+
+    # Cada venta y cada fila nueva de inventario quedan en el libro sin depender de quién las escribe
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS ventas_movimiento AFTER INSERT ON ventas
+        BEGIN
+            INSERT INTO movimientos_inventario (vendedor_id, producto_id, tipo, cantidad, venta_id, fecha)
+            VALUES (NEW.vendedor_id, NEW.producto_id, 'venta', -NEW.cantidad_vendida, NEW.id, NEW.fecha);
+        END
+    """)
+
+    # Saldo de apertura para las bases de datos anteriores al libro
+    cursor.execute("SELECT COUNT(*) FROM movimientos_inventario")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("""
+            INSERT INTO movimientos_inventario (vendedor_id, producto_id, tipo, cantidad, nota)
+            SELECT vendedor_id, producto_id, 'ajuste', cantidad_entregada, 'saldo inicial' FROM inventario
+        """)
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS inventario_movimiento AFTER INSERT ON inventario
+        WHEN NEW.cantidad_entregada <> 0
+        BEGIN
+            INSERT INTO movimientos_inventario (vendedor_id, producto_id, tipo, cantidad)
+            VALUES (NEW.vendedor_id, NEW.producto_id, 'entrega', NEW.cantidad_entregada);
+        END
+    """)
+
+def eliminar_duplicados(cursor):
+    """Deja un solo producto por nombre y una sola fila de inventario por vendedor y producto."""
+    for tabla in ("ventas", "inventario"):
+        cursor.execute(f"""
+            UPDATE {tabla}
+            SET producto_id = (SELECT MIN(p2.id) FROM productos p1 JOIN productos p2 ON p2.nombre = p1.nombre
+                               WHERE p1.id = {tabla}.producto_id)
+            WHERE producto_id NOT IN (SELECT MIN(id) FROM productos GROUP BY nombre)
+        """)
+    cursor.execute("DELETE FROM productos WHERE id NOT IN (SELECT MIN(id) FROM productos GROUP BY nombre)")
+    cursor.execute("DELETE FROM inventario WHERE rowid NOT IN (SELECT MIN(rowid) FROM inventario GROUP BY vendedor_id, producto_id)")
+    if cursor.rowcount > 0:
+        logging.warning(f"Se eliminaron {cursor.rowcount} filas duplicadas de inventario.")
+
 def insertar_datos_iniciales():
     try:
         conn = sqlite3.connect(DATABASE_NAME)
         cursor = conn.cursor()
 
-        for usuario, contrasena, nombre in USUARIOS_INICIALES:
-            try:
-                cursor.execute("INSERT INTO vendedores (usuario, contrasena, nombre) VALUES (?, ?, ?)", (usuario, contrasena, nombre))
-            except sqlite3.IntegrityError:
-                logging.warning(f"El vendedor {usuario} ya existe.")
-
-        for nombre, precio_compra, precio_venta in PRODUCTOS_INICIALES:
-             try:
-                cursor.execute("INSERT INTO productos (nombre, precio_compra, precio_venta) VALUES (?, ?, ?)", (nombre, precio_compra, precio_venta))
-             except sqlite3.IntegrityError:
-                logging.warning(f"El producto {nombre} ya existe.")
-
-        for vendedor_id, producto_id, cantidad_entregada in INVENTARIO_INICIAL:
-             try:
-                cursor.execute("INSERT INTO inventario (vendedor_id, producto_id, cantidad_entregada) VALUES (?, ?, ?)", (vendedor_id, producto_id, cantidad_entregada))
-             except sqlite3.IntegrityError:
-                logging.warning(f"El inventario para el vendedor {vendedor_id} y producto {producto_id} ya existe.")
-
+        # Un executemany por tabla; lo que ya existe no se toca (el inventario actual no se pisa)
+        cursor.executemany("INSERT INTO vendedores (usuario, contrasena, nombre) VALUES (?, ?, ?) ON CONFLICT (usuario) DO NOTHING",
+                           [(usuario, credenciales.hashear(contrasena), nombre) for usuario, contrasena, nombre in USUARIOS_INICIALES])
+        cursor.executemany("INSERT INTO productos (nombre, precio_compra, precio_venta) VALUES (?, ?, ?) ON CONFLICT (nombre) DO NOTHING",
+                           PRODUCTOS_INICIALES)
+        cursor.executemany("INSERT INTO inventario (vendedor_id, producto_id, cantidad_entregada) VALUES (?, ?, ?) ON CONFLICT (vendedor_id, producto_id) DO NOTHING",
+                           INVENTARIO_INICIAL)
+        cursor.execute("INSERT INTO metadatos (clave, valor) VALUES ('version_datos', ?) ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor",
+                       (str(DATOS_VERSION),))
 
         conn.commit()
         logging.info("Datos iniciales insertados en la base de datos.")
         conn.close()
+        return True
 
     except sqlite3.Error as e:
         logging.error(f"Error al insertar datos iniciales: {e}")
         conn.rollback()
         conn.close()
+        return False
 
-def get_vendedor(usuario):
+def obtener_versiones():
+    """Devuelve (versión del esquema, versión de los datos iniciales) guardadas en la base de datos."""
+    conn = sqlite3.connect(DATABASE_NAME)
     try:
-        conn = sqlite3.connect(DATABASE_NAME)
         cursor = conn.cursor()
-        cursor.execute("SELECT id, nombre, contrasena FROM vendedores WHERE usuario = ?", (usuario,))
-        result = cursor.fetchone()
+        version_esquema = cursor.execute("PRAGMA user_version").fetchone()[0]
+        try:
+            fila = cursor.execute("SELECT valor FROM metadatos WHERE clave = 'version_datos'").fetchone()
+        except sqlite3.OperationalError:
+            fila = None  # la tabla metadatos todavía no existe
+        return version_esquema, int(fila[0]) if fila else 0
+    finally:
         conn.close()
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener vendedor: {e}")
-        return None
 
-def get_productos():
-    try:
+def inicializar_base_de_datos():
+    """Aplica solo las fases de arranque pendientes y registra cuánto tardó cada una."""
+    inicio = time.perf_counter()
+    tiempos = []
+
+    def medir(fase, desde):
+        tiempos.append(f"{fase} {(time.perf_counter() - desde) * 1000:.1f} ms")
+
+    t = time.perf_counter()
+    version_esquema, version_datos = obtener_versiones()
+    medir("versiones", t)
+
+    if version_esquema < ESQUEMA_VERSION:
+        t = time.perf_counter()
+        create_database()
+        if not database.crear_tablas():
+            raise RuntimeError("No se pudieron crear las tablas de sorteos.")
         conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, nombre FROM productos")
-        result = cursor.fetchall()
+        conn.execute(f"PRAGMA user_version = {ESQUEMA_VERSION}")
         conn.close()
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener productos: {e}")
-        return []
+        medir("esquema", t)
+    else:
+        tiempos.append("esquema al día")
+
+    if version_datos < DATOS_VERSION:
+        t = time.perf_counter()
+        insertar_datos_iniciales()
+        medir("datos iniciales", t)
+    else:
+        tiempos.append("datos iniciales al día")
+
+    logging.info(f"Arranque de la base de datos en {(time.perf_counter() - inicio) * 1000:.1f} ms: " + ", ".join(tiempos))
+
+def get_vendedor(usuario):
+    return almacen.obtener_vendedor(usuario)
+
+def get_productos():
+    return almacen.obtener_productos()
 
 def get_producto(producto_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT precio_compra, precio_venta, nombre FROM productos WHERE id = ?", (producto_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener producto: {e}")
-        return None
+    return almacen.obtener_producto(producto_id)
 
 def get_inventario(vendedor_id, producto_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT cantidad_entregada FROM inventario WHERE vendedor_id = ? AND producto_id = ?", (vendedor_id, producto_id))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 0
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener inventario: {e}")
-        return 0
+    return almacen.obtener_inventario(vendedor_id, producto_id)
 
 def registrar_venta(vendedor_id, producto_id, cantidad_vendida):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
+    producto = almacen.obtener_producto(producto_id)
+    if not producto:
+        logging.error(f"Producto con ID {producto_id} no encontrado.")
+        return False
 
-        cursor.execute("SELECT precio_compra, precio_venta, nombre FROM productos WHERE id = ?", (producto_id,))
-        producto = cursor.fetchone()
-
-        if producto:
-            precio_compra = producto[0]
-            precio_venta = producto[1]
-            nombre_producto = producto[2]  # Get product name
-            ganancia_por_unidad = precio_venta - precio_compra
-            comision_vendedor = 0.20 * ganancia_por_unidad * cantidad_vendida
-
-            cursor.execute("INSERT INTO ventas (vendedor_id, producto_id, cantidad_vendida, comision) VALUES (?, ?, ?, ?)",
-                           (vendedor_id, producto_id, cantidad_vendida, comision_vendedor))
-
-            cursor.execute("UPDATE inventario SET cantidad_entregada = cantidad_entregada - ? WHERE vendedor_id = ? AND producto_id = ?",
-                           (cantidad_vendida, vendedor_id, producto_id))
-
-            conn.commit()
-            logging.info(f"Venta registrada: Vendedor {vendedor_id}, Producto {producto_id}, Cantidad {cantidad_vendida}, Comisión: ${comision_vendedor:.2f}")
-            conn.close()
-
-            # Notify admin
-            vendedor_info = get_vendedor_by_id(vendedor_id)
-            vendedor_nombre = vendedor_info[1] if vendedor_info else "Unknown"
-            notification_message = (f"Nueva venta registrada:\n"
-                                    f"Vendedor: {vendedor_nombre} (ID: {vendedor_id})\n"
-                                    f"Producto: {nombre_producto} (ID: {producto_id})\n"
-                                    f"Cantidad: {cantidad_vendida}\n"
-                                    f"Comisión del vendedor: ${comision_vendedor:.2f}")
-            bot.send_message(ADMIN_CHAT_ID, notification_message)
-            return True
-        else:
-            logging.error(f"Producto con ID {producto_id} no encontrado.")
-            conn.close()
-            return False
+    precio_compra = producto[0]
+    precio_venta = producto[1]
+    nombre_producto = producto[2]  # Get product name
+    ganancia_por_unidad = precio_venta - precio_compra
+    porcentaje = comisiones.motor.porcentaje(vendedor_id, producto_id, cantidad_vendida)
+    comision_vendedor = porcentaje * ganancia_por_unidad * cantidad_vendida
 
-    except sqlite3.Error as e:
-        logging.error(f"Error al registrar venta: {e}")
-        conn.rollback()
-        conn.close()
+    if not coordinador_ventas.registrar_venta(vendedor_id, producto_id, cantidad_vendida, comision_vendedor):
+        logging.warning(f"No se pudo registrar la venta: Vendedor {vendedor_id}, Producto {producto_id}, Cantidad {cantidad_vendida}")
+        bus_eventos.emitir("venta_rechazada", vendedor_id=vendedor_id, producto=nombre_producto, cantidad=cantidad_vendida)
         return False
+    logging.info(f"Venta registrada: Vendedor {vendedor_id}, Producto {producto_id}, Cantidad {cantidad_vendida}, Comisión: ${comision_vendedor:.2f}")
+
+    # Notify admin
+    vendedor_info = get_vendedor_by_id(vendedor_id)
+    vendedor_nombre = vendedor_info[1] if vendedor_info else "Unknown"
+    if AVISAR_CADA_VENTA:
+        notification_message = (f"Nueva venta registrada:\n"
+                                f"Vendedor: {vendedor_nombre} (ID: {vendedor_id})\n"
+                                f"Producto: {nombre_producto} (ID: {producto_id})\n"
+                                f"Cantidad: {cantidad_vendida}\n"
+                                f"Comisión del vendedor: ${comision_vendedor:.2f}")
+        enviador.encolar(ADMIN_CHAT_ID, notification_message)
+    bus_eventos.emitir("venta", vendedor=vendedor_nombre, producto=nombre_producto, cantidad=cantidad_vendida,
+                       comision=round(comision_vendedor, 2))
+
+    # Solo se evalúa la fila que esta venta acaba de tocar
+    alertas_stock.evaluar(vendedor_id, producto_id, get_inventario(vendedor_id, producto_id), vendedor_nombre, nombre_producto)
+    return True
 
 def obtener_ventas_diarias(vendedor_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT p.nombre, SUM(v.cantidad_vendida), SUM(p.precio_venta * v.cantidad_vendida), SUM(v.comision), p.id
-            FROM ventas v
-            JOIN productos p ON v.producto_id = p.id
-            WHERE v.vendedor_id = ? AND DATE(v.fecha) = DATE('now')
-            GROUP BY p.nombre
-        """, (vendedor_id,))
-        result = cursor.fetchall()
-        conn.close()
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener ventas diarias: {e}")
-        return []
+    return almacen.obtener_ventas_diarias(vendedor_id)
 
 def obtener_cantidad_disponible(vendedor_id, producto_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT cantidad_entregada FROM inventario WHERE vendedor_id = ? AND producto_id = ?", (vendedor_id, producto_id))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 0
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener cantidad disponible: {e}")
-        return 0
+    return almacen.obtener_inventario(vendedor_id, producto_id)
 
-def crear_sesion(chat_id, vendedor_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO sesiones (chat_id, vendedor_id, fecha_inicio) VALUES (?, ?, ?)",
-                       (chat_id, vendedor_id, date.today()))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.Error as e:
-        logging.error(f"Error al crear la sesión: {e}")
-        conn.rollback()
-        conn.close()
-        return False
+def crear_sesion(chat_id, vendedor_id, nombre):
+    return cache_sesiones.crear(chat_id, vendedor_id, nombre)
 
 def verificar_sesion_activa(chat_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        # Elimina la restricción de fecha para mantener la sesión activa indefinidamente
-        cursor.execute("SELECT vendedor_id FROM sesiones WHERE chat_id = ?", (chat_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
-    except sqlite3.Error as e:
-        logging.error(f"Error al verificar la sesión: {e}")
-        return None
+    """Devuelve (vendedor_id, nombre) de la sesión del chat o None, sin consultar la base."""
+    return cache_sesiones.resolver(chat_id)
 
 def cerrar_sesion(chat_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sesiones WHERE chat_id = ?", (chat_id,))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.Error as e:
-        logging.error(f"Error al cerrar la sesión: {e}")
-        conn.rollback()
-        conn.close()
-        return False
+    return cache_sesiones.cerrar(chat_id)
 
 def get_vendedor_by_id(vendedor_id):
-    try:
-        conn = sqlite3.connect(DATABASE_NAME)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, nombre FROM vendedores WHERE id = ?", (vendedor_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
-    except sqlite3.Error as e:
-        logging.error(f"Error al obtener vendedor por ID: {e}")
-        return None
+    return almacen.obtener_vendedor_por_id(vendedor_id)
 
 
 # --- Inicialización del Bot ---
-bot = telebot.TeleBot(TOKEN)
+bot = telebot.TeleBot(TOKEN, use_class_middlewares=True)
+enviador = notificaciones.EnviadorLimitado(bot)
+alertas_stock = alertas.AlertasStock(enviador, LOG_GROUP_ID)
+bus_eventos = eventos.BusEventos(enviador, LOG_GROUP_ID)
+logging.getLogger().addHandler(eventos.ManejadorEventos(bus_eventos))
 
 # --- Estados ---
 USUARIO = {}
 VENTA = {}
 MENSAJES = {}
+COLA_APROBACION = {}
+
+verificador_credenciales = credenciales.VerificadorCredenciales()
+
+# --- Límites por Chat ---
+bloqueos_login = limites.BloqueosLogin()
+bot_limites = limites.MiddlewareLimites(
+    bloqueos_login,
+    es_login=lambda message: USUARIO.get(message.chat.id, {}).get("estado") in ("esperando_usuario", "esperando_contrasena"))
+bot.setup_middleware(bot_limites)
+
+# --- Grabación de Updates (opcional) ---
+def censurar_updates(updates):
+    """
+    Reemplaza las contraseñas de un lote antes de grabarlo, siguiendo el estado de login de cada chat:
+    los botones de inicio de sesión lo abren o lo cierran y los textos lo hacen avanzar. Ante la duda
+    se censura: tras una contraseña el chat sigue esperando otra (pudo ser incorrecta) y tras un
+    usuario se espera la contraseña (pudo ser correcto).
+    """
+    estados = {}
+    for update in updates:
+        consulta = update.get("callback_query")
+        if consulta and consulta.get("message"):
+            chat_id = consulta["message"]["chat"]["id"]
+            if consulta.get("data") == "inicio_sesion":
+                estados[chat_id] = "esperando_usuario"
+            elif consulta.get("data") in ("volver_inicio", "cerrar_sesion"):
+                estados[chat_id] = None
+            continue
+        mensaje = update.get("message")
+        if not mensaje or "text" not in mensaje:
+            continue
+        chat_id = mensaje["chat"]["id"]
+        estado = estados.get(chat_id, USUARIO.get(chat_id, {}).get("estado"))
+        if estado in ("esperando_contrasena", "verificando"):
+            mensaje["text"] = grabacion.CONTRASENA_CENSURADA
+            estado = "esperando_contrasena"
+        elif estado == "esperando_usuario":
+            estado = "esperando_contrasena"
+        estados[chat_id] = estado
+
+grabador_updates = None
+if grabacion.GRABAR_UPDATES_DIR:
+    grabador_updates = grabacion.GrabadorUpdates(grabacion.GRABAR_UPDATES_DIR, censurar=censurar_updates)
+    grabador_updates.envolver(bot)
 
 # --- Textos de Bienvenida Personalizados ---
 MENSAJES_BIENVENIDA = {
@@ -364,20 +570,14 @@ MENSAJES_BIENVENIDA = {
     """,
 }
 
-# --- Handlers ---
-@bot.message_handler(commands=['start'])
-def cmd_start(message):
-    chat_id = message.chat.id
-    vendedor_id_sesion = verificar_sesion_activa(chat_id)
-
-    if vendedor_id_sesion:
-        vendedor_info = get_vendedor_by_id(vendedor_id_sesion)
-        if vendedor_info:
-            nombre_vendedor = vendedor_info[1]
-            USUARIO[chat_id] = {"estado": "logeado", "vendedor_id": vendedor_id_sesion, "nombre": nombre_vendedor}
-            mostrar_menu_principal(message)
-            return
+# --- Vistas ---
+# Texto y teclado de cada pantalla; las comparten los handlers de aquí y los de asincrono.py
+def teclado_volver(callback_data='volver_productos'):
+    markup = types.InlineKeyboardMarkup()
+    markup.add(types.InlineKeyboardButton("Volver", callback_data=callback_data))
+    return markup
 
+def vista_inicio():
     markup = types.InlineKeyboardMarkup()
     boton_inicio_sesion = types.InlineKeyboardButton("¡Inicia Sesión y Comienza a Ganar! 🔑", callback_data='inicio_sesion')
     markup.add(boton_inicio_sesion)
@@ -388,6 +588,102 @@ def cmd_start(message):
     Aquí puedes registrar tus ventas diarias. 📝
     ¡Impulsa tus ganancias, cada venta cuenta! 🚀
     """
+    return mensaje_bienvenida, markup
+
+def vista_menu_principal(chat_id):
+    vendedor_id = USUARIO[chat_id]["vendedor_id"]
+    nombre_vendedor = USUARIO[chat_id]["nombre"]
+
+    mensaje_bienvenida = MENSAJES_BIENVENIDA.get(vendedor_id, f"""
+    ¡Hola {nombre_vendedor}! 👋
+
+    ¡Listo para superar tus objetivos de hoy? 💪
+    """)
+
+    markup = types.InlineKeyboardMarkup()
+    boton_venta = types.InlineKeyboardButton("Registrar Venta 💰", callback_data='venta')
+    boton_historial = types.InlineKeyboardButton("Ver Historial 📊", callback_data='historial')
+    boton_cerrar_sesion = types.InlineKeyboardButton("Cerrar Sesión 🚪", callback_data='cerrar_sesion') # Nuevo botón
+    markup.add(boton_venta, boton_historial)
+    markup.add(boton_cerrar_sesion) # Añade el botón de cerrar sesión al menú
+    return mensaje_bienvenida + "\nSelecciona una opción para continuar:", markup
+
+def vista_productos(productos):
+    if not productos:
+        return "No hay productos disponibles. Contacta al administrador.", None
+    markup = types.InlineKeyboardMarkup()
+    for producto_id, nombre_producto in productos:
+        boton_producto = types.InlineKeyboardButton(nombre_producto, callback_data=f'producto_{producto_id}')
+        markup.add(boton_producto)
+    boton_volver = types.InlineKeyboardButton("Volver al menú principal", callback_data='volver_menu')
+    boton_cancelar = types.InlineKeyboardButton("Cancelar 🚫", callback_data='cancelar_venta')
+    markup.add(boton_cancelar, boton_volver)
+    return "¿Qué producto vendiste? 📦\n¡Elige el producto para registrar tu venta! 🚀", markup
+
+def vista_historial(vendedor_id, desde=None, hasta=None, direccion="a", cursor=0):
+    # Páginas por id y guardadas por versión de las ventas; ver historial.py
+    return historial.vista_historial(vendedor_id, desde, hasta, direccion, cursor)
+
+def leer_cantidad(texto):
+    """Devuelve la cantidad escrita por el vendedor, o None si no es un entero positivo."""
+    try:
+        cantidad = int(texto)
+    except (TypeError, ValueError):
+        return None
+    return cantidad if cantidad > 0 else None
+
+# --- Transiciones de Estado ---
+def registrar_bloqueo(chat_id):
+    """Anota un intento fallido; si con él empieza un bloqueo, devuelve el aviso para el chat."""
+    bloqueo = bloqueos_login.registrar_fallo(("chat", chat_id))
+    if not bloqueo:
+        return None
+    bus_eventos.emitir("login_bloqueado", chat_id=chat_id, segundos=bloqueo)
+    USUARIO[chat_id] = {}
+    return f"Demasiados intentos fallidos 🚫. Podrás intentarlo de nuevo en {bloqueo} segundos."
+
+def aceptar_usuario(chat_id, usuario, vendedor):
+    USUARIO[chat_id]["vendedor_id"] = vendedor[0]
+    USUARIO[chat_id]["nombre"] = vendedor[1]
+    USUARIO[chat_id]["usuario"] = usuario
+    USUARIO[chat_id]["estado"] = "esperando_contrasena"
+
+def aplicar_login(chat_id, correcta):
+    """
+    Aplica el resultado de la verificación de contraseña. Devuelve None si el chat ya no la
+    esperaba (volvió al inicio), True si quedó logeado y False si la contraseña no era.
+    """
+    if USUARIO.get(chat_id, {}).get("estado") != "verificando":
+        return None
+    if correcta:
+        vendedor_id = USUARIO[chat_id]["vendedor_id"]
+        crear_sesion(chat_id, vendedor_id, USUARIO[chat_id]["nombre"])
+        USUARIO[chat_id]["estado"] = "logeado"
+        bus_eventos.emitir("inicio_sesion", vendedor_id=vendedor_id, chat_id=chat_id)
+        bloqueos_login.registrar_exito(("chat", chat_id))
+        return True
+    USUARIO[chat_id]["estado"] = "esperando_contrasena"
+    bus_eventos.emitir("sesion_fallida", vendedor_id=USUARIO[chat_id]["vendedor_id"], chat_id=chat_id)
+    return False
+
+def restaurar_sesion(chat_id):
+    """Si el chat tiene una sesión abierta, lo deja logeado y devuelve True."""
+    sesion = verificar_sesion_activa(chat_id)
+    if not sesion:
+        return False
+    vendedor_id_sesion, nombre_vendedor = sesion
+    USUARIO[chat_id] = {"estado": "logeado", "vendedor_id": vendedor_id_sesion, "nombre": nombre_vendedor}
+    return True
+
+# --- Handlers ---
+@bot.message_handler(commands=['start'])
+def cmd_start(message):
+    chat_id = message.chat.id
+    if restaurar_sesion(chat_id):
+        mostrar_menu_principal(message)
+        return
+
+    mensaje_bienvenida, markup = vista_inicio()
     MENSAJES[chat_id] = bot.send_message(chat_id, mensaje_bienvenida, reply_markup=markup).message_id
 
 @bot.callback_query_handler(func=lambda call: call.data == 'inicio_sesion')
@@ -398,43 +694,49 @@ def inicio_sesion(call):
     #markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_inicio'))
     bot.edit_message_text("Por favor, ingresa tu usuario 👤:", chat_id, MENSAJES.get(chat_id), reply_markup = markup)
 
+def avisar_bloqueo(chat_id):
+    """Anota un intento fallido; si con él empieza un bloqueo, avisa y devuelve True."""
+    aviso = registrar_bloqueo(chat_id)
+    if aviso is None:
+        return False
+    bot.send_message(chat_id, aviso)
+    return True
+
 @bot.message_handler(func=lambda message: USUARIO.get(message.chat.id, {}).get("estado") == "esperando_usuario")
 def recibir_usuario(message):
     chat_id = message.chat.id
     usuario = message.text
     vendedor = get_vendedor(usuario)
     if vendedor:
-        USUARIO[chat_id]["vendedor_id"] = vendedor[0]
-        USUARIO[chat_id]["nombre"] = vendedor[1]
-        USUARIO[chat_id]["contrasena"] = vendedor[2]
-        USUARIO[chat_id]["estado"] = "esperando_contrasena"
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_inicio'))
-        msg = bot.send_message(chat_id, "Usuario correcto ✅. ¡Ingresa tu contraseña para acceder! 🔒:", reply_markup = markup)
+        aceptar_usuario(chat_id, usuario, vendedor)
+        msg = bot.send_message(chat_id, "Usuario correcto ✅. ¡Ingresa tu contraseña para acceder! 🔒:", reply_markup = teclado_volver('volver_inicio'))
         MENSAJES[chat_id] = msg.message_id
     else:
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_inicio'))
-        msg = bot.send_message(chat_id, "Usuario incorrecto ❌. Intenta de nuevo o contacta al administrador.", reply_markup = markup)
-        MENSAJES[chat_id] = msg.message_id
+        bus_eventos.emitir("usuario_desconocido", chat_id=chat_id)
+        if not avisar_bloqueo(chat_id):
+            msg = bot.send_message(chat_id, "Usuario incorrecto ❌. Intenta de nuevo o contacta al administrador.", reply_markup = teclado_volver('volver_inicio'))
+            MENSAJES[chat_id] = msg.message_id
     bot.delete_message(chat_id=message.chat.id, message_id=message.message_id) #Delete the message sent by the user
 
 @bot.message_handler(func=lambda message: USUARIO.get(message.chat.id, {}).get("estado") == "esperando_contrasena")
 def recibir_contrasena(message):
     chat_id = message.chat.id
-    contrasena = message.text
-    if USUARIO[chat_id]["contrasena"] == contrasena:
-        vendedor_id = USUARIO[chat_id]["vendedor_id"]
-        crear_sesion(chat_id, vendedor_id)
-        del USUARIO[chat_id]["contrasena"]
-        USUARIO[chat_id]["estado"] = "logeado"
+    # El hash se verifica en el pool de credenciales; este hilo queda libre para las ventas
+    USUARIO[chat_id]["estado"] = "verificando"
+    if not verificador_credenciales.enviar(USUARIO[chat_id]["usuario"], message.text,
+                                           lambda correcta: terminar_login(message, correcta)):
+        USUARIO[chat_id]["estado"] = "esperando_contrasena"
+        bot.send_message(chat_id, "Hay muchos inicios de sesión en curso ⏳. Intenta de nuevo en unos segundos.")
+    bot.delete_message(chat_id=message.chat.id, message_id=message.message_id) #Delete the message sent by the user
+
+def terminar_login(message, correcta):
+    chat_id = message.chat.id
+    resultado = aplicar_login(chat_id, correcta)
+    if resultado:
         mostrar_menu_principal(message)
-    else:
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_inicio'))
-        msg = bot.send_message(chat_id, "Contraseña incorrecta ❌. Intenta de nuevo.", reply_markup = markup)
+    elif resultado is False and not avisar_bloqueo(chat_id):
+        msg = bot.send_message(chat_id, "Contraseña incorrecta ❌. Intenta de nuevo.", reply_markup = teclado_volver('volver_inicio'))
         MENSAJES[chat_id] = msg.message_id
-    bot.delete_message(chat_id=message.chat.id, message_id=message.message_id) #Delete the message sent by the user
 
 @bot.callback_query_handler(func=lambda call: call.data == 'volver_inicio')
 def volver_inicio(call):
@@ -444,27 +746,12 @@ def volver_inicio(call):
 
 def mostrar_menu_principal(message):
     chat_id = message.chat.id
-    vendedor_id = USUARIO[chat_id]["vendedor_id"]
-    nombre_vendedor = USUARIO[chat_id]["nombre"]
-
-    mensaje_bienvenida = MENSAJES_BIENVENIDA.get(vendedor_id, f"""
-    ¡Hola {nombre_vendedor}! 👋
-
-    ¡Listo para superar tus objetivos de hoy? 💪
-    """)
-
-    markup = types.InlineKeyboardMarkup()
-    boton_venta = types.InlineKeyboardButton("Registrar Venta 💰", callback_data='venta')
-    boton_historial = types.InlineKeyboardButton("Ver Historial Diario 📊", callback_data='historial')
-    boton_cerrar_sesion = types.InlineKeyboardButton("Cerrar Sesión 🚪", callback_data='cerrar_sesion') # Nuevo botón
-    markup.add(boton_venta, boton_historial)
-    markup.add(boton_cerrar_sesion) # Añade el botón de cerrar sesión al menú
-
+    texto, markup = vista_menu_principal(chat_id)
     try:
-        bot.edit_message_text(mensaje_bienvenida + "\nSelecciona una opción para continuar:", chat_id, MENSAJES.get(chat_id), reply_markup=markup)
+        bot.edit_message_text(texto, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
     except telebot.apihelper.ApiTelegramException as e:
         logging.error(f"Error al editar mensaje: {e}")
-        bot.send_message(chat_id, mensaje_bienvenida + "\nSelecciona una opción para continuar:", reply_markup=markup)
+        bot.send_message(chat_id, texto, reply_markup=markup)
 
 
 @bot.callback_query_handler(func=lambda call: call.data == 'cerrar_sesion')
@@ -478,18 +765,8 @@ def cerrar_sesion_handler(call):
 def iniciar_venta(call):
     chat_id = call.message.chat.id
     VENTA[chat_id] = {"estado": "esperando_producto"}
-    markup = types.InlineKeyboardMarkup()
-    productos = get_productos()
-    if productos:
-        for producto_id, nombre_producto in productos:
-            boton_producto = types.InlineKeyboardButton(nombre_producto, callback_data=f'producto_{producto_id}')
-            markup.add(boton_producto)
-        boton_volver = types.InlineKeyboardButton("Volver al menú principal", callback_data='volver_menu')
-        boton_cancelar = types.InlineKeyboardButton("Cancelar 🚫", callback_data='cancelar_venta')
-        markup.add(boton_cancelar, boton_volver)
-        bot.edit_message_text("¿Qué producto vendiste? 📦\n¡Elige el producto para registrar tu venta! 🚀", chat_id, MENSAJES.get(chat_id), reply_markup=markup)
-    else:
-        bot.edit_message_text("No hay productos disponibles. Contacta al administrador.", chat_id, MENSAJES.get(chat_id))
+    texto, markup = vista_productos(get_productos())
+    bot.edit_message_text(texto, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('producto_') and VENTA.get(call.message.chat.id, {}).get("estado") == "esperando_producto")
 def seleccionar_producto(call):
@@ -500,9 +777,7 @@ def seleccionar_producto(call):
     producto = get_producto(producto_id)
     nombre_producto = producto[2]
 
-    markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_productos'))
-    msg = bot.send_message(chat_id, f"¡Excelente! Has seleccionado {nombre_producto} ✅ ¿Cuántas unidades vendiste? 🔢\n¡Ingresa la cantidad para registrar tus ganancias! 💰", reply_markup = markup)
+    msg = bot.send_message(chat_id, f"¡Excelente! Has seleccionado {nombre_producto} ✅ ¿Cuántas unidades vendiste? 🔢\n¡Ingresa la cantidad para registrar tus ganancias! 💰", reply_markup = teclado_volver())
     MENSAJES[chat_id] = msg.message_id
 
 @bot.callback_query_handler(func=lambda call: call.data == 'cancelar_venta' and VENTA.get(call.message.chat.id, {}).get("estado") == "esperando_producto")
@@ -523,15 +798,9 @@ def volver_menu(call):
 @bot.message_handler(func=lambda message: VENTA.get(message.chat.id, {}).get("estado") == "esperando_cantidad")
 def registrar_cantidad(message):
     chat_id = message.chat.id
-    cantidad = message.text
-    try:
-        cantidad = int(cantidad)
-        if cantidad <= 0:
-            raise ValueError
-    except ValueError:
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_productos'))
-        msg = bot.send_message(chat_id, "Cantidad inválida ❌. Debe ser un número entero positivo.", reply_markup = markup)
+    cantidad = leer_cantidad(message.text)
+    if cantidad is None:
+        msg = bot.send_message(chat_id, "Cantidad inválida ❌. Debe ser un número entero positivo.", reply_markup = teclado_volver())
         MENSAJES[chat_id] = msg.message_id
         bot.delete_message(chat_id=message.chat.id, message_id=message.message_id) #Delete the message sent by the user
         return
@@ -541,58 +810,441 @@ def registrar_cantidad(message):
     inventario_actual = get_inventario(vendedor_id, producto_id)
 
     if inventario_actual < cantidad:
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_productos'))
-        msg = bot.send_message(chat_id, f"No hay suficiente inventario 😞. Tienes {inventario_actual} unidades disponibles.", reply_markup = markup)
+        msg = bot.send_message(chat_id, f"No hay suficiente inventario 😞. Tienes {inventario_actual} unidades disponibles.", reply_markup = teclado_volver())
         MENSAJES[chat_id] = msg.message_id
         bot.delete_message(chat_id=message.chat.id, message_id=message.message_id) #Delete the message sent by the user
         return
 
-    producto = get_producto(producto_id)
-    nombre_producto = producto[2]
-
     if registrar_venta(vendedor_id, producto_id, cantidad):
         del VENTA[chat_id]
         mostrar_menu_principal(message)
         #bot.edit_message_text(f"¡Venta de {cantidad} unidades de {nombre_producto} registrada con éxito! ✅ ¡Sigue así y alcanzarás tus metas! 🚀", chat_id, MENSAJES.get(chat_id))
     else:
-        markup = types.InlineKeyboardMarkup()
-        markup.add(types.InlineKeyboardButton("Volver", callback_data='volver_productos'))
-        msg = bot.send_message(chat_id, "Error al registrar la venta ❌. Contacta al administrador.", reply_markup = markup)
+        msg = bot.send_message(chat_id, "Error al registrar la venta ❌. Contacta al administrador.", reply_markup = teclado_volver())
         MENSAJES[chat_id] = msg.message_id
     bot.delete_message(chat_id=message.chat.id, message_id=message.message_id) #Delete the message sent by the user
 
 @bot.callback_query_handler(func=lambda call: call.data == 'historial' and USUARIO.get(call.message.chat.id, {}).get("estado") == "logeado")
 def mostrar_historial_diario(call):
     chat_id = call.message.chat.id
-    vendedor_id = USUARIO[chat_id]["vendedor_id"]
-    ventas_diarias = obtener_ventas_diarias(vendedor_id)
+    mensaje, markup = vista_historial(USUARIO[chat_id]["vendedor_id"])
+    bot.edit_message_text(mensaje, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith('hist_') and USUARIO.get(call.message.chat.id, {}).get("estado") == "logeado")
+def navegar_historial(call):
+    chat_id = call.message.chat.id
+    pagina = historial.leer_callback(call.data)
+    if pagina is None:
+        return
+    mensaje, markup = vista_historial(USUARIO[chat_id]["vendedor_id"], *pagina)
+    try:
+        bot.edit_message_text(mensaje, chat_id, call.message.message_id, reply_markup=markup)
+    except telebot.apihelper.ApiTelegramException as e:
+        # "message is not modified" al tocar el rango que ya se está mostrando
+        logging.info(f"No se editó el historial: {e}")
+
+@bot.message_handler(commands=['historial'], func=lambda message: USUARIO.get(message.chat.id, {}).get("estado") == "logeado")
+def cmd_historial(message):
+    chat_id = message.chat.id
+    rango = historial.leer_rango(message.text.split()[1:])
+    if rango is None:
+        bot.send_message(chat_id, "Formato: /historial 2024-12-31 o /historial 2024-12-01 2024-12-31")
+        return
+    mensaje, markup = vista_historial(USUARIO[chat_id]["vendedor_id"], *rango)
+    msg = bot.send_message(chat_id, mensaje, reply_markup=markup)
+    MENSAJES[chat_id] = msg.message_id
+    bot.delete_message(chat_id=chat_id, message_id=message.message_id)
 
-    mensaje = "🎉 ¡Aquí está tu resumen de ventas diarias! 📊\n"
-    total_ganancias = 0
-    total_comisiones = 0
+@bot.message_handler(commands=['top'])
+def cmd_top(message):
+    chat_id = message.chat.id
+    usuario_id = message.from_user.id
+
+    mensaje = "🏆 ¡Los mayores ganadores! 🏆\n"
+    secciones = [("dinero_ganado", "💰 Dinero ganado"), ("mayor_ganancia", "🚀 Mayor ganancia")]
+    for columna, titulo in secciones:
+        mensaje += f"\n{titulo}:\n"
+        top = ranking.obtener_top(columna)
+        if not top:
+            mensaje += "Todavía no hay ganadores.\n"
+        for posicion, (nombre, valor) in enumerate(top, start=1):
+            mensaje += f"{posicion}. {nombre} - ${valor:.2f}\n"
+        propia = ranking.obtener_posicion(columna, usuario_id)
+        if propia:
+            mensaje += f"Tu posición: #{propia[0]} (${propia[1]:.2f})\n"
+
+    bot.send_message(chat_id, mensaje)
+
+@bot.message_handler(commands=['tablero'])
+def cmd_tablero(message):
+    chat_id = message.chat.id
+    partes = message.text.split()
+    if len(partes) > 1 and partes[1].isdigit():
+        sorteo_id = int(partes[1])
+    else:
+        sorteo_id = almacen.ultimo_sorteo()
+
+    if sorteo_id is None or tablero.enviar_tablero(bot, chat_id, sorteo_id, caption="🟩 Libre  🟥 Ocupado") is None:
+        bot.send_message(chat_id, "No hay ningún sorteo con ese número 😞")
+
+# --- Cola de Aprobación (admin) ---
+def es_admin(chat_id):
+    return str(chat_id) == str(ADMIN_CHAT_ID)
+
+def teclado_aprobacion(cola):
+    markup = types.InlineKeyboardMarkup(row_width=5)
+    botones = []
+    for reserva in cola["pagina"]:
+        marca = "☑" if reserva[0] in cola["seleccion"] else "☐"
+        alerta = "⚠️" if reserva[6] is not None else ""
+        botones.append(types.InlineKeyboardButton(f"{marca} #{reserva[0]}{alerta}", callback_data=f'apr_sel_{reserva[0]}'))
+    markup.add(*botones)
+    markup.row(types.InlineKeyboardButton("Seleccionar todas", callback_data='apr_todas'))
+    markup.row(types.InlineKeyboardButton("Aprobar ✅", callback_data='apr_ok'),
+               types.InlineKeyboardButton("Rechazar ❌", callback_data='apr_no'))
+    navegacion = []
+    if cola["anteriores"]:
+        navegacion.append(types.InlineKeyboardButton("⬅️ Anterior", callback_data='apr_ant'))
+    if cola["hay_mas"]:
+        navegacion.append(types.InlineKeyboardButton("Siguiente ➡️", callback_data='apr_sig'))
+    if navegacion:
+        markup.row(*navegacion)
+    return markup
+
+def enviar_miniaturas(chat_id, pagina):
+    fotos = []
+    for reserva_id, usuario_id, sorteo_id, numero, fecha, captura_url, duplicado_de, distancia in pagina:
+        if not captura_url:
+            continue
+        leyenda = f"Reserva #{reserva_id} - Número {numero} (sorteo {sorteo_id}) - Usuario {usuario_id}"
+        if duplicado_de is not None:
+            leyenda += f"\n⚠️ Posible captura reutilizada: se parece a la reserva #{duplicado_de} ({distancia} bits)"
+        media = open(captura_url, 'rb') if os.path.exists(captura_url) else captura_url
+        fotos.append(types.InputMediaPhoto(media, caption=leyenda))
+    if not fotos:
+        return
+    try:
+        # Telegram rechaza un álbum de una sola foto
+        if len(fotos) == 1:
+            bot.send_photo(chat_id, fotos[0].media, caption=fotos[0].caption)
+        else:
+            bot.send_media_group(chat_id, fotos)
+    except telebot.apihelper.ApiTelegramException as e:
+        logging.error(f"Error al enviar miniaturas: {e}")
+    finally:
+        for foto in fotos:
+            if hasattr(foto.media, 'close'):
+                foto.media.close()
+
+def mostrar_cola_aprobacion(chat_id, despues_de_id, enviar_fotos=True):
+    cola = COLA_APROBACION.setdefault(chat_id, {"anteriores": [], "seleccion": set()})
+    pagina = aprobaciones.obtener_pendientes(despues_de_id, aprobaciones.TAMANO_PAGINA + 1)
+    cola["cursor"] = despues_de_id
+    cola["hay_mas"] = len(pagina) > aprobaciones.TAMANO_PAGINA
+    cola["pagina"] = pagina[:aprobaciones.TAMANO_PAGINA]
+    cola["seleccion"] &= {reserva[0] for reserva in cola["pagina"]}
+
+    if not cola["pagina"] and cola["anteriores"]:
+        # La última página quedó vacía: vuelve a la anterior
+        mostrar_cola_aprobacion(chat_id, cola["anteriores"].pop(), enviar_fotos)
+        return
+    if not cola["pagina"]:
+        COLA_APROBACION.pop(chat_id, None)
+        bot.send_message(chat_id, "No hay reservas pendientes de aprobación. 🎉")
+        return
 
-    for nombre_producto, cantidad_vendida, total_venta, comision, producto_id in ventas_diarias:
-        cantidad_disponible = obtener_cantidad_disponible(vendedor_id, producto_id)
-        mensaje += f"- {nombre_producto}: {cantidad_vendida} unidades - Total: ${total_venta:.2f} - Comisión: ${comision:.2f} - Disponible: {cantidad_disponible}\n"
-        total_ganancias += total_venta
-        total_comisiones += comision
+    if enviar_fotos:
+        enviar_miniaturas(chat_id, cola["pagina"])
+    texto = (f"📋 Reservas pendientes: {aprobaciones.contar_pendientes()}\n"
+             "Marca las reservas y elige Aprobar o Rechazar. ⚠️ = posible captura reutilizada.")
+    cola["mensaje_id"] = bot.send_message(chat_id, texto, reply_markup=teclado_aprobacion(cola)).message_id
 
-    mensaje += f"\n¡Venta Total del Día: ${total_ganancias:.2f} 🎉"
-    mensaje += f"\n¡Comisión Total del Día: ${total_comisiones:.2f} 💰"
-    mensaje += "\n¡Excelente trabajo! ¡Sigue así para alcanzar tus objetivos! 🚀"
+@bot.message_handler(commands=['pendientes'], func=lambda message: es_admin(message.chat.id))
+def cmd_pendientes(message):
+    COLA_APROBACION.pop(message.chat.id, None)
+    mostrar_cola_aprobacion(message.chat.id, 0)
 
-    markup = types.InlineKeyboardMarkup()
-    markup.add(types.InlineKeyboardButton("Volver al menú principal", callback_data='volver_menu'))
-    bot.edit_message_text(mensaje, chat_id, MENSAJES.get(chat_id), reply_markup=markup)
+@bot.callback_query_handler(func=lambda call: call.data.startswith('apr_') and es_admin(call.message.chat.id) and call.message.chat.id in COLA_APROBACION)
+def manejar_cola_aprobacion(call):
+    chat_id = call.message.chat.id
+    cola = COLA_APROBACION[chat_id]
+
+    if call.data.startswith('apr_sel_'):
+        reserva_id = int(call.data.split('_')[2])
+        cola["seleccion"] ^= {reserva_id}
+    elif call.data == 'apr_todas':
+        cola["seleccion"] = {reserva[0] for reserva in cola["pagina"]}
+    elif call.data == 'apr_sig' and cola["hay_mas"]:
+        cola["anteriores"].append(cola["cursor"])
+        mostrar_cola_aprobacion(chat_id, cola["pagina"][-1][0])
+        return
+    elif call.data == 'apr_ant' and cola["anteriores"]:
+        mostrar_cola_aprobacion(chat_id, cola["anteriores"].pop())
+        return
+    elif call.data in ('apr_ok', 'apr_no'):
+        if not cola["seleccion"]:
+            bot.answer_callback_query(call.id, "No hay reservas seleccionadas.")
+            return
+        estado = "confirmada" if call.data == 'apr_ok' else "rechazada"
+        resueltas = aprobaciones.resolver_reservas(cola["seleccion"], estado)
+        if resueltas is None:
+            bot.answer_callback_query(call.id, "Error al guardar la decisión ❌")
+            return
+        for usuario_id, texto in aprobaciones.mensajes_para_usuarios(resueltas, estado):
+            enviador.encolar(usuario_id, texto)
+        cola["seleccion"] = set()
+        bot.answer_callback_query(call.id, f"{len(resueltas)} reservas {estado}s.")
+        mostrar_cola_aprobacion(chat_id, cola["cursor"])
+        return
+
+    bot.answer_callback_query(call.id)
+    try:
+        bot.edit_message_reply_markup(chat_id, cola["mensaje_id"], reply_markup=teclado_aprobacion(cola))
+    except telebot.apihelper.ApiTelegramException as e:
+        logging.error(f"Error al editar la cola de aprobación: {e}")
+
+# --- Reabastecimiento y Transferencias (admin) ---
+def buscar_vendedor_id(texto):
+    if texto.isdigit():
+        vendedor = get_vendedor_by_id(int(texto))
+    else:
+        vendedor = get_vendedor(texto)
+    return vendedor[0] if vendedor else None
+
+def leer_lineas_inventario(texto, vendedores_por_linea):
+    """Convierte las líneas '<vendedor>... <producto_id> <cantidad>' que siguen al comando en tuplas de ids."""
+    partes = texto.split(None, 1)
+    if len(partes) < 2:
+        raise ValueError("Escribe al menos una línea después del comando.")
+    productos = {producto_id for producto_id, _ in get_productos()}
+    lineas = []
+    for numero, linea in enumerate(partes[1].splitlines(), start=1):
+        campos = linea.split()
+        if not campos:
+            continue
+        if len(campos) != vendedores_por_linea + 2 or not campos[-1].isdigit() or not campos[-2].isdigit():
+            raise ValueError(f"Línea {numero} inválida: '{linea}'")
+        vendedores = [buscar_vendedor_id(campo) for campo in campos[:vendedores_por_linea]]
+        if None in vendedores:
+            raise ValueError(f"Línea {numero}: vendedor desconocido.")
+        producto_id = int(campos[-2])
+        if producto_id not in productos:
+            raise ValueError(f"Línea {numero}: el producto {producto_id} no existe.")
+        lineas.append(tuple(vendedores) + (producto_id, int(campos[-1])))
+    return lineas
+
+def aplicar_operacion_inventario(message, vendedores_por_linea, operacion, titulo, ayuda, signo=1):
+    chat_id = message.chat.id
+    try:
+        lineas = leer_lineas_inventario(message.text, vendedores_por_linea)
+    except ValueError as e:
+        bot.send_message(chat_id, f"❌ {e}\n\n{ayuda}")
+        return
+    exito, motivo = operacion(lineas, nota=f"Telegram ({chat_id})")
+    if not exito:
+        bot.send_message(chat_id, f"❌ No se aplicó ningún cambio: {motivo}")
+        return
+    nombres_vendedores = dict(almacen.listar_vendedores())
+    nombres_productos = dict(get_productos())
+    enviador.encolar(ADMIN_CHAT_ID, movimientos.resumen_movimientos(titulo, lineas, nombres_vendedores, nombres_productos, signo))
+
+    # Evalúa las filas tocadas: el destino puede re-armarse y el origen de una transferencia bajar del umbral
+    for *vendedores_ids, producto_id, _ in lineas:
+        for vendedor_id in vendedores_ids:
+            alertas_stock.evaluar(vendedor_id, producto_id, get_inventario(vendedor_id, producto_id),
+                                  nombres_vendedores.get(vendedor_id), nombres_productos.get(producto_id))
+
+@bot.message_handler(commands=['umbral'], func=lambda message: es_admin(message.chat.id))
+def cmd_umbral(message):
+    chat_id = message.chat.id
+    ayuda = "Formato: /umbral vendedor producto_id minimo\n/umbral Pauly 1 10"
+    try:
+        lineas = leer_lineas_inventario(message.text, 1)
+    except ValueError as e:
+        bot.send_message(chat_id, f"❌ {e}\n\n{ayuda}")
+        return
+    for vendedor_id, producto_id, minimo in lineas:
+        alertas_stock.fijar_umbral(vendedor_id, producto_id, minimo)
+    bot.send_message(chat_id, f"✅ {len(lineas)} umbrales de reposición actualizados.")
+
+@bot.message_handler(commands=['reabastecer'], func=lambda message: es_admin(message.chat.id))
+def cmd_reabastecer(message):
+    aplicar_operacion_inventario(message, 1, movimientos.reabastecer, "📦 Reabastecimiento aplicado:",
+                                 "Formato: una línea por entrega\n/reabastecer\nPauly 1 20\nEnrique 3 10")
+
+@bot.message_handler(commands=['transferir'], func=lambda message: es_admin(message.chat.id))
+def cmd_transferir(message):
+    aplicar_operacion_inventario(message, 2, movimientos.transferir_lote, "🔁 Transferencia aplicada:",
+                                 "Formato: origen destino producto_id cantidad\n/transferir\nPauly Quiosco 1 5")
+
+@bot.message_handler(commands=['devolucion'], func=lambda message: es_admin(message.chat.id))
+def cmd_devolucion(message):
+    aplicar_operacion_inventario(message, 1, movimientos.devolver, "↩️ Devolución al depósito aplicada:",
+                                 "Formato: una línea por devolución\n/devolucion\nPauly 1 5", signo=-1)
+
+# --- Reglas de Comisión (admin) ---
+def describir_regla(regla):
+    regla_id, vendedor_id, producto_id, cantidad_minima, porcentaje, desde, hasta = regla
+    vendedor_info = get_vendedor_by_id(vendedor_id) if vendedor_id else None
+    vendedor = vendedor_info[1] if vendedor_info else "todos"
+    producto = f"producto {producto_id}" if producto_id else "todos los productos"
+    texto = f"#{regla_id}: {porcentaje * 100:g}% · {vendedor} · {producto}"
+    if cantidad_minima > 1:
+        texto += f" · desde {cantidad_minima} u."
+    if desde or hasta:
+        texto += f" · {desde or '…'} a {hasta or '…'}"
+    return texto
+
+@bot.message_handler(commands=['comision'], func=lambda message: es_admin(message.chat.id))
+def cmd_comision(message):
+    chat_id = message.chat.id
+    ayuda = ("Formato: /comision vendedor|* producto_id|* porcentaje [cantidad_minima] [desde] [hasta]\n"
+             "/comision Pauly * 25\n/comision * 3 30 10 2024-12-01 2024-12-31\n"
+             "Sin argumentos lista las reglas; /comision borrar <id> elimina una.")
+    campos = message.text.split()[1:]
+    if not campos:
+        reglas = comisiones.listar_reglas()
+        texto = "\n".join(describir_regla(regla) for regla in reglas) or "No hay reglas; se aplica el 20% a todo."
+        bot.send_message(chat_id, f"📐 Reglas de comisión:\n{texto}")
+        return
+    if campos[0] == "borrar" and len(campos) == 2 and campos[1].isdigit():
+        comisiones.eliminar_regla(int(campos[1]))
+        bot.send_message(chat_id, f"🗑️ Regla #{campos[1]} eliminada.")
+        return
+    try:
+        if not 3 <= len(campos) <= 6:
+            raise ValueError("Cantidad de campos incorrecta.")
+        vendedor_id = None if campos[0] == "*" else buscar_vendedor_id(campos[0])
+        if campos[0] != "*" and vendedor_id is None:
+            raise ValueError("Vendedor desconocido.")
+        producto_id = None if campos[1] == "*" else int(campos[1])
+        porcentaje = float(campos[2]) / 100
+        # float() acepta 'nan' e 'inf'; la comparación encadenada los deja afuera
+        if not 0 <= porcentaje <= 1:
+            raise ValueError("El porcentaje tiene que estar entre 0 y 100.")
+        cantidad_minima = int(campos[3]) if len(campos) > 3 else 1
+        desde = datetime.strptime(campos[4], "%Y-%m-%d").strftime("%Y-%m-%d") if len(campos) > 4 else None
+        hasta = datetime.strptime(campos[5], "%Y-%m-%d").strftime("%Y-%m-%d") if len(campos) > 5 else None
+    except ValueError as e:
+        bot.send_message(chat_id, f"❌ {e}\n\n{ayuda}")
+        return
+    regla_id = comisiones.agregar_regla(porcentaje, vendedor_id, producto_id, cantidad_minima, desde, hasta)
+    if regla_id is None:
+        bot.send_message(chat_id, "❌ No se pudo guardar la regla.")
+        return
+    bot.send_message(chat_id, f"✅ Regla #{regla_id} guardada. Usa /recalcular desde hasta para aplicarla a ventas pasadas.")
+
+@bot.message_handler(commands=['recalcular'], func=lambda message: es_admin(message.chat.id))
+def cmd_recalcular(message):
+    chat_id = message.chat.id
+    campos = message.text.split()[1:]
+    try:
+        desde, hasta = (datetime.strptime(campo, "%Y-%m-%d").date() for campo in campos)
+    except ValueError:
+        bot.send_message(chat_id, "Formato: /recalcular 2024-12-01 2024-12-31")
+        return
+    actualizadas = comisiones.recalcular_comisiones(desde, hasta)
+    if actualizadas is None:
+        bot.send_message(chat_id, "❌ No se pudieron recalcular las comisiones.")
+        return
+    bot.send_message(chat_id, f"✅ Comisiones recalculadas: {actualizadas} ventas del {desde} al {hasta}.")
+
+# --- Sorteos (admin) ---
+@bot.message_handler(commands=['sortear'], func=lambda message: es_admin(message.chat.id))
+def cmd_sortear(message):
+    chat_id = message.chat.id
+    campos = message.text.split()[1:]
+    try:
+        if len(campos) < 2:
+            raise ValueError
+        sorteo_id = int(campos[0])
+        premios = [float(campo) for campo in campos[1:]]
+        if not all(0 < premio < float("inf") for premio in premios):
+            raise ValueError
+    except ValueError:
+        bot.send_message(chat_id, "Formato: /sortear sorteo_id premio [premio ...]\n/sortear 3 100 50 20")
+        return
+    resultado = sorteos.realizar_sorteo(sorteo_id, premios)
+    if resultado is None:
+        bot.send_message(chat_id, f"❌ No se pudo realizar el sorteo {sorteo_id} (¿no existe o ya se realizó?).")
+        return
+    semilla, ganadores = resultado
+    mensaje = f"🎉 Sorteo {sorteo_id} realizado:\n"
+    for posicion, reserva_id, usuario_id, numero, premio in ganadores:
+        mensaje += f"{posicion}. Número {numero} - Usuario {usuario_id} - ${premio:.2f}\n"
+    if not ganadores:
+        mensaje += "No hubo números confirmados.\n"
+    mensaje += f"\nSemilla: {semilla}"
+    bot.send_message(chat_id, mensaje)
+
+# --- Cierre Diario (admin) ---
+@bot.message_handler(commands=['cierre'], func=lambda message: es_admin(message.chat.id))
+def cmd_cierre(message):
+    campos = message.text.split()[1:]
+    try:
+        fecha = datetime.strptime(campos[0], "%Y-%m-%d").date() if campos else None
+    except ValueError:
+        bot.send_message(message.chat.id, "Formato: /cierre 2024-12-31")
+        return
+    if fecha and fecha > cierre.ultimo_dia_terminado():
+        bot.send_message(message.chat.id, f"El cierre del {fecha:%d/%m/%Y} se arma cuando termina el día "
+                                          f"(a las {cierre.HORA_CIERRE} UTC del día siguiente).")
+        return
+    encolados = cierre.cerrar_dia(enviador, ADMIN_CHAT_ID, fecha)
+    if encolados is None:
+        bot.send_message(message.chat.id, "❌ No se pudo armar el cierre.")
+        return
+    bot.send_message(message.chat.id, f"🌙 Cierre en camino: {encolados} resúmenes encolados.")
+
+# --- Métricas (admin) ---
+def metricas():
+    """Contadores del bot en un dict (los usa /metricas y el runner de varios negocios)."""
+    return {
+        "login": verificador_credenciales.resumen(),
+        "descartados": dict(bot_limites.descartados),
+        "ventas": coordinador_ventas.ventas,
+        "commits": coordinador_ventas.lotes,
+        "enviados": enviador.enviados,
+        "fallidos": enviador.fallidos,
+        "en_cola": enviador.pendientes(),
+    }
+
+@bot.message_handler(commands=['metricas'], func=lambda message: es_admin(message.chat.id))
+def cmd_metricas(message):
+    datos = metricas()
+    login = datos["login"]
+    limitador = datos["descartados"]
+    texto = ("📈 Métricas\n"
+             f"Logins: {login.get('correctas', 0)} correctos, {login.get('incorrectas', 0)} incorrectos, "
+             f"{login.get('rechazadas', 0)} rechazados por saturación, {login.get('pendientes', 0)} en curso, "
+             f"{login.get('rehash', 0)} contraseñas migradas\n"
+             f"Hash: mediana {login.get('ms_mediana', 0):.0f} ms, p95 {login.get('ms_p95', 0):.0f} ms, "
+             f"máx. {login.get('ms_maximo', 0):.0f} ms\n"
+             f"Updates descartados: {sum(limitador.values())} {limitador}\n"
+             f"Ventas: {datos['ventas']} en {datos['commits']} commits\n"
+             f"Notificaciones: {datos['enviados']} enviadas, {datos['fallidos']} fallidas, {datos['en_cola']} en cola")
+    bot.send_message(message.chat.id, texto)
+
+# --- Arranque y Parada ---
+def iniciar_servicios():
+    """Base de datos, caché de sesiones y tareas de fondo; lo comparten las dos entradas del bot."""
+    # Crea la base de datos y los datos iniciales (¡SOLO PARA PRUEBAS!) si faltan
+    inicializar_base_de_datos()
+    cache_sesiones.cargar()
+    movimientos.iniciar_instantaneas_periodicas()
+    archivo.iniciar_archivado_periodico()
+    respaldos.iniciar_respaldos_periodicos(
+        al_terminar=lambda resultados: LOG_GROUP_ID and enviador.encolar(LOG_GROUP_ID, respaldos.resumen_respaldos(resultados)))
+    cierre.iniciar_cierre_diario(enviador, ADMIN_CHAT_ID)
+
+def detener_servicios():
+    bus_eventos.vaciar()
+    enviador.esperar_vacia(10)
+    logging.info("Bot detenido.")
 
 # --- Main ---
 if __name__ == '__main__':
-    # Crea la base de datos si no existe
-    create_database()
-
-    # Inserta datos iniciales (¡SOLO PARA PRUEBAS!)
-    insertar_datos_iniciales()
+    iniciar_servicios()
 
     try:
         logging.info("Bot is running...")
@@ -600,4 +1252,4 @@ if __name__ == '__main__':
     except Exception as e:
         logging.exception(f"Error inesperado: {e}")
     finally:
-        logging.info("Bot detenido.")
+        detener_servicios()
@@ -0,0 +1,324 @@
+import logging
+import sqlite3
+import threading
+
+import database
+
+TIPOS = ("entrega", "venta", "devolucion", "transferencia", "ajuste")
+HORAS_ENTRE_INSTANTANEAS = 24
+
+class StockInsuficiente(Exception):
+    """Un movimiento dejaría el inventario de un vendedor en negativo."""
+
+
+# --- Escritura ---
+def aplicar_movimiento(cursor, vendedor_id, producto_id, tipo, cantidad, nota=None):
+    """
+    Anota un movimiento y actualiza la fila de inventario dentro de la transacción del cursor.
+
+    `cantidad` es positiva si el stock entra al vendedor y negativa si sale. Lanza
+    StockInsuficiente si el vendedor no tiene unidades suficientes.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de movimiento inválido: {tipo}")
+    # La fila nueva entra con 0 unidades (el trigger de inventario no anota nada) y se ajusta abajo
+    cursor.execute("""
+        INSERT INTO inventario (vendedor_id, producto_id, cantidad_entregada) VALUES (?, ?, 0)
+        ON CONFLICT (vendedor_id, producto_id) DO NOTHING
+    """, (vendedor_id, producto_id))
+    cursor.execute("""
+        UPDATE inventario SET cantidad_entregada = cantidad_entregada + ?
+        WHERE vendedor_id = ? AND producto_id = ? AND cantidad_entregada + ? >= 0
+    """, (cantidad, vendedor_id, producto_id, cantidad))
+    if cursor.rowcount == 0:
+        raise StockInsuficiente(f"El vendedor {vendedor_id} no tiene {-cantidad} unidades del producto {producto_id}.")
+    cursor.execute("INSERT INTO movimientos_inventario (vendedor_id, producto_id, tipo, cantidad, nota) VALUES (?, ?, ?, ?, ?)",
+                   (vendedor_id, producto_id, tipo, cantidad, nota))
+
+def registrar_movimiento(vendedor_id, producto_id, tipo, cantidad, nota=None):
+    """Aplica un único movimiento en su propia transacción. Devuelve True si se guardó."""
+    conn = database.crear_conexion()
+    if conn is None:
+        return False
+    try:
+        aplicar_movimiento(conn.cursor(), vendedor_id, producto_id, tipo, cantidad, nota)
+        conn.commit()
+        return True
+    except (sqlite3.Error, StockInsuficiente) as e:
+        logging.error(f"Error al registrar movimiento de inventario: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+def transferir(origen_id, destino_id, producto_id, cantidad, nota=None):
+    """Pasa unidades de un vendedor a otro de forma atómica."""
+    exito, motivo = transferir_lote([(origen_id, destino_id, producto_id, cantidad)], nota)
+    if not exito:
+        logging.error(f"Error al transferir inventario: {motivo}")
+    return exito
+
+def reabastecer(lineas, nota=None):
+    """
+    Entrega stock a varios vendedores en una sola transacción.
+
+    `lineas` es [(vendedor_id, producto_id, cantidad)] con cantidades positivas.
+    Devuelve (True, None) o (False, motivo); si algo falla no se aplica ninguna línea.
+    """
+    if not lineas:
+        return False, "No hay líneas para reabastecer."
+    if any(cantidad <= 0 for _, _, cantidad in lineas):
+        return False, "Las cantidades deben ser enteros positivos."
+    conn = database.crear_conexion()
+    if conn is None:
+        return False, "No se pudo conectar a la base de datos."
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany("""
+            INSERT INTO inventario (vendedor_id, producto_id, cantidad_entregada) VALUES (?, ?, 0)
+            ON CONFLICT (vendedor_id, producto_id) DO NOTHING
+        """, [(v, p) for v, p, _ in lineas])
+        cursor.executemany("""
+            UPDATE inventario SET cantidad_entregada = cantidad_entregada + ?
+            WHERE vendedor_id = ? AND producto_id = ?
+        """, [(c, v, p) for v, p, c in lineas])
+        cursor.executemany("""
+            INSERT INTO movimientos_inventario (vendedor_id, producto_id, tipo, cantidad, nota)
+            VALUES (?, ?, 'entrega', ?, ?)
+        """, [(v, p, c, nota) for v, p, c in lineas])
+        conn.commit()
+        logging.info(f"Reabastecimiento aplicado: {len(lineas)} líneas.")
+        return True, None
+    except sqlite3.Error as e:
+        logging.error(f"Error al reabastecer: {e}")
+        conn.rollback()
+        return False, "Error de base de datos al reabastecer."
+    finally:
+        conn.close()
+
+def transferir_lote(lineas, nota=None):
+    """
+    Mueve stock entre vendedores en una sola transacción.
+
+    `lineas` es [(origen_id, destino_id, producto_id, cantidad)]. Devuelve (True, None) o
+    (False, motivo); si un origen no tiene stock suficiente no se aplica ninguna línea.
+    """
+    if not lineas:
+        return False, "No hay líneas para transferir."
+    if any(cantidad <= 0 or origen == destino for origen, destino, _, cantidad in lineas):
+        return False, "Las cantidades deben ser positivas y el origen distinto del destino."
+    conn = database.crear_conexion()
+    if conn is None:
+        return False, "No se pudo conectar a la base de datos."
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for origen_id, destino_id, producto_id, cantidad in lineas:
+            aplicar_movimiento(cursor, origen_id, producto_id, "transferencia", -cantidad, nota)
+            aplicar_movimiento(cursor, destino_id, producto_id, "transferencia", cantidad, nota)
+        conn.commit()
+        logging.info(f"Transferencia aplicada: {len(lineas)} líneas.")
+        return True, None
+    except StockInsuficiente as e:
+        conn.rollback()
+        return False, str(e)
+    except sqlite3.Error as e:
+        logging.error(f"Error al transferir inventario: {e}")
+        conn.rollback()
+        return False, "Error de base de datos al transferir."
+    finally:
+        conn.close()
+
+def devolver(lineas, nota=None):
+    """
+    Registra lo que los vendedores devuelven al depósito en una sola transacción.
+
+    `lineas` es [(vendedor_id, producto_id, cantidad)] con cantidades positivas. Devuelve
+    (True, None) o (False, motivo); si un vendedor no tiene esas unidades no se aplica ninguna línea.
+    """
+    if not lineas:
+        return False, "No hay líneas para devolver."
+    if any(cantidad <= 0 for _, _, cantidad in lineas):
+        return False, "Las cantidades deben ser enteros positivos."
+    conn = database.crear_conexion()
+    if conn is None:
+        return False, "No se pudo conectar a la base de datos."
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for vendedor_id, producto_id, cantidad in lineas:
+            aplicar_movimiento(cursor, vendedor_id, producto_id, "devolucion", -cantidad, nota)
+        conn.commit()
+        logging.info(f"Devolución aplicada: {len(lineas)} líneas.")
+        return True, None
+    except StockInsuficiente as e:
+        conn.rollback()
+        return False, str(e)
+    except sqlite3.Error as e:
+        logging.error(f"Error al registrar la devolución: {e}")
+        conn.rollback()
+        return False, "Error de base de datos al devolver."
+    finally:
+        conn.close()
+
+def resumen_movimientos(titulo, lineas, nombres_vendedores, nombres_productos, signo=1):
+    """
+    Arma el mensaje único que resume un reabastecimiento, una devolución (`signo` -1) o una
+    transferencia.
+    """
+    mensaje = f"{titulo}\n"
+    for linea in lineas:
+        if len(linea) == 3:
+            vendedor_id, producto_id, cantidad = linea
+            mensaje += (f"- {nombres_vendedores.get(vendedor_id, vendedor_id)}: {signo * cantidad:+} "
+                        f"{nombres_productos.get(producto_id, producto_id)}\n")
+        else:
+            origen_id, destino_id, producto_id, cantidad = linea
+            mensaje += (f"- {nombres_vendedores.get(origen_id, origen_id)} → {nombres_vendedores.get(destino_id, destino_id)}: "
+                        f"{cantidad} {nombres_productos.get(producto_id, producto_id)}\n")
+    unidades = sum(linea[-1] for linea in lineas)
+    mensaje += f"Total: {len(lineas)} líneas, {unidades} unidades."
+    return mensaje
+
+
+# --- Instantáneas ---
+def tomar_instantanea():
+    """
+    Guarda el stock de todos los vendedores hasta el último movimiento.
+
+    Se calcula a partir de la instantánea anterior más los movimientos posteriores, así que
+    el costo depende de lo ocurrido desde entonces y no de toda la historia.
+    """
+    conn = database.crear_conexion()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT MAX(id) FROM movimientos_inventario")
+        ultimo = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(movimiento_id), 0) FROM instantaneas_inventario")
+        anterior = cursor.fetchone()[0]
+        if ultimo is None or ultimo == anterior:
+            conn.rollback()
+            return anterior
+
+        cursor.execute("""
+            INSERT INTO instantaneas_inventario (movimiento_id, fecha)
+            SELECT id, fecha FROM movimientos_inventario WHERE id = ?
+        """, (ultimo,))
+        cursor.execute("""
+            INSERT INTO instantaneas_inventario_detalle (movimiento_id, vendedor_id, producto_id, cantidad)
+            SELECT ?, vendedor_id, producto_id, SUM(cantidad) FROM (
+                SELECT vendedor_id, producto_id, cantidad FROM instantaneas_inventario_detalle WHERE movimiento_id = ?
+                UNION ALL
+                SELECT vendedor_id, producto_id, cantidad FROM movimientos_inventario WHERE id > ? AND id <= ?
+            )
+            GROUP BY vendedor_id, producto_id
+        """, (ultimo, anterior, anterior, ultimo))
+        conn.commit()
+        logging.info(f"Instantánea de inventario tomada hasta el movimiento {ultimo}.")
+        return ultimo
+    except sqlite3.Error as e:
+        logging.error(f"Error al tomar la instantánea de inventario: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def iniciar_instantaneas_periodicas(horas=HORAS_ENTRE_INSTANTANEAS):
+    """Toma una instantánea ahora y luego cada `horas` en un hilo en segundo plano."""
+    parada = threading.Event()
+
+    def ciclo():
+        while not parada.is_set():
+            tomar_instantanea()
+            parada.wait(horas * 3600)
+
+    threading.Thread(target=ciclo, name="instantaneas-inventario", daemon=True).start()
+    return parada
+
+
+# --- Lectura ---
+_STOCK_SQL = """
+    SELECT COALESCE((SELECT cantidad FROM instantaneas_inventario_detalle
+                     WHERE movimiento_id = :instantanea AND vendedor_id = :vendedor AND producto_id = :producto), 0)
+         + COALESCE((SELECT SUM(cantidad) FROM movimientos_inventario
+                     WHERE vendedor_id = :vendedor AND producto_id = :producto AND id > :instantanea AND fecha <= :fecha), 0)
+"""
+
+def _instantanea_hasta(cursor, fecha):
+    cursor.execute("SELECT COALESCE(MAX(movimiento_id), 0) FROM instantaneas_inventario WHERE fecha <= ?", (fecha,))
+    return cursor.fetchone()[0]
+
+def leer_stock(cursor, vendedor_id, producto_id, fecha="9999-12-31 23:59:59"):
+    """
+    Stock del vendedor al final de `fecha` con la conexión del llamador: parte de la última
+    instantánea anterior a la fecha y suma solo los movimientos posteriores. Es la lectura que
+    usa el almacén para el stock en vivo (ver almacenamiento.AlmacenamientoSQLite).
+    """
+    instantanea = _instantanea_hasta(cursor, fecha)
+    cursor.execute(_STOCK_SQL, {"instantanea": instantanea, "vendedor": vendedor_id,
+                                "producto": producto_id, "fecha": fecha})
+    return cursor.fetchone()[0]
+
+def stock_en_fecha(vendedor_id, producto_id, fecha="9999-12-31 23:59:59"):
+    """
+    Stock del vendedor al final de `fecha` ('YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS', UTC).
+    Sin fecha devuelve el stock actual.
+    """
+    if len(fecha) == 10:
+        fecha += " 23:59:59"
+    conn = database.crear_conexion()
+    if conn is None:
+        return None
+    try:
+        return leer_stock(conn.cursor(), vendedor_id, producto_id, fecha)
+    except sqlite3.Error as e:
+        logging.error(f"Error al calcular el stock: {e}")
+        return None
+    finally:
+        conn.close()
+
+def stock_actual(vendedor_id, producto_id):
+    return stock_en_fecha(vendedor_id, producto_id)
+
+def inventario_en_fecha(fecha="9999-12-31 23:59:59"):
+    """Devuelve {(vendedor_id, producto_id): cantidad} de todos los vendedores al final de `fecha`."""
+    if len(fecha) == 10:
+        fecha += " 23:59:59"
+    conn = database.crear_conexion()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        instantanea = _instantanea_hasta(cursor, fecha)
+        cursor.execute("""
+            SELECT vendedor_id, producto_id, SUM(cantidad) FROM (
+                SELECT vendedor_id, producto_id, cantidad FROM instantaneas_inventario_detalle WHERE movimiento_id = ?
+                UNION ALL
+                SELECT vendedor_id, producto_id, cantidad FROM movimientos_inventario WHERE id > ? AND fecha <= ?
+            )
+            GROUP BY vendedor_id, producto_id
+        """, (instantanea, instantanea, fecha))
+        return {(vendedor_id, producto_id): cantidad for vendedor_id, producto_id, cantidad in cursor.fetchall()}
+    except sqlite3.Error as e:
+        logging.error(f"Error al calcular el inventario: {e}")
+        return None
+    finally:
+        conn.close()
+
+def conciliar():
+    """Compara la tabla inventario con el libro. Devuelve [(vendedor_id, producto_id, inventario, libro)] que no cuadran."""
+    libro = inventario_en_fecha()
+    filas = database.ejecutar_consulta("SELECT vendedor_id, producto_id, cantidad_entregada FROM inventario")
+    if libro is None or filas is None:
+        return None
+    diferencias = []
+    for vendedor_id, producto_id, cantidad in filas:
+        esperado = libro.pop((vendedor_id, producto_id), 0)
+        if cantidad != esperado:
+            diferencias.append((vendedor_id, producto_id, cantidad, esperado))
+    diferencias.extend((v, p, 0, c) for (v, p), c in libro.items() if c != 0)
+    return diferencias
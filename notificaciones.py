@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+import telebot
+
+# Límites de Telegram: unos 30 mensajes por segundo en total y 1 por segundo al mismo chat
+MENSAJES_POR_SEGUNDO = 25
+INTERVALO_POR_CHAT = 1.0
+REINTENTOS_MAXIMOS = 3
+
+class EnviadorLimitado:
+    """
+    Cola de mensajes salientes atendida por un hilo en segundo plano.
+
+    Los handlers encolan y vuelven de inmediato; el hilo respeta el ritmo global y el de cada
+    chat, y reintenta cuando Telegram responde 429 con el retry_after indicado.
+    """
+
+    def __init__(self, bot, mensajes_por_segundo=MENSAJES_POR_SEGUNDO, intervalo_por_chat=INTERVALO_POR_CHAT):
+        self.bot = bot
+        self.intervalo_global = 1.0 / mensajes_por_segundo
+        self.intervalo_por_chat = intervalo_por_chat
+        self._cola = []  # heap de (listo_en, secuencia, chat_id, texto, kwargs, intentos, avisos)
+        self._secuencia = itertools.count()
+        self._condicion = threading.Condition()
+        self._ultimo_por_chat = {}
+        self._proximo_global = 0.0
+        self._hilo = None
+        self._en_vuelo = 0
+        self.enviados = 0
+        self.fallidos = 0
+
+    def iniciar(self):
+        with self._condicion:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._trabajar, name="enviador", daemon=True)
+                self._hilo.start()
+
+    def encolar(self, chat_id, texto, al_fallar=None, al_enviar=None, **kwargs):
+        """
+        Añade un mensaje a la cola sin bloquear al llamador.
+
+        Si el mensaje se da por perdido se llama a `al_fallar(chat_id, texto)` desde el hilo del
+        enviador; si Telegram lo acepta, a `al_enviar(chat_id, texto)`.
+        """
+        self._empujar(time.monotonic(), chat_id, texto, kwargs, 0, (al_fallar, al_enviar))
+        self.iniciar()
+
+    def pendientes(self):
+        with self._condicion:
+            return len(self._cola)
+
+    def esperar_vacia(self, timeout=None):
+        """Bloquea hasta que no queden mensajes en cola (útil en tareas por lotes y al apagar)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicion:
+            while self._cola or self._en_vuelo:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._condicion.wait(restante)
+        return True
+
+    def _empujar(self, listo_en, chat_id, texto, kwargs, intentos, avisos):
+        with self._condicion:
+            heapq.heappush(self._cola, (listo_en, next(self._secuencia), chat_id, texto, kwargs, intentos, avisos))
+            self._condicion.notify_all()
+
+    def _trabajar(self):
+        while True:
+            with self._condicion:
+                while not self._cola:
+                    self._condicion.wait()
+                listo_en = self._cola[0][0]
+                ahora = time.monotonic()
+                if listo_en > ahora:
+                    self._condicion.wait(listo_en - ahora)
+                    continue
+                _, _, chat_id, texto, kwargs, intentos, avisos = heapq.heappop(self._cola)
+
+                permitido = max(self._ultimo_por_chat.get(chat_id, 0.0) + self.intervalo_por_chat,
+                                self._proximo_global)
+                if permitido > ahora:
+                    heapq.heappush(self._cola, (permitido, next(self._secuencia), chat_id, texto, kwargs, intentos, avisos))
+                    continue
+                self._ultimo_por_chat[chat_id] = ahora
+                self._proximo_global = ahora + self.intervalo_global
+                self._en_vuelo += 1
+                if len(self._ultimo_por_chat) > 10000:
+                    # Olvida los chats que ya no pueden estar limitados
+                    self._ultimo_por_chat = {c: t for c, t in self._ultimo_por_chat.items()
+                                             if t + self.intervalo_por_chat > ahora}
+
+            self._enviar(chat_id, texto, kwargs, intentos, avisos)
+            with self._condicion:
+                self._en_vuelo -= 1
+                self._condicion.notify_all()
+
+    def _enviar(self, chat_id, texto, kwargs, intentos, avisos):
+        try:
+            self.bot.send_message(chat_id, texto, **kwargs)
+            self.enviados += 1
+            self._avisar(avisos[1], chat_id, texto)
+            return
+        except telebot.apihelper.ApiTelegramException as e:
+            if e.error_code == 429 and intentos < REINTENTOS_MAXIMOS:
+                espera = (e.result_json or {}).get("parameters", {}).get("retry_after", 1)
+                logging.warning(f"Telegram pidió esperar {espera}s antes de escribir a {chat_id}.")
+                self._empujar(time.monotonic() + espera, chat_id, texto, kwargs, intentos + 1, avisos)
+                return
+            logging.error(f"Error al enviar notificación a {chat_id}: {e}")
+        except Exception as e:
+            logging.error(f"Error al enviar notificación a {chat_id}: {e}")
+        self.fallidos += 1
+        self._avisar(avisos[0], chat_id, texto)
+
+    def _avisar(self, aviso, chat_id, texto):
+        if aviso:
+            try:
+                aviso(chat_id, texto)
+            except Exception as e:
+                logging.exception(f"Error en el aviso de la notificación a {chat_id}: {e}")
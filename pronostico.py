@@ -0,0 +1,153 @@
+import logging
+import math
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import archivo
+import database
+
+VENTANA_DIAS = 28  # demanda reciente usada como base del pronóstico
+HORIZONTE_DIAS = 7  # días que debe cubrir la próxima entrega
+SEMANAS_CONFIANZA = 8  # semanas de historia a partir de las cuales la estacionalidad propia pesa más que 1.0
+FACTOR_SEGURIDAD = 1.65  # ~95% de servicio si la demanda diaria fuese normal
+
+# --- Carga ---
+def cargar_historial(conn):
+    """
+    Devuelve (pares, dias, demanda) con la historia diaria de ventas.
+
+    `pares` es un array (n, 2) de (vendedor_id, producto_id), `dias` un array de
+    datetime64[D] consecutivos hasta hoy (UTC) y `demanda` una matriz (n, len(dias)) con
+    las unidades vendidas por par y día. SQLite hace la suma por día; NumPy, el resto.
+    """
+    filas = conn.execute(f"""
+        SELECT vendedor_id, producto_id, date(fecha), SUM(cantidad_vendida)
+        FROM {archivo.fuente_ventas(conn)}
+        GROUP BY vendedor_id, producto_id, date(fecha)
+    """).fetchall()
+    hoy = np.datetime64(datetime.now(timezone.utc).date(), "D")
+    if not filas:
+        return np.empty((0, 2), dtype=np.int64), np.array([hoy]), np.zeros((0, 1))
+
+    vendedores, productos, fechas, cantidades = zip(*filas)
+    claves = np.column_stack((np.array(vendedores, dtype=np.int64), np.array(productos, dtype=np.int64)))
+    fechas = np.array(fechas, dtype="datetime64[D]")
+
+    pares, fila = np.unique(claves, axis=0, return_inverse=True)
+    inicio = fechas.min()
+    dias = np.arange(inicio, max(hoy, fechas.max()) + 1)
+    demanda = np.zeros((len(pares), len(dias)))
+    demanda[fila.ravel(), (fechas - inicio).astype(np.int64)] = cantidades
+    return pares, dias, demanda
+
+def cargar_stock(conn, pares):
+    """
+    Devuelve (todos, stock, filas) donde `todos` agrega a `pares` los pares con inventario
+    pero sin ventas, `stock` está alineado con `todos` y `filas` ubica cada par original en `todos`.
+    """
+    filas = conn.execute("SELECT vendedor_id, producto_id, cantidad_entregada FROM inventario").fetchall()
+    inventario = np.array(filas, dtype=np.int64).reshape(-1, 3)
+    todos = np.unique(np.vstack((pares, inventario[:, :2])), axis=0)
+    if not len(todos):
+        return todos, np.zeros(0), np.zeros(0, dtype=np.int64)
+
+    # Búsqueda ordenada sobre una clave combinada (vendedor, producto)
+    ancho = int(todos[:, 1].max()) + 1
+    claves = todos[:, 0] * ancho + todos[:, 1]
+    stock = np.zeros(len(todos))
+    stock[np.searchsorted(claves, inventario[:, 0] * ancho + inventario[:, 1])] = inventario[:, 2]
+    return todos, stock, np.searchsorted(claves, pares[:, 0] * ancho + pares[:, 1])
+
+
+# --- Cálculo ---
+def dia_semana(dias):
+    """Lunes = 0 ... domingo = 6 para un array de datetime64[D]."""
+    return (dias.astype(np.int64) + 3) % 7  # 1970-01-01 fue jueves
+
+def demanda_movil(demanda, ventana=VENTANA_DIAS):
+    """Media móvil de `ventana` días para cada par, columna a columna, con sumas acumuladas."""
+    acumulada = np.cumsum(np.pad(demanda, ((0, 0), (1, 0))), axis=1)
+    desde = np.maximum(np.arange(1, demanda.shape[1] + 1) - ventana, 0)
+    hasta = np.arange(1, demanda.shape[1] + 1)
+    return (acumulada[:, hasta] - acumulada[:, desde]) / (hasta - desde)
+
+def estacionalidad_semanal(demanda, dias):
+    """
+    Factor por par y día de la semana (n, 7): demanda media de ese día sobre la media general.
+
+    Con poca historia el factor se acerca a 1.0 para no sobreajustar a dos o tres semanas.
+    """
+    semana = dia_semana(dias)
+    una_caliente = np.eye(7)[semana]  # (dias, 7)
+    por_dia = (demanda @ una_caliente) / np.maximum(una_caliente.sum(axis=0), 1)
+    media = demanda.mean(axis=1, keepdims=True)
+    factor = np.divide(por_dia, media, out=np.ones_like(por_dia), where=media > 0)
+    peso = len(dias) / 7 / (len(dias) / 7 + SEMANAS_CONFIANZA)
+    return peso * factor + (1 - peso) * 1.0
+
+def calcular_sugerencias(dias, demanda, stock, ventana=VENTANA_DIAS, horizonte=HORIZONTE_DIAS):
+    """
+    Devuelve un dict de arrays alineados con las filas de `demanda`: promedio_diario,
+    demanda_prevista, dias_cobertura y sugerido (unidades a entregar para cubrir el horizonte).
+    """
+    promedio = demanda_movil(demanda, ventana)[:, -1]
+    factores = estacionalidad_semanal(demanda, dias)
+    proximos = dia_semana(dias[-1] + np.arange(1, horizonte + 1))
+    prevista = promedio * factores[:, proximos].sum(axis=1)
+
+    seguridad = FACTOR_SEGURIDAD * demanda[:, -ventana:].std(axis=1) * math.sqrt(horizonte)
+    sugerido = np.maximum(np.ceil(prevista + seguridad - stock), 0)
+    cobertura = np.divide(stock, promedio, out=np.full(len(stock), np.inf), where=promedio > 0)
+    return {
+        "promedio_diario": promedio,
+        "demanda_prevista": prevista,
+        "dias_cobertura": cobertura,
+        "sugerido": sugerido.astype(np.int64),
+    }
+
+
+# --- Resultado ---
+def guardar_sugerencias(conn, pares, resultado):
+    """Reemplaza la tabla sugerencias_reposicion en una sola transacción."""
+    calculado = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    filas = zip(pares[:, 0].tolist(), pares[:, 1].tolist(),
+                np.round(resultado["promedio_diario"], 3).tolist(),
+                np.round(resultado["demanda_prevista"], 3).tolist(),
+                [round(c, 1) if math.isfinite(c) else None for c in resultado["dias_cobertura"].tolist()],
+                resultado["sugerido"].tolist(), [calculado] * len(pares))
+    with conn:
+        conn.execute("DELETE FROM sugerencias_reposicion")
+        conn.executemany("""
+            INSERT INTO sugerencias_reposicion
+                (vendedor_id, producto_id, promedio_diario, demanda_prevista, dias_cobertura, sugerido, calculado)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, filas)
+
+def generar_sugerencias(ruta=None):
+    """Carga la historia, calcula las sugerencias y las guarda. Devuelve cuántos pares se evaluaron."""
+    conn = database.crear_conexion(ruta)
+    if conn is None:
+        return 0
+    try:
+        t = time.perf_counter()
+        pares_con_ventas, dias, ventas = cargar_historial(conn)
+        pares, stock, filas = cargar_stock(conn, pares_con_ventas)
+        demanda = np.zeros((len(pares), len(dias)))
+        demanda[filas] = ventas
+        resultado = calcular_sugerencias(dias, demanda, stock)
+        guardar_sugerencias(conn, pares, resultado)
+        logging.info(f"Sugerencias de reposición: {len(pares)} pares, {len(dias)} días en {time.perf_counter() - t:.2f}s")
+        return len(pares)
+    except sqlite3.Error as e:
+        logging.error(f"Error al generar sugerencias de reposición: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    generar_sugerencias()
@@ -0,0 +1,108 @@
+import bisect
+import logging
+import threading
+
+import database
+
+TOP_N = 10
+
+class Clasificacion:
+    """
+    Clasificación en memoria de usuarios por una columna de usuarios.
+
+    Las claves se guardan ordenadas como (-valor, usuario_id), así el top-N es un corte de la
+    lista y la posición de un usuario se obtiene con una búsqueda binaria.
+    """
+
+    def __init__(self, columna):
+        self.columna = columna
+        self.claves = []
+        self.valores = {}
+
+    def cargar(self, filas):
+        # Solo clasifican los que ganaron algo: los que están en cero no son ganadores
+        self.valores = {usuario_id: valor for usuario_id, valor in filas if valor and valor > 0}
+        self.claves = sorted((-valor, usuario_id) for usuario_id, valor in self.valores.items())
+
+    def actualizar(self, usuario_id, valor):
+        anterior = self.valores.get(usuario_id)
+        if anterior == valor:
+            return
+        if anterior is not None:
+            indice = bisect.bisect_left(self.claves, (-anterior, usuario_id))
+            del self.claves[indice]
+            del self.valores[usuario_id]
+        if valor and valor > 0:
+            bisect.insort(self.claves, (-valor, usuario_id))
+            self.valores[usuario_id] = valor
+
+    def top(self, n=TOP_N):
+        return [(usuario_id, -valor) for valor, usuario_id in self.claves[:n]]
+
+    def posicion(self, usuario_id):
+        """Devuelve (posición empezando en 1, valor) o None si el usuario no está clasificado."""
+        valor = self.valores.get(usuario_id)
+        if valor is None:
+            return None
+        return bisect.bisect_left(self.claves, (-valor, usuario_id)) + 1, valor
+
+
+COLUMNAS = ("dinero_ganado", "mayor_ganancia")
+
+_CLASIFICACIONES = {columna: Clasificacion(columna) for columna in COLUMNAS}
+_NOMBRES = {}
+_LOCK = threading.Lock()
+_CARGADO = False
+
+def _nombre(username, first_name, usuario_id):
+    if username:
+        return f"@{username}"
+    return first_name or f"Usuario {usuario_id}"
+
+def cargar_clasificaciones():
+    """Carga una sola vez todas las clasificaciones desde la tabla usuarios."""
+    global _CARGADO
+    filas = database.ejecutar_consulta(
+        "SELECT id, username, first_name, dinero_ganado, mayor_ganancia FROM usuarios")
+    if filas is None:
+        return False
+    with _LOCK:
+        _CLASIFICACIONES["dinero_ganado"].cargar((f[0], f[3] or 0.0) for f in filas)
+        _CLASIFICACIONES["mayor_ganancia"].cargar((f[0], f[4] or 0.0) for f in filas)
+        _NOMBRES.clear()
+        _NOMBRES.update((f[0], _nombre(f[1], f[2], f[0])) for f in filas)
+        _CARGADO = True
+    logging.info(f"Clasificaciones cargadas con {len(filas)} usuarios.")
+    return True
+
+def actualizar_usuarios(usuario_ids):
+    """Refresca en memoria solo los usuarios indicados (por ejemplo, los ganadores de un sorteo)."""
+    usuario_ids = list(set(usuario_ids))
+    if not usuario_ids or not _CARGADO:
+        return
+    marcadores = ", ".join("?" * len(usuario_ids))
+    filas = database.ejecutar_consulta(
+        f"SELECT id, username, first_name, dinero_ganado, mayor_ganancia FROM usuarios WHERE id IN ({marcadores})",
+        usuario_ids)
+    if filas is None:
+        return
+    with _LOCK:
+        for usuario_id, username, first_name, dinero_ganado, mayor_ganancia in filas:
+            _CLASIFICACIONES["dinero_ganado"].actualizar(usuario_id, dinero_ganado or 0.0)
+            _CLASIFICACIONES["mayor_ganancia"].actualizar(usuario_id, mayor_ganancia or 0.0)
+            _NOMBRES[usuario_id] = _nombre(username, first_name, usuario_id)
+
+def obtener_top(columna, n=TOP_N):
+    """Devuelve [(nombre, valor)] de los n mejores usuarios por `columna`."""
+    if not _CARGADO:
+        cargar_clasificaciones()
+    with _LOCK:
+        return [(_NOMBRES.get(usuario_id, f"Usuario {usuario_id}"), valor)
+                for usuario_id, valor in _CLASIFICACIONES[columna].top(n)]
+
+def obtener_posicion(columna, usuario_id):
+    """Devuelve (posición, valor) del usuario en la clasificación, o None."""
+    if not _CARGADO:
+        cargar_clasificaciones()
+    with _LOCK:
+        return _CLASIFICACIONES[columna].posicion(usuario_id)
@@ -0,0 +1,102 @@
+import logging
+import sqlite3
+
+import archivo
+import database
+
+# Las fechas de ventas se guardan en UTC como 'YYYY-MM-DD HH:MM:SS'; los rangos son días inclusivos.
+# Las consultas escriben {ventas} y _consultar lo cambia por la tabla caliente o, si el rango
+# llega a meses archivados, por la unión con el archivo (ver archivo.py).
+
+def _consultar(consulta, params=(), desde=None):
+    conn = database.crear_conexion()
+    if conn is None:
+        return []
+    try:
+        if "{ventas}" in consulta:
+            consulta = consulta.replace("{ventas}", archivo.fuente_ventas(conn, desde))
+        return conn.execute(consulta, params).fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Error en el reporte: {e}")
+        return []
+    finally:
+        conn.close()
+
+def ventas_por_producto(vendedor_id, desde, hasta):
+    """Devuelve [(producto, cantidad, precio_unitario, comision)] del vendedor en el rango."""
+    return _consultar("""
+        SELECT p.nombre, SUM(v.cantidad_vendida), p.precio_venta, SUM(v.comision)
+        FROM {ventas} v
+        JOIN productos p ON v.producto_id = p.id
+        WHERE v.vendedor_id = ? AND v.fecha >= ? AND v.fecha < date(?, '+1 day')
+        GROUP BY p.id
+        ORDER BY p.nombre
+    """, (vendedor_id, str(desde), str(hasta)), desde)
+
+def totales_vendedor(vendedor_id, desde, hasta):
+    """Devuelve (total vendido, comisión) del vendedor en el rango."""
+    filas = _consultar("""
+        SELECT COALESCE(SUM(p.precio_venta * v.cantidad_vendida), 0), COALESCE(SUM(v.comision), 0)
+        FROM {ventas} v
+        JOIN productos p ON v.producto_id = p.id
+        WHERE v.vendedor_id = ? AND v.fecha >= ? AND v.fecha < date(?, '+1 day')
+    """, (vendedor_id, str(desde), str(hasta)), desde)
+    return filas[0] if filas else (0, 0)
+
+def ventas_detalle(desde, hasta, vendedor_id=None):
+    """Devuelve [(fecha, producto, cantidad, precio, total, comision, vendedor)] del rango, más recientes primero."""
+    consulta = """
+        SELECT v.fecha, p.nombre, v.cantidad_vendida, p.precio_venta, p.precio_venta * v.cantidad_vendida,
+               v.comision, ve.nombre
+        FROM {ventas} v
+        JOIN productos p ON v.producto_id = p.id
+        JOIN vendedores ve ON v.vendedor_id = ve.id
+        WHERE v.fecha >= ? AND v.fecha < date(?, '+1 day')
+    """
+    params = [str(desde), str(hasta)]
+    if vendedor_id is not None:
+        consulta += " AND v.vendedor_id = ?"
+        params.append(vendedor_id)
+    return _consultar(consulta + " ORDER BY v.fecha DESC, v.id DESC", params, desde)
+
+def ventas_mensuales(vendedor_id):
+    """
+    Devuelve [(mes, cantidad, total, comision)] de toda la historia del vendedor.
+
+    Los meses archivados salen de los agregados guardados al archivar, sin abrir el archivo.
+    """
+    return _consultar("""
+        SELECT mes, SUM(cantidad), SUM(total), SUM(comision) FROM (
+            SELECT mes, cantidad, total, comision FROM ventas_mensuales WHERE vendedor_id = ?
+            UNION ALL
+            SELECT substr(v.fecha, 1, 7), v.cantidad_vendida, v.cantidad_vendida * p.precio_venta, v.comision
+            FROM ventas v
+            JOIN productos p ON v.producto_id = p.id
+            WHERE v.vendedor_id = ?
+        )
+        GROUP BY mes
+        ORDER BY mes
+    """, (vendedor_id, vendedor_id))
+
+def inventario_vendedor(vendedor_id):
+    """Devuelve [{"producto", "cantidad"}] con el stock actual del vendedor."""
+    filas = _consultar("""
+        SELECT p.nombre, i.cantidad_entregada
+        FROM inventario i
+        JOIN productos p ON i.producto_id = p.id
+        WHERE i.vendedor_id = ?
+        ORDER BY p.nombre
+    """, (vendedor_id,))
+    return [{"producto": nombre, "cantidad": cantidad} for nombre, cantidad in filas]
+
+def sugerencias_vendedor(vendedor_id):
+    """Devuelve [{"producto", "promedio_diario", "dias_cobertura", "sugerido"}] de la última corrida de pronostico.py."""
+    filas = _consultar("""
+        SELECT p.nombre, s.promedio_diario, s.dias_cobertura, s.sugerido
+        FROM sugerencias_reposicion s
+        JOIN productos p ON s.producto_id = p.id
+        WHERE s.vendedor_id = ? AND s.sugerido > 0
+        ORDER BY s.sugerido DESC, p.nombre
+    """, (vendedor_id,))
+    return [{"producto": nombre, "promedio_diario": promedio, "dias_cobertura": cobertura, "sugerido": sugerido}
+            for nombre, promedio, cobertura, sugerido in filas]
@@ -0,0 +1,188 @@
+"""
+Reproduce grabaciones de grabacion.py con los handlers de main.py, contra una API de Telegram
+falsa y una copia descartable de la base, e informa cuánto tardó cada handler.
+
+    python reproducir.py grabaciones/updates-20261018.jsonl.gz --base servicej.db
+    python reproducir.py grabaciones/*.jsonl.gz --velocidad 0      # lo más rápido posible
+    python reproducir.py grabaciones/*.jsonl.gz --latencia-api 80  # simula 80 ms por llamada
+
+Con --velocidad 1 se respetan los intervalos originales entre updates; con 0 se encadenan sin
+esperar. Fuera de 1x los límites por chat se desactivan (comprimir el tiempo los dispararía
+aunque en producción no saltaron). Las contraseñas se grabaron censuradas, así que en la copia
+todos los vendedores pasan a tener esa contraseña: los logins fallidos de la grabación también
+entran. Los updates se procesan de a uno para que la medición sea repetible.
+
+--base debería ser un respaldo tomado antes de empezar a grabar (ver respaldos.py): contra la
+base actual las ventas y sesiones de la grabación ya están aplicadas y el flujo se desvía.
+"""
+import argparse
+import collections
+import importlib
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from dotenv import load_dotenv
+from telebot import apihelper, types
+
+import grabacion
+
+# Métodos cuya respuesta es un Message; el resto devuelve True
+METODOS_CON_MENSAJE = {"sendMessage", "editMessageText", "editMessageReplyMarkup", "sendPhoto", "sendDocument"}
+
+class TelegramFalso:
+    """Reemplazo de apihelper._make_request: cuenta las llamadas y contesta lo mínimo que leen los handlers."""
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.llamadas = collections.Counter()
+        self._siguiente_id = 1
+        self._lock = threading.Lock()
+
+    def _mensaje(self, params):
+        with self._lock:
+            self._siguiente_id += 1
+            message_id = self._siguiente_id
+        chat_id = params.get("chat_id", 0) if params else 0
+        return {"message_id": message_id, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}}
+
+    def __call__(self, token, method_name, method='get', params=None, files=None):
+        self.llamadas[method_name] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if method_name == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "reproduccion", "username": "reproduccion_bot"}
+        if method_name == "sendMediaGroup":
+            return [self._mensaje(params)]
+        if method_name in METODOS_CON_MENSAJE:
+            return self._mensaje(params)
+        return True
+
+def copiar_base(origen, destino):
+    fuente = sqlite3.connect(origen)
+    copia = sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        copia.close()
+        fuente.close()
+
+def cronometrar(bot, tiempos):
+    """Envuelve cada handler de `bot` para anotar en `tiempos[nombre]` los ms de cada ejecución."""
+    for handlers in (bot.message_handlers, bot.callback_query_handlers):
+        for handler in handlers:
+            funcion = handler["function"]
+
+            def medido(update, funcion=funcion):
+                inicio = time.perf_counter()
+                try:
+                    return funcion(update)
+                finally:
+                    tiempos[funcion.__name__].append((time.perf_counter() - inicio) * 1000)
+
+            medido.__name__ = funcion.__name__
+            handler["function"] = medido
+
+def esperar_logins(verificador, limite=30):
+    """Los logins terminan en el pool de credenciales; se espera para que el update siguiente vea el estado final."""
+    fin = time.monotonic() + limite
+    while verificador.resumen().get("pendientes", 0) and time.monotonic() < fin:
+        time.sleep(0.002)
+
+def reproducir(rutas, base, velocidad=1.0, latencia_api=0.0, directorio=None):
+    """Devuelve (tiempos por handler, TelegramFalso, updates reproducidos, segundos)."""
+    base = os.path.abspath(base)
+    rutas = [os.path.abspath(ruta) for ruta in rutas]
+    load_dotenv(os.path.abspath("config.env"))
+    archivo_base = os.path.abspath(os.getenv("ARCHIVO_DATABASE_NAME", os.path.splitext(base)[0] + "_archivo.db"))
+    os.chdir(directorio)
+
+    # main y archivo leen las rutas del entorno al importarse: se apuntan a las copias antes de
+    # importarlos, así un DATABASE_NAME absoluto en el entorno no lleva la reproducción a la base real
+    copia = os.path.abspath("servicej.db")
+    copia_archivo = os.path.abspath("servicej_archivo.db")
+    if copia == base or copia_archivo == archivo_base:
+        raise ValueError(f"La copia de {base} caería sobre la base original; usa otro directorio.")
+    copiar_base(base, copia)
+    if os.path.exists(archivo_base):
+        copiar_base(archivo_base, copia_archivo)
+    os.environ["DATABASE_NAME"] = copia
+    os.environ["ARCHIVO_DATABASE_NAME"] = copia_archivo
+    os.environ["EVENTOS_JSONL"] = os.path.abspath("eventos.jsonl")
+    os.environ.pop("GRABAR_UPDATES_DIR", None)  # lo reproducido no se vuelve a grabar
+
+    apihelper._make_request = api = TelegramFalso(latencia_api)
+    main = importlib.import_module("main")
+    if os.path.abspath(main.database.DATABASE_NAME) != copia:
+        raise RuntimeError(f"main ya estaba importado con {main.database.DATABASE_NAME}; se corta para no tocar esa base.")
+    main.inicializar_base_de_datos()
+    main.cache_sesiones.cargar()
+    contrasena = main.credenciales.hashear(grabacion.CONTRASENA_CENSURADA)
+    for vendedor_id, _ in main.almacen.listar_vendedores():
+        main.almacen.actualizar_contrasena(vendedor_id, contrasena)
+
+    main.bot.threaded = False
+    if velocidad != 1:
+        for cubeta in (*main.bot_limites.cubetas.values(), main.bot_limites.login):
+            cubeta.capacidad = float("inf")
+
+    tiempos = collections.defaultdict(list)
+    cronometrar(main.bot, tiempos)
+
+    reproducidos = 0
+    inicio = time.perf_counter()
+    primera = None
+    for llegada, crudo in grabacion.leer_grabacion(rutas):
+        if velocidad > 0:
+            primera = llegada if primera is None else primera
+            espera = (llegada - primera) / velocidad - (time.perf_counter() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+        main.bot.process_new_updates([types.Update.de_json(crudo)])
+        esperar_logins(main.verificador_credenciales)
+        reproducidos += 1
+    duracion = time.perf_counter() - inicio
+    main.enviador.esperar_vacia(10)
+    return tiempos, api, reproducidos, duracion
+
+def informe(tiempos, api, reproducidos, duracion):
+    lineas = [f"{reproducidos} updates en {duracion:.2f}s ({reproducidos / duracion if duracion else 0:.1f}/s)", "",
+              f"{'handler':<28}{'n':>7}{'total ms':>11}{'media':>9}{'p50':>9}{'p95':>9}{'máx':>9}"]
+    for nombre, muestras in sorted(tiempos.items(), key=lambda item: -sum(item[1])):
+        if not muestras:
+            continue
+        ordenadas = sorted(muestras)
+        p50 = ordenadas[len(ordenadas) // 2]
+        p95 = ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.95))]
+        lineas.append(f"{nombre:<28}{len(muestras):>7}{sum(muestras):>11.1f}{sum(muestras) / len(muestras):>9.2f}"
+                      f"{p50:>9.2f}{p95:>9.2f}{ordenadas[-1]:>9.2f}")
+    atendidos = sum(len(muestras) for muestras in tiempos.values())
+    lineas.append(f"\nSin handler (o descartados por los límites): {reproducidos - atendidos}")
+    lineas.append("Llamadas a la API: " + ", ".join(f"{metodo} {cantidad}" for metodo, cantidad in api.llamadas.most_common()))
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reproduce updates grabados contra una API falsa y una copia de la base.")
+    parser.add_argument("grabaciones", nargs="+", help="archivos updates-*.jsonl.gz, en orden")
+    parser.add_argument("--base", default="servicej.db", help="base a copiar (no se modifica)")
+    parser.add_argument("--velocidad", type=float, default=1.0, help="1 = tiempo real, 0 = lo más rápido posible")
+    parser.add_argument("--latencia-api", type=float, default=0.0, help="ms que tarda cada llamada falsa a Telegram")
+    parser.add_argument("--conservar", action="store_true", help="no borrar la copia de la base al terminar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    directorio = tempfile.mkdtemp(prefix="reproduccion-")
+    try:
+        resultado = reproducir(args.grabaciones, args.base, args.velocidad, args.latencia_api / 1000, directorio)
+        print(informe(*resultado))
+    finally:
+        if args.conservar:
+            print(f"\nCopia de la base en {directorio}", file=sys.stderr)
+        else:
+            shutil.rmtree(directorio, ignore_errors=True)
@@ -0,0 +1,206 @@
+import glob
+import logging
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+
+import archivo
+import database
+
+RESPALDOS_DIR = os.getenv("RESPALDOS_DIR", "respaldos")
+RESPALDOS_A_CONSERVAR = int(os.getenv("RESPALDOS_A_CONSERVAR", "7"))  # por base de datos
+HORAS_ENTRE_RESPALDOS = 24
+PAGINAS_POR_PASO = 256  # ~1 MB con páginas de 4 KB
+PAUSA_ENTRE_PASOS = 0.005  # segundos; deja pasar a los escritores entre paso y paso
+REINICIOS_MAXIMOS = 5
+INTERVALO_SONDA = 0.05
+
+class _DemasiadosReinicios(Exception):
+    pass
+
+class SondaEscritura:
+    """
+    Mide cuánto tarda en conseguirse el candado de escritura mientras corre el respaldo.
+
+    Hace BEGIN IMMEDIATE + ROLLBACK: espera lo mismo que esperaría una venta, pero no
+    modifica la base (una escritura real reiniciaría la copia en curso).
+    """
+
+    def __init__(self, ruta, intervalo=INTERVALO_SONDA):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.muestras = []
+        self._parada = threading.Event()
+        self._hilo = threading.Thread(target=self._medir, name="sonda-respaldo", daemon=True)
+
+    def _medir(self):
+        conn = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+        try:
+            while not self._parada.is_set():
+                t = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("ROLLBACK")
+                self.muestras.append((time.perf_counter() - t) * 1000)
+                self._parada.wait(self.intervalo)
+        except sqlite3.Error as e:
+            logging.warning(f"Sonda de escritura detenida: {e}")
+        finally:
+            conn.close()
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parada.set()
+        self._hilo.join()
+
+    def resumen(self):
+        if not self.muestras:
+            return 0.0, 0.0
+        return statistics.median(self.muestras), max(self.muestras)
+
+def verificar_integridad(ruta):
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    except sqlite3.Error as e:
+        logging.error(f"Error al verificar el respaldo {ruta}: {e}")
+        return False
+    finally:
+        conn.close()
+
+def rotar(prefijo, conservar=RESPALDOS_A_CONSERVAR, directorio=RESPALDOS_DIR):
+    """Borra los respaldos de `prefijo` más viejos, dejando los `conservar` más recientes."""
+    copias = sorted(glob.glob(os.path.join(directorio, f"{prefijo}-*.db")))
+    for ruta in copias[:-conservar] if conservar > 0 else copias:
+        os.remove(ruta)
+    return max(len(copias) - conservar, 0)
+
+def edad_ultimo_respaldo(ruta, directorio=RESPALDOS_DIR):
+    """Segundos desde el respaldo más reciente de `ruta` (según el sello UTC del nombre), o None si no hay."""
+    prefijo = os.path.splitext(os.path.basename(ruta))[0]
+    for copia in sorted(glob.glob(os.path.join(directorio, f"{prefijo}-*.db")), reverse=True):
+        try:
+            sello = datetime.strptime(os.path.basename(copia)[len(prefijo) + 1:-3], "%Y%m%d-%H%M%S")
+        except ValueError:
+            continue
+        return (datetime.now(timezone.utc) - sello.replace(tzinfo=timezone.utc)).total_seconds()
+    return None
+
+def respaldar(ruta, directorio=RESPALDOS_DIR, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS):
+    """
+    Copia `ruta` con la API de respaldo en línea, en pasos de `paginas`, y verifica la copia.
+
+    Si otro proceso escribe durante la copia, SQLite la reinicia en el siguiente paso. Tras
+    REINICIOS_MAXIMOS reinicios se termina en un solo paso, que en modo WAL sigue sin
+    bloquear a los escritores (solo toma una instantánea de lectura). Devuelve un dict
+    con la ruta de la copia, los tiempos y la latencia de escritura medida, o None si falló.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    prefijo = os.path.splitext(os.path.basename(ruta))[0]
+    sello = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    destino_ruta = os.path.join(directorio, f"{prefijo}-{sello}.db")
+    temporal = destino_ruta + ".parcial"
+
+    progreso = {"restantes": None, "reinicios": 0, "pasos": 0}
+
+    def al_avanzar(estado, restantes, total):
+        if progreso["restantes"] is not None and restantes > progreso["restantes"]:
+            progreso["reinicios"] += 1
+            if progreso["reinicios"] >= REINICIOS_MAXIMOS:
+                raise _DemasiadosReinicios()
+        progreso["restantes"] = restantes
+        progreso["pasos"] += 1
+
+    origen = sqlite3.connect(ruta, timeout=30)
+    destino = sqlite3.connect(temporal)
+    inicio = time.perf_counter()
+    try:
+        with SondaEscritura(ruta) as sonda:
+            try:
+                origen.backup(destino, pages=paginas, progress=al_avanzar, sleep=pausa)
+            except _DemasiadosReinicios:
+                logging.warning(f"Respaldo de {ruta}: {REINICIOS_MAXIMOS} reinicios por escrituras, se termina en un paso")
+                origen.backup(destino, pages=-1)
+        duracion = time.perf_counter() - inicio
+    except sqlite3.Error as e:
+        logging.error(f"Error al respaldar {ruta}: {e}")
+        destino.close()
+        os.remove(temporal)
+        return None
+    finally:
+        destino.close()
+        origen.close()
+
+    if not verificar_integridad(temporal):
+        logging.error(f"El respaldo de {ruta} no pasó la verificación de integridad; se descarta.")
+        os.remove(temporal)
+        return None
+    os.replace(temporal, destino_ruta)
+
+    mediana, maxima = sonda.resumen()
+    resultado = {
+        "ruta": destino_ruta,
+        "bytes": os.path.getsize(destino_ruta),
+        "segundos": duracion,
+        "pasos": progreso["pasos"],
+        "reinicios": progreso["reinicios"],
+        "latencia_mediana_ms": mediana,
+        "latencia_maxima_ms": maxima,
+        "borrados": rotar(prefijo, directorio=directorio),
+    }
+    logging.info(f"Respaldo {destino_ruta}: {resultado['bytes'] / 1024:.0f} KB en {duracion:.2f}s, "
+                 f"{resultado['pasos']} pasos, {resultado['reinicios']} reinicios, "
+                 f"latencia de escritura {mediana:.1f} ms (máx. {maxima:.1f} ms)")
+    return resultado
+
+def respaldar_todo(directorio=RESPALDOS_DIR):
+    """Respalda la base principal y, si existe, la de archivo. Devuelve la lista de resultados."""
+    rutas = [database.DATABASE_NAME]
+    if os.path.exists(archivo.ARCHIVO_DATABASE_NAME):
+        rutas.append(archivo.ARCHIVO_DATABASE_NAME)
+    return [respaldar(ruta, directorio) for ruta in rutas]
+
+def resumen_respaldos(resultados):
+    mensaje = "💾 Respaldo diario:\n"
+    for resultado in resultados:
+        if resultado is None:
+            mensaje += "- ❌ Falló una copia (ver el log)\n"
+            continue
+        mensaje += (f"- {os.path.basename(resultado['ruta'])}: {resultado['bytes'] / 1024:.0f} KB en "
+                    f"{resultado['segundos']:.2f}s, escrituras +{resultado['latencia_maxima_ms']:.0f} ms máx.\n")
+    return mensaje
+
+def iniciar_respaldos_periodicos(horas=HORAS_ENTRE_RESPALDOS, al_terminar=None, directorio=RESPALDOS_DIR):
+    """
+    Respalda cada `horas` en un hilo en segundo plano; `al_terminar` recibe los resultados.
+
+    La primera copia sale cuando el respaldo más reciente cumple `horas` (o enseguida si no
+    hay ninguno): si cada arranque copiara, unos cuantos reinicios en un día dejarían a rotar
+    solo copias de ese día y se perderían las de los días anteriores.
+    """
+    parada = threading.Event()
+
+    def ciclo():
+        edad = edad_ultimo_respaldo(database.DATABASE_NAME, directorio)
+        if edad is not None and edad < horas * 3600:
+            logging.info(f"Último respaldo de hace {edad / 3600:.1f} h; el próximo en {horas - edad / 3600:.1f} h")
+            if parada.wait(horas * 3600 - edad):
+                return
+        while not parada.is_set():
+            resultados = respaldar_todo(directorio)
+            if al_terminar:
+                al_terminar(resultados)
+            parada.wait(horas * 3600)
+
+    threading.Thread(target=ciclo, name="respaldos", daemon=True).start()
+    return parada
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print(resumen_respaldos(respaldar_todo()))
@@ -0,0 +1,65 @@
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+# Días que dura una sesión desde que se abrió; vacío = no vencen (el comportamiento de siempre)
+DURACION_SESION_DIAS = int(os.getenv("DURACION_SESION_DIAS", "0")) or None
+
+class CacheSesiones:
+    """
+    Mapa chat_id -> (vendedor_id, nombre, fecha_inicio) cargado una vez desde la tabla
+    sesiones y mantenido write-through: crear() y cerrar() escriben primero en la base y solo
+    después tocan el mapa. resolver() no hace consultas.
+
+    El vencimiento se calcula con la fecha_inicio guardada, así que una sesión vence el
+    mismo día aunque el bot se haya reiniciado en medio.
+    """
+
+    def __init__(self, almacen, duracion_dias=DURACION_SESION_DIAS):
+        self.almacen = almacen
+        self.duracion_dias = duracion_dias
+        self._sesiones = None
+        self._lock = threading.Lock()
+
+    def cargar(self):
+        nombres = dict(self.almacen.listar_vendedores())
+        sesiones = {chat_id: (vendedor_id, nombres.get(vendedor_id), date.fromisoformat(fecha_inicio))
+                    for chat_id, vendedor_id, fecha_inicio in self.almacen.listar_sesiones()}
+        with self._lock:
+            self._sesiones = sesiones
+        logging.info(f"Sesiones cargadas en memoria: {len(sesiones)}")
+
+    def _vencida(self, fecha_inicio):
+        return self.duracion_dias is not None and date.today() >= fecha_inicio + timedelta(days=self.duracion_dias)
+
+    def resolver(self, chat_id):
+        """Devuelve (vendedor_id, nombre) de la sesión del chat, o None si no hay o venció."""
+        if self._sesiones is None:
+            self.cargar()
+        sesion = self._sesiones.get(chat_id)
+        if sesion is None:
+            return None
+        vendedor_id, nombre, fecha_inicio = sesion
+        if nombre is None or self._vencida(fecha_inicio):
+            self.cerrar(chat_id)  # vencida o de un vendedor que ya no existe
+            return None
+        return vendedor_id, nombre
+
+    def crear(self, chat_id, vendedor_id, nombre):
+        if self._sesiones is None:
+            self.cargar()
+        with self._lock:
+            if not self.almacen.crear_sesion(chat_id, vendedor_id):
+                return False
+            self._sesiones[chat_id] = (vendedor_id, nombre, date.today())
+            return True
+
+    def cerrar(self, chat_id):
+        if self._sesiones is None:
+            self.cargar()
+        with self._lock:
+            if not self.almacen.cerrar_sesion(chat_id):
+                return False
+            self._sesiones.pop(chat_id, None)
+            return True
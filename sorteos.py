@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import logging
+import secrets
+import sqlite3
+
+import database
+import ranking
+
+# --- Generador Aleatorio ---
+# HMAC-SHA256 en modo contador: con la semilla guardada cualquiera puede repetir el sorteo
+# y comprobar que los ganadores son los publicados.
+def _bloque(semilla, contador):
+    return hmac.new(bytes.fromhex(semilla), contador.to_bytes(8, "big"), hashlib.sha256).digest()
+
+def semilla_valida(semilla):
+    """La semilla es la clave del HMAC: tiene que ser hexadecimal y no vacía."""
+    try:
+        return len(bytes.fromhex(semilla)) > 0
+    except (TypeError, ValueError):
+        return False
+
+def _entero_uniforme(semilla, contador, limite):
+    """Devuelve (valor en [0, limite), siguiente contador) sin sesgo de módulo."""
+    rango = 2 ** 64
+    maximo_aceptado = rango - (rango % limite)
+    while True:
+        valor = int.from_bytes(_bloque(semilla, contador)[:8], "big")
+        contador += 1
+        if valor < maximo_aceptado:
+            return valor % limite, contador
+
+def elegir_ganadores(semilla, participantes, cantidad):
+    """Elige `cantidad` participantes distintos con un Fisher-Yates parcial guiado por la semilla."""
+    participantes = list(participantes)
+    cantidad = min(cantidad, len(participantes))
+    contador = 0
+    for i in range(cantidad):
+        j, contador = _entero_uniforme(semilla, contador, len(participantes) - i)
+        j += i
+        participantes[i], participantes[j] = participantes[j], participantes[i]
+    return participantes[:cantidad]
+
+
+# --- Sorteo ---
+_PARTICIPANTES_SQL = """
+    SELECT id, usuario_id, numero FROM reservas
+    WHERE sorteo_id = ? AND estado = 'confirmada'
+    ORDER BY numero, id
+"""
+
+def realizar_sorteo(sorteo_id, premios, semilla=None):
+    """
+    Sortea los premios entre las reservas confirmadas y actualiza las estadísticas de usuarios.
+
+    `premios` es la lista de montos en orden (primer premio, segundo, ...). Todo ocurre en una
+    sola transacción: ganadores, semilla, participantes y estadísticas se guardan juntos o no se
+    guarda nada. Los ids de las reservas participantes quedan en el orden sorteado junto a la
+    semilla, así la verificación no depende de que las reservas sigan como estaban.
+    Devuelve (semilla, [(posicion, reserva_id, usuario_id, numero, premio)]) o None si falla.
+    """
+    semilla = semilla or secrets.token_hex(32)
+    if not semilla_valida(semilla):
+        logging.error(f"Semilla inválida para el sorteo {sorteo_id}: debe ser hexadecimal.")
+        return None
+    conn = database.crear_conexion()
+    if conn is None:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+
+        cursor.execute("SELECT semilla FROM sorteos WHERE id = ?", (sorteo_id,))
+        fila = cursor.fetchone()
+        if fila is None:
+            logging.error(f"El sorteo {sorteo_id} no existe.")
+            conn.rollback()
+            return None
+        if fila[0] is not None:
+            logging.error(f"El sorteo {sorteo_id} ya fue realizado.")
+            conn.rollback()
+            return None
+
+        cursor.execute(_PARTICIPANTES_SQL, (sorteo_id,))
+        participantes = cursor.fetchall()
+        elegidos = elegir_ganadores(semilla, participantes, len(premios))
+        ganadores = [(posicion, reserva_id, usuario_id, numero, premio)
+                     for posicion, ((reserva_id, usuario_id, numero), premio)
+                     in enumerate(zip(elegidos, premios), start=1)]
+
+        cursor.executemany(
+            "INSERT INTO ganadores (sorteo_id, posicion, reserva_id, usuario_id, numero, premio) VALUES (?, ?, ?, ?, ?, ?)",
+            [(sorteo_id,) + ganador for ganador in ganadores])
+        cursor.execute("UPDATE sorteos SET semilla = ?, participantes = ?, fecha_sorteo = CURRENT_TIMESTAMP WHERE id = ?",
+                       (semilla, ",".join(str(reserva_id) for reserva_id, _, _ in participantes), sorteo_id))
+
+        # Estadísticas: unas pocas sentencias sobre conjuntos, sin importar cuántos participantes haya
+        cursor.execute("""
+            INSERT OR IGNORE INTO usuarios (id)
+            SELECT DISTINCT usuario_id FROM reservas WHERE sorteo_id = ? AND estado = 'confirmada'
+        """, (sorteo_id,))
+        cursor.execute("""
+            UPDATE usuarios SET sorteos_participados = sorteos_participados + 1
+            WHERE id IN (SELECT usuario_id FROM reservas WHERE sorteo_id = ? AND estado = 'confirmada')
+        """, (sorteo_id,))
+        cursor.execute("""
+            UPDATE usuarios
+            SET sorteos_ganados = sorteos_ganados + 1,
+                dinero_ganado = dinero_ganado + (SELECT SUM(premio) FROM ganadores g WHERE g.sorteo_id = ? AND g.usuario_id = usuarios.id),
+                mayor_ganancia = MAX(mayor_ganancia, (SELECT SUM(premio) FROM ganadores g WHERE g.sorteo_id = ? AND g.usuario_id = usuarios.id))
+            WHERE id IN (SELECT usuario_id FROM ganadores WHERE sorteo_id = ?)
+        """, (sorteo_id, sorteo_id, sorteo_id))
+
+        conn.commit()
+        ranking.actualizar_usuarios(usuario_id for _, _, usuario_id, _, _ in ganadores)
+        logging.info(f"Sorteo {sorteo_id} realizado con {len(participantes)} números confirmados y "
+                     f"{len(ganadores)} ganadores. Semilla: {semilla}")
+        return semilla, ganadores
+    except sqlite3.Error as e:
+        logging.error(f"Error al realizar el sorteo {sorteo_id}: {e}")
+        conn.rollback()
+        return None
+    finally:
+        conn.close()
+
+def verificar_sorteo(sorteo_id):
+    """
+    Repite el sorteo con la semilla y los participantes guardados y comprueba que coincide con
+    los ganadores registrados. Los sorteos anteriores a guardar participantes usan las reservas
+    confirmadas actuales.
+    """
+    fila = database.ejecutar_consulta("SELECT semilla, participantes FROM sorteos WHERE id = ?", (sorteo_id,))
+    if not fila or fila[0][0] is None:
+        return False
+    semilla, guardados = fila[0]
+    if guardados is not None:
+        participantes = [int(reserva_id) for reserva_id in guardados.split(",") if reserva_id]
+    else:
+        filas = database.ejecutar_consulta(_PARTICIPANTES_SQL, (sorteo_id,))
+        participantes = None if filas is None else [reserva_id for reserva_id, _, _ in filas]
+    registrados = database.ejecutar_consulta(
+        "SELECT reserva_id FROM ganadores WHERE sorteo_id = ? ORDER BY posicion", (sorteo_id,))
+    if participantes is None or registrados is None or not semilla_valida(semilla):
+        return False
+    return elegir_ganadores(semilla, participantes, len(registrados)) == [reserva_id for (reserva_id,) in registrados]
@@ -0,0 +1,116 @@
+import io
+import logging
+import threading
+
+from PIL import Image, ImageDraw, ImageFont
+
+import almacenamiento
+
+# --- Configuración del Dibujo ---
+COLUMNAS = 25
+ANCHO_CELDA = 44
+ALTO_CELDA = 28
+MARGEN = 10
+COLOR_FONDO = (248, 249, 250)
+COLOR_LIBRE = (212, 237, 218)
+COLOR_OCUPADO = (220, 53, 69)
+COLOR_TEXTO_LIBRE = (21, 87, 36)
+COLOR_TEXTO_OCUPADO = (255, 255, 255)
+
+_FUENTE = ImageFont.load_default()
+
+class TableroRenderizado:
+    """Último tablero dibujado de un sorteo: la imagen, la disponibilidad y el file_id subido."""
+
+    def __init__(self, version, numeros, imagen):
+        self.version = version
+        self.numeros = numeros  # lista ordenada de números del sorteo
+        self.disponibles = {}  # numero -> disponible
+        self.imagen = imagen
+        self.png = None
+        self.file_id = None
+
+
+_CACHE = {}  # sorteo_id -> TableroRenderizado
+_LOCK = threading.Lock()
+
+def _caja(indice):
+    fila, columna = divmod(indice, COLUMNAS)
+    x = MARGEN + columna * ANCHO_CELDA
+    y = MARGEN + fila * ALTO_CELDA
+    return x, y, x + ANCHO_CELDA - 2, y + ALTO_CELDA - 2
+
+def _dibujar_celda(dibujo, indice, numero, disponible):
+    x0, y0, x1, y1 = _caja(indice)
+    dibujo.rectangle((x0, y0, x1, y1), fill=COLOR_LIBRE if disponible else COLOR_OCUPADO)
+    texto = str(numero)
+    izquierda, arriba, derecha, abajo = dibujo.textbbox((0, 0), texto, font=_FUENTE)
+    dibujo.text((x0 + (x1 - x0 - (derecha - izquierda)) / 2, y0 + (y1 - y0 - (abajo - arriba)) / 2 - arriba),
+                texto, font=_FUENTE, fill=COLOR_TEXTO_LIBRE if disponible else COLOR_TEXTO_OCUPADO)
+
+def _imagen_vacia(cantidad):
+    filas = (cantidad + COLUMNAS - 1) // COLUMNAS
+    return Image.new("RGB", (2 * MARGEN + COLUMNAS * ANCHO_CELDA, 2 * MARGEN + max(filas, 1) * ALTO_CELDA), COLOR_FONDO)
+
+def obtener_version(sorteo_id):
+    return almacenamiento.obtener_almacen().obtener_version_tablero(sorteo_id)
+
+def renderizar_tablero(sorteo_id):
+    """
+    Devuelve el TableroRenderizado al día del sorteo, o None si el sorteo no existe.
+
+    Si la versión no cambió se devuelve el de la caché tal cual; si cambió, solo se
+    redibujan las celdas cuya disponibilidad es distinta a la del último dibujo.
+    """
+    version = obtener_version(sorteo_id)
+    if version is None:
+        return None
+    with _LOCK:
+        anterior = _CACHE.get(sorteo_id)
+        if anterior is not None and anterior.version == version:
+            return anterior
+
+    filas = almacenamiento.obtener_almacen().obtener_numeros(sorteo_id)
+    if filas is None:
+        return None
+    numeros = [numero for numero, _ in filas]
+
+    with _LOCK:
+        anterior = _CACHE.get(sorteo_id)
+        if anterior is not None and anterior.numeros == numeros:
+            # Mismos números: se parte de la imagen anterior y solo cambian las celdas distintas
+            tablero = TableroRenderizado(version, numeros, anterior.imagen.copy())
+            tablero.disponibles = dict(anterior.disponibles)
+        else:
+            tablero = TableroRenderizado(version, numeros, _imagen_vacia(len(numeros)))
+
+        dibujo = ImageDraw.Draw(tablero.imagen)
+        redibujadas = 0
+        for indice, (numero, disponible) in enumerate(filas):
+            disponible = bool(disponible)
+            if tablero.disponibles.get(numero) is not disponible:
+                _dibujar_celda(dibujo, indice, numero, disponible)
+                tablero.disponibles[numero] = disponible
+                redibujadas += 1
+
+        salida = io.BytesIO()
+        tablero.imagen.save(salida, format="PNG", optimize=False)
+        tablero.png = salida.getvalue()
+        _CACHE[sorteo_id] = tablero
+
+    logging.info(f"Tablero del sorteo {sorteo_id} v{version}: {redibujadas} celdas redibujadas.")
+    return tablero
+
+def enviar_tablero(bot, chat_id, sorteo_id, caption=None):
+    """Envía el tablero al chat reutilizando el file_id de Telegram si la imagen no cambió."""
+    tablero = renderizar_tablero(sorteo_id)
+    if tablero is None:
+        return None
+    if tablero.file_id is not None:
+        return bot.send_photo(chat_id, tablero.file_id, caption=caption)
+
+    mensaje = bot.send_photo(chat_id, io.BytesIO(tablero.png), caption=caption)
+    if mensaje.photo:
+        with _LOCK:
+            tablero.file_id = mensaje.photo[-1].file_id
+    return mensaje
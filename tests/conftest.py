@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Los módulos leen el entorno al importarse: nada de las pruebas cae en la base ni en los logs reales
+_CARPETA = tempfile.mkdtemp(prefix="pruebas-bot-")
+os.environ["TELEGRAM_TOKEN"] = "1:prueba"
+os.environ["ADMIN_CHAT_ID"] = "1"
+os.environ["DATABASE_NAME"] = os.path.join(_CARPETA, "servicej.db")
+os.environ["EVENTOS_JSONL"] = os.path.join(_CARPETA, "eventos.jsonl")
+os.environ.pop("GRABAR_UPDATES_DIR", None)
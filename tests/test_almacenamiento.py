@@ -0,0 +1,185 @@
+import sqlite3
+from datetime import date
+
+import pytest
+from PIL import Image
+
+import almacenamiento
+import database
+import main
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request, tmp_path):
+    """El mismo contrato se corre contra los dos motores."""
+    if request.param == "memoria":
+        yield almacenamiento.AlmacenamientoMemoria()
+        return
+    ruta = str(tmp_path / "contrato.db")
+    main.create_database(ruta)
+    database.crear_tablas(ruta)
+    almacen = almacenamiento.AlmacenamientoSQLite(ruta)
+    yield almacen
+    almacen.cerrar()
+
+
+@pytest.fixture
+def vendedores(almacen):
+    return almacen.agregar_vendedor("ana", "secreta", "Ana"), almacen.agregar_vendedor("beto", "clave", "Beto")
+
+
+@pytest.fixture
+def productos(almacen):
+    return almacen.agregar_producto("Jabon", 100, 150), almacen.agregar_producto("Pasta", 200, 300)
+
+
+def test_vendedores(almacen, vendedores):
+    ana, beto = vendedores
+    assert almacen.obtener_vendedor("ana") == (ana, "Ana", "secreta")
+    assert almacen.obtener_vendedor("nadie") is None
+    assert almacen.actualizar_contrasena(ana, "otra") is True
+    assert almacen.obtener_vendedor("ana") == (ana, "Ana", "otra")
+    assert almacen.actualizar_contrasena(999, "x") is False
+    assert almacen.obtener_vendedor_por_id(beto) == (beto, "Beto")
+    assert almacen.obtener_vendedor_por_id(999) is None
+    assert almacen.listar_vendedores() == [(ana, "Ana"), (beto, "Beto")]
+    with pytest.raises(sqlite3.IntegrityError):
+        almacen.agregar_vendedor("ana", "x", "Otra Ana")
+
+
+def test_productos_e_inventario(almacen, vendedores, productos):
+    ana, _ = vendedores
+    jabon, pasta = productos
+    assert almacen.obtener_productos() == [(jabon, "Jabon"), (pasta, "Pasta")]
+    assert almacen.obtener_producto(pasta) == (200, 300, "Pasta")
+    assert almacen.obtener_producto(999) is None
+    assert almacen.obtener_inventario(ana, jabon) == 0
+    almacen.fijar_inventario(ana, jabon, 10)
+    almacen.fijar_inventario(ana, pasta, 5)
+    almacen.fijar_inventario(ana, pasta, 4)
+    assert almacen.obtener_inventario(ana, jabon) == 10
+    assert almacen.obtener_inventario(ana, pasta) == 4
+
+
+def test_ventas(almacen, vendedores, productos):
+    ana, beto = vendedores
+    jabon, pasta = productos
+    almacen.fijar_inventario(ana, jabon, 10)
+    almacen.fijar_inventario(ana, pasta, 4)
+    assert almacen.registrar_venta(ana, jabon, 3, 30.0)
+    assert almacen.registrar_venta(ana, jabon, 2, 20.0)
+    assert almacen.registrar_venta(ana, pasta, 1, 20.0)
+    assert not almacen.registrar_venta(ana, pasta, 4, 80.0), "se vendió más que el stock"
+    assert not almacen.registrar_venta(beto, jabon, 1, 10.0), "se vendió sin inventario"
+    assert almacen.obtener_inventario(ana, jabon) == 5
+    assert almacen.obtener_inventario(ana, pasta) == 3
+    diarias = [tuple(fila) for fila in almacen.obtener_ventas_diarias(ana)]
+    assert diarias == [("Jabon", 5, 750.0, 50.0, jabon), ("Pasta", 1, 300.0, 20.0, pasta)]
+    assert almacen.obtener_ventas_diarias(beto) == []
+
+
+def test_ventas_por_lote(almacen, vendedores, productos):
+    ana, _ = vendedores
+    jabon, pasta = productos
+    almacen.fijar_inventario(ana, jabon, 5)
+    almacen.fijar_inventario(ana, pasta, 3)
+    # Cada venta con su propio resultado: una sin stock no frena a las demás
+    assert almacen.registrar_ventas([(ana, jabon, 2, 20.0), (ana, pasta, 9, 180.0), (ana, jabon, 3, 30.0),
+                                     (ana, jabon, 1, 10.0)]) == [True, False, True, False]
+    assert almacen.registrar_ventas([]) == []
+    assert almacen.obtener_inventario(ana, jabon) == 0
+    assert almacen.obtener_inventario(ana, pasta) == 3
+
+
+def test_libro_de_movimientos(almacen, vendedores, productos):
+    ana, _ = vendedores
+    jabon, _ = productos
+    almacen.fijar_inventario(ana, jabon, 10)
+    almacen.fijar_inventario(ana, jabon, 8)
+    almacen.registrar_venta(ana, jabon, 3, 30.0)
+    almacen.registrar_ventas([(ana, jabon, 2, 20.0), (ana, jabon, 9, 90.0)])
+    movimientos = almacen.obtener_movimientos(ana, jabon)
+    assert movimientos == [("entrega", 10), ("ajuste", -2), ("venta", -3), ("venta", -2)]
+    assert sum(cantidad for _, cantidad in movimientos) == almacen.obtener_inventario(ana, jabon)
+
+
+def test_sesiones(almacen, vendedores):
+    ana, beto = vendedores
+    assert almacen.verificar_sesion(1000) is None
+    assert almacen.crear_sesion(1000, ana)
+    assert not almacen.crear_sesion(1000, beto)
+    assert almacen.verificar_sesion(1000) == ana
+    assert almacen.listar_sesiones() == [(1000, ana, date.today().isoformat())]
+    assert almacen.cerrar_sesion(1000)
+    assert almacen.verificar_sesion(1000) is None
+
+
+def test_reservas_y_tablero(almacen):
+    assert almacen.ultimo_sorteo() is None
+    sorteo = almacen.crear_sorteo("Sorteo de prueba", 5, premio="Moto", valor_numero=2.5)
+    assert almacen.ultimo_sorteo() == sorteo
+    assert almacen.obtener_numeros(sorteo) == [(n, 1) for n in range(1, 6)]
+    version = almacen.obtener_version_tablero(sorteo)
+    assert version is not None
+    assert almacen.obtener_version_tablero(999) is None
+    r1 = almacen.agregar_reserva(7, sorteo, 2, "captura1")
+    r2 = almacen.agregar_reserva(8, sorteo, 3)
+    r3 = almacen.agregar_reserva(7, sorteo, 4)
+    assert almacen.agregar_reserva(9, sorteo, 2) is None, "se reservó un número ocupado"
+    assert almacen.obtener_version_tablero(sorteo) != version
+    assert dict(almacen.obtener_numeros(sorteo))[2] == 0
+    assert almacen.contar_reservas_pendientes() == 3
+    pagina = almacen.obtener_reservas_pendientes(0, 2)
+    assert [fila[0] for fila in pagina] == [r1, r2]
+    assert pagina[0][1:4] == (7, sorteo, 2) and pagina[0][5] == "captura1"
+    assert [fila[0] for fila in almacen.obtener_reservas_pendientes(r2, 2)] == [r3]
+
+
+def test_resolver_reservas(almacen):
+    sorteo = almacen.crear_sorteo("Sorteo", 5)
+    r1 = almacen.agregar_reserva(7, sorteo, 2)
+    r2 = almacen.agregar_reserva(8, sorteo, 3)
+    r3 = almacen.agregar_reserva(7, sorteo, 4)
+    assert sorted(almacen.resolver_reservas([r1, r3], "confirmada")) == [(r1, 7, sorteo, 2), (r3, 7, sorteo, 4)]
+    # Una reserva ya confirmada conserva su número aunque se pida rechazarla
+    assert almacen.resolver_reservas([r1, r2], "rechazada") == [(r2, 8, sorteo, 3)]
+    assert almacen.resolver_reservas([], "rechazada") == []
+    assert dict(almacen.obtener_numeros(sorteo))[3] == 1, "la reserva rechazada no liberó su número"
+    assert dict(almacen.obtener_numeros(sorteo))[2] == 0
+    assert almacen.contar_reservas_pendientes() == 0
+
+
+def test_captura_reutilizada(almacen, tmp_path):
+    captura = str(tmp_path / "captura.png")
+    otra = str(tmp_path / "otra.png")
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(captura)
+    imagen = Image.new("RGB", (64, 64), (255, 255, 255))
+    imagen.paste((0, 0, 0), (0, 0, 32, 64))
+    imagen.save(otra)
+    sorteo = almacen.crear_sorteo("Sorteo", 5)
+    r1 = almacen.agregar_reserva(7, sorteo, 1, captura)
+    r2 = almacen.agregar_reserva(8, sorteo, 2, captura)
+    r3 = almacen.agregar_reserva(9, sorteo, 3, otra)
+    sospechas = {fila[0]: fila[6:8] for fila in almacen.obtener_reservas_pendientes(0, 10)}
+    assert sospechas[r1] == (None, None)
+    assert sospechas[r2] == (r1, 0)
+    assert sospechas[r3] == (None, None)
+
+
+def test_capturas_de_otra_base_no_cuentan(tmp_path):
+    captura = str(tmp_path / "captura.png")
+    Image.new("RGB", (64, 64), (200, 30, 30)).save(captura)
+    almacenes = []
+    for nombre in ("una.db", "otra.db"):
+        ruta = str(tmp_path / nombre)
+        main.create_database(ruta)
+        database.crear_tablas(ruta)
+        almacenes.append(almacenamiento.AlmacenamientoSQLite(ruta))
+    for almacen in almacenes:
+        sorteo = almacen.crear_sorteo("Sorteo", 5)
+        almacen.agregar_reserva(7, sorteo, 1, captura)
+    for almacen in almacenes:
+        # Cada base guarda sus propios hashes y la primera captura de cada una no es sospechosa
+        assert almacen.obtener_reservas_pendientes(0, 10)[0][6] is None
+        assert almacen._uno("SELECT captura_phash IS NOT NULL FROM reservas")[0] == 1
+        almacen.cerrar()
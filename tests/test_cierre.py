@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import cierre
+import database
+import main
+
+
+class EnviadorFalso:
+    """Entrega o pierde cada mensaje en el acto, según `falla`."""
+
+    def __init__(self, falla=False):
+        self.falla = falla
+        self.enviados = []
+
+    def encolar(self, chat_id, texto, al_fallar=None, al_enviar=None, **kwargs):
+        if self.falla:
+            al_fallar(chat_id, texto)
+        else:
+            self.enviados.append((chat_id, texto))
+            al_enviar(chat_id, texto)
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    ruta = str(tmp_path / "cierre.db")
+    main.create_database(ruta)
+    database.crear_tablas(ruta)
+    cierre._encolados.clear()
+    return ruta
+
+
+def _estados(ruta):
+    conn = database.crear_conexion(ruta)
+    try:
+        return dict(conn.execute("SELECT fecha, estado FROM resumenes_diarios").fetchall())
+    finally:
+        conn.close()
+
+
+def test_reanuda_fallidos_pendientes_y_dias_sin_cierre(ruta):
+    ayer = cierre.ultimo_dia_terminado()
+    dias = [ayer - timedelta(days=n) for n in range(5, -1, -1)]
+    assert cierre.cierres_a_reanudar(ayer, ruta) == [ayer], "sin cierres previos solo cuenta el último día"
+
+    cierre.cerrar_dia(EnviadorFalso(falla=True), 42, dias[0], ruta)   # falló el envío
+    cierre.cerrar_dia(EnviadorFalso(), 42, dias[1], ruta)              # salió bien
+    conn = database.crear_conexion(ruta)
+    with conn:
+        conn.execute("INSERT INTO resumenes_diarios VALUES (?, 42, NULL, 'cortado', 'pendiente')", (dias[2].isoformat(),))
+    conn.close()
+    # dias[3..5] no llegaron a armarse (el proceso estuvo caído)
+    assert cierre.cierres_a_reanudar(ayer, ruta) == [dias[0], dias[2], dias[3], dias[4], dias[5]]
+
+    enviador = EnviadorFalso()
+    assert cierre.reanudar_cierres(enviador, 42, ayer, ruta) == 5
+    assert set(_estados(ruta).values()) == {"enviado"}
+    assert len(_estados(ruta)) == 6
+    assert cierre.cierres_a_reanudar(ayer, ruta) == []
+
+
+def test_no_reanuda_mas_alla_de_la_ventana(ruta):
+    ayer = cierre.ultimo_dia_terminado()
+    viejo = ayer - timedelta(days=cierre.DIAS_A_REANUDAR + 3)
+    cierre.cerrar_dia(EnviadorFalso(falla=True), 42, viejo, ruta)
+    fechas = cierre.cierres_a_reanudar(ayer, ruta)
+    assert viejo not in fechas
+    assert fechas == [ayer - timedelta(days=n) for n in range(cierre.DIAS_A_REANUDAR - 1, -1, -1)]
+
+
+def test_ultimo_cierre_vencido():
+    antes = datetime(2026, 5, 10, 0, 1, tzinfo=timezone.utc)
+    despues = datetime(2026, 5, 10, 0, 6, tzinfo=timezone.utc)
+    assert cierre._ultimo_cierre_vencido(antes, "00:05") == datetime(2026, 5, 8).date()
+    assert cierre._ultimo_cierre_vencido(despues, "00:05") == datetime(2026, 5, 9).date()
@@ -0,0 +1,51 @@
+import asyncio
+import contextvars
+import logging
+import threading
+
+import pytest
+
+import inquilinos
+
+
+@pytest.fixture
+def negocios(tmp_path):
+    cargados = []
+    for nombre, token in (("uno", "1:a"), ("dos", "2:b")):
+        ruta = tmp_path / f"{nombre}.env"
+        ruta.write_text(f"TELEGRAM_TOKEN={token}\nDATABASE_NAME={tmp_path / nombre}.db\n"
+                        f"EVENTOS_JSONL={tmp_path / nombre}_eventos.jsonl\n")
+        cargados.append(inquilinos.cargar_inquilino(str(ruta)))
+    yield cargados
+    raiz = logging.getLogger()
+    for inquilino in cargados:
+        for manejador in list(raiz.handlers):
+            if isinstance(manejador, inquilino.modulos["eventos"].ManejadorEventos):
+                raiz.removeHandler(manejador)
+
+
+def _errores(inquilino):
+    return [evento["mensaje"] for evento in inquilino.main.bus_eventos._eventos if evento["tipo"] == "error"]
+
+
+def test_cada_negocio_recibe_solo_sus_errores(negocios):
+    uno, dos = negocios
+    hilo = threading.Thread(target=uno.main.database.ejecutar_consulta, args=("SELECT * FROM de_uno",))
+    hilo.start()
+    hilo.join()
+    dos.main.database.ejecutar_consulta("SELECT * FROM de_dos")
+
+    async def desde_codigo_compartido():
+        logging.error("error de telebot")
+
+    async def correr():
+        contexto = contextvars.copy_context()
+        contexto.run(inquilinos.NEGOCIO.set, "dos")
+        await asyncio.create_task(desde_codigo_compartido(), context=contexto)
+
+    asyncio.run(correr())
+    logging.error("error sin negocio")
+
+    assert len(_errores(uno)) == 1 and "de_uno" in _errores(uno)[0]
+    assert len(_errores(dos)) == 2 and "de_dos" in _errores(dos)[0]
+    assert _errores(dos)[1] == "error de telebot"
@@ -0,0 +1,54 @@
+import pytest
+
+import almacenamiento
+import database
+import main
+import movimientos
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    """Los movimientos usan la base por defecto: se apunta a una propia de la prueba."""
+    ruta = str(tmp_path / "libro.db")
+    monkeypatch.setattr(database, "DATABASE_NAME", ruta)
+    main.create_database(ruta)
+    database.crear_tablas(ruta)
+    almacen = almacenamiento.AlmacenamientoSQLite(ruta)
+    yield almacen
+    almacen.cerrar()
+
+
+def test_el_stock_en_vivo_sale_del_libro(almacen):
+    ana = almacen.agregar_vendedor("ana", "x", "Ana")
+    beto = almacen.agregar_vendedor("beto", "x", "Beto")
+    jabon = almacen.agregar_producto("Jabon", 100, 150)
+    assert movimientos.reabastecer([(ana, jabon, 10)]) == (True, None)
+    assert almacen.registrar_venta(ana, jabon, 3, 30.0)
+    assert movimientos.tomar_instantanea()
+    assert movimientos.transferir_lote([(ana, beto, jabon, 2)]) == (True, None)
+    assert movimientos.devolver([(ana, jabon, 4)]) == (True, None)
+    assert almacen.obtener_inventario(ana, jabon) == 1
+    assert almacen.obtener_inventario(beto, jabon) == 2
+    assert [tipo for tipo, _ in almacen.obtener_movimientos(ana, jabon)] == ["entrega", "venta", "transferencia", "devolucion"]
+    assert movimientos.conciliar() == []
+
+    # El libro manda: un desvío de la tabla inventario no cambia lo que ve el bot, y conciliar lo marca
+    conn = database.crear_conexion()
+    with conn:
+        conn.execute("UPDATE inventario SET cantidad_entregada = 50 WHERE vendedor_id = ?", (ana,))
+    conn.close()
+    assert almacen.obtener_inventario(ana, jabon) == 1
+    assert movimientos.conciliar() == [(ana, jabon, 50, 1)]
+
+
+def test_devolucion_sin_stock_no_aplica_nada(almacen):
+    ana = almacen.agregar_vendedor("ana", "x", "Ana")
+    jabon = almacen.agregar_producto("Jabon", 100, 150)
+    pasta = almacen.agregar_producto("Pasta", 100, 150)
+    movimientos.reabastecer([(ana, jabon, 5), (ana, pasta, 1)])
+    exito, motivo = movimientos.devolver([(ana, jabon, 2), (ana, pasta, 3)])
+    assert not exito and "no tiene 3 unidades" in motivo
+    assert almacen.obtener_inventario(ana, jabon) == 5
+    assert movimientos.devolver([(ana, jabon, 0)])[0] is False
+    assert movimientos.resumen_movimientos("↩️", [(ana, jabon, 2)], {ana: "Ana"}, {jabon: "Jabon"}, -1) == \
+        "↩️\n- Ana: -2 Jabon\nTotal: 1 líneas, 2 unidades."
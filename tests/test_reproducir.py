@@ -0,0 +1,88 @@
+import gzip
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHAT_ID = 555
+# Sin config.env en el directorio de prueba: un token con formato válido alcanza, la API es falsa
+ENTORNO = {"TELEGRAM_TOKEN": "1:prueba", "ADMIN_CHAT_ID": "1"}
+
+
+def _correr(tmp_path, *argumentos):
+    entorno = {clave: valor for clave, valor in os.environ.items()
+               if clave not in ("DATABASE_NAME", "ARCHIVO_DATABASE_NAME", "GRABAR_UPDATES_DIR")}
+    entorno.update(ENTORNO)
+    return subprocess.run([sys.executable, *argumentos], cwd=tmp_path, env=entorno,
+                          capture_output=True, text=True, timeout=300, check=True).stdout
+
+
+def _base(tmp_path):
+    ruta = str(tmp_path / "base.db")
+    _correr(tmp_path, os.path.join(RAIZ, "generar_datos.py"), ruta, "--ventas", "200", "--vendedores", "2",
+            "--productos", "10", "--surtido", "5", "--numeros", "50", "--usuarios", "20")
+    return ruta
+
+
+def _grabacion(tmp_path, producto_id):
+    mensaje_id = iter(range(1, 100))
+    usuario = {"id": CHAT_ID, "is_bot": False, "first_name": "Vendedor"}
+    chat = {"id": CHAT_ID, "type": "private"}
+
+    def texto(contenido):
+        mensaje = {"message_id": next(mensaje_id), "date": int(time.time()), "chat": chat, "from": usuario, "text": contenido}
+        if contenido.startswith("/"):
+            mensaje["entities"] = [{"type": "bot_command", "offset": 0, "length": len(contenido)}]
+        return {"message": mensaje}
+
+    def boton(datos):
+        return {"callback_query": {"id": str(next(mensaje_id)), "from": usuario, "chat_instance": "1", "data": datos,
+                                   "message": {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "menú"}}}
+
+    updates = [texto("/start"), boton("inicio_sesion"), texto("vendedor1"), texto("<contraseña>"),
+               boton("venta"), boton(f"producto_{producto_id}"), texto("1"), boton("historial")]
+    ruta = tmp_path / "updates.jsonl.gz"
+    with gzip.open(ruta, "wt", encoding="utf-8") as salida:
+        for numero, update in enumerate(updates, start=1):
+            salida.write(json.dumps({"t": time.time(), "update": {"update_id": numero, **update}}) + "\n")
+    return str(ruta), len(updates)
+
+
+def test_la_reproduccion_pasa_el_login(tmp_path):
+    base = _base(tmp_path)
+    conn = sqlite3.connect(base)
+    producto_id = conn.execute("SELECT producto_id FROM inventario WHERE vendedor_id = 1 ORDER BY producto_id").fetchone()[0]
+    ventas_antes = conn.execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+    conn.close()
+    grabacion, cantidad = _grabacion(tmp_path, producto_id)
+
+    salida = _correr(tmp_path, os.path.join(RAIZ, "reproducir.py"), grabacion, "--base", base, "--velocidad", "0")
+
+    assert f"{cantidad} updates" in salida
+    for handler in ("recibir_contrasena", "iniciar_venta", "seleccionar_producto", "registrar_cantidad",
+                    "mostrar_historial_diario"):
+        assert f"\n{handler} " in salida, salida
+    assert "Sin handler (o descartados por los límites): 0" in salida, salida
+    # La venta cayó en la copia, no en la base original
+    conn = sqlite3.connect(base)
+    assert conn.execute("SELECT COUNT(*) FROM ventas").fetchone()[0] == ventas_antes
+    conn.close()
+
+
+def test_un_database_name_absoluto_no_desvia_la_reproduccion(tmp_path):
+    base = _base(tmp_path)
+    conn = sqlite3.connect(base)
+    contrasena = conn.execute("SELECT contrasena FROM vendedores WHERE id = 1").fetchone()[0]
+    conn.close()
+    grabacion, _ = _grabacion(tmp_path, 1)
+
+    entorno = dict(os.environ, DATABASE_NAME=base, **ENTORNO)
+    subprocess.run([sys.executable, os.path.join(RAIZ, "reproducir.py"), grabacion, "--base", base, "--velocidad", "0"],
+                   cwd=tmp_path, env=entorno, capture_output=True, text=True, timeout=300, check=True)
+
+    conn = sqlite3.connect(base)
+    assert conn.execute("SELECT contrasena FROM vendedores WHERE id = 1").fetchone()[0] == contrasena
+    conn.close()
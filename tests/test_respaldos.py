@@ -0,0 +1,43 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import database
+import main
+import respaldos
+
+
+def _copia(directorio, hace):
+    sello = (datetime.now(timezone.utc) - hace).strftime("%Y%m%d-%H%M%S")
+    prefijo = os.path.splitext(os.path.basename(database.DATABASE_NAME))[0]
+    ruta = directorio / f"{prefijo}-{sello}.db"
+    ruta.write_bytes(b"")
+    return ruta
+
+
+def _arrancar(directorio, espera):
+    listo = threading.Event()
+    parada = respaldos.iniciar_respaldos_periodicos(24, lambda resultados: listo.set(), str(directorio))
+    copio = listo.wait(espera)
+    parada.set()
+    return copio
+
+
+def test_un_reinicio_no_repite_el_respaldo_del_dia(tmp_path):
+    _copia(tmp_path, timedelta(hours=3))
+    assert 2.9 * 3600 < respaldos.edad_ultimo_respaldo(database.DATABASE_NAME, str(tmp_path)) < 3.1 * 3600
+    assert not _arrancar(tmp_path, 0.5)
+    assert len(list(tmp_path.glob("*.db"))) == 1
+
+
+def test_respalda_al_arrancar_si_la_ultima_copia_es_vieja(tmp_path):
+    main.create_database(database.DATABASE_NAME)
+    _copia(tmp_path, timedelta(hours=30))
+    assert _arrancar(tmp_path, 30)
+    assert respaldos.edad_ultimo_respaldo(database.DATABASE_NAME, str(tmp_path)) < 60
+
+
+def test_sin_respaldos_previos_respalda_enseguida(tmp_path):
+    main.create_database(database.DATABASE_NAME)
+    assert respaldos.edad_ultimo_respaldo(database.DATABASE_NAME, str(tmp_path)) is None
+    assert _arrancar(tmp_path, 30)